@@ -4,15 +4,25 @@ import tempfile
 import time
 import logging
 from pathlib import Path
-import base64
-from io import BytesIO
-from PIL import Image
+from functools import partial
 
 # Importar módulos personalizados
 from utils.article_extractor import extraer_contenido_articulo
-from utils.image_processor import descargar_imagenes, descargar_fuente, procesar_imagen_subida
-from utils.video_creator import crear_video
+from utils.image_processor import descargar_fuente
+from utils.image_downloader import descargar_imagenes
+from concurrent.futures.process import BrokenProcessPool
+from utils.render_jobs import enviar_render, estado_render, descartar_render, ColaLlenaError, PENDIENTE, EN_PROCESO, TERMINADO
 from utils.database import init_database, guardar_proyecto
+from utils.db_pool import inicializar_una_vez, guardar_videos_proyecto
+from utils.descargas import url_descarga, enlace_descarga_html, publicado
+from utils.cache import extraer_contenido_cacheado, descargar_imagenes_cacheadas
+from utils.thumbnails import obtener_miniatura, precargar_miniaturas
+from utils.uploads import ingerir_subidas
+from utils.assets import obtener_fuente, precalentar
+from utils.article_stream import extraer_articulo_streaming
+from utils.multi_render import FORMATOS, FORMATO_PRINCIPAL
+from utils.metrics import medir_etapa, instrumentar, iniciar_servidor_metricas
+from utils.workspace import espacio_sesion, espacio_proyecto, guardar_duradero, iniciar_limpieza
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,32 +36,49 @@ st.set_page_config(
 )
 
 # Función para mostrar imágenes con un tamaño específico
+# Las miniaturas se generan una sola vez por (ruta, mtime, ancho) y se sirven desde caché
 def mostrar_imagen(imagen_path, width=200):
     try:
-        img = Image.open(imagen_path)
-        # Redimensionar para mostrar como thumbnail
-        img.thumbnail((width, width * img.height // img.width))
-        buf = BytesIO()
-        img.save(buf, format="JPEG")
-        st.image(buf, width=width)
+        st.image(obtener_miniatura(imagen_path, width), width=width)
     except Exception as e:
         st.error(f"Error al mostrar la imagen: {str(e)}")
 
+# Publica el archivo en la ruta estática una sola vez por versión (ruta, mtime, tamaño)
+@st.cache_data(show_spinner=False)
+def _url_descarga_cacheada(bin_file, mtime, size):
+    return url_descarga(bin_file)
+
+def get_file_url(bin_file):
+    stat = os.stat(bin_file)
+    url = _url_descarga_cacheada(bin_file, stat.st_mtime, stat.st_size)
+    # La limpieza del espacio de trabajo puede haber retirado la copia publicada
+    return url if publicado(url) else url_descarga(bin_file)
+
 # Función para generar enlace de descarga
+# El archivo se sirve por bloques desde /app/static/ en lugar de incrustarlo en base64
 def get_binary_file_downloader_html(bin_file, file_label='Archivo'):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    b64 = base64.b64encode(data).decode()
-    href = f'<a href="data:video/mp4;base64,{b64}" download="{os.path.basename(bin_file)}">{file_label}</a>'
-    return href
+    return enlace_descarga_html(bin_file, file_label, url=get_file_url(bin_file))
 
-# Inicializar la base de datos
+# Inicializar la base de datos (una sola vez por proceso, no en cada rerun)
 try:
-    init_database()
-    logging.info("Base de datos inicializada correctamente")
+    if inicializar_una_vez(init_database):
+        logging.info("Base de datos inicializada correctamente")
 except Exception as e:
     logging.error(f"Error al inicializar la base de datos: {str(e)}")
 
+# Imports pesados, FFmpeg, fuente y procesos de render se preparan en segundo plano
+precalentar(descargar_fuente)
+
+# Exponer /metrics en formato Prometheus si se ha configurado un puerto
+if os.environ.get("METRICAS_PUERTO"):
+    iniciar_servidor_metricas()
+
+# Los archivos temporales de sesiones y proyectos se expulsan en segundo plano
+iniciar_limpieza()
+
+# Solo se mide la extracción real, no los aciertos de la caché
+extraer_contenido_medido = instrumentar("extraer_contenido_articulo")(extraer_contenido_articulo)
+
 # Inicializar el estado de la sesión si no existe
 if 'paso_actual' not in st.session_state:
     st.session_state.paso_actual = 1
@@ -69,6 +96,25 @@ if 'url_articulo' not in st.session_state:
     st.session_state.url_articulo = None
 if 'proyecto_guardado' not in st.session_state:
     st.session_state.proyecto_guardado = False
+if 'render_job' not in st.session_state:
+    st.session_state.render_job = None
+if 'videos' not in st.session_state:
+    st.session_state.videos = {}
+if 'borrador_path' not in st.session_state:
+    st.session_state.borrador_path = None
+    st.session_state.borrador_entradas = None
+if 'subidas' not in st.session_state:
+    st.session_state.subidas = {}
+# Espacios de trabajo: mientras sigan en la sesión, la limpieza no toca sus archivos
+if 'espacio' not in st.session_state:
+    st.session_state.espacio = espacio_sesion()
+if 'espacio_proyecto' not in st.session_state:
+    st.session_state.espacio_proyecto = espacio_proyecto()
+# Un único directorio de subidas por sesión: las rutas dependen del contenido y así se deduplican
+if 'subidas_dir' not in st.session_state:
+    st.session_state.subidas_dir = st.session_state.espacio.subdirectorio("subidas")
+st.session_state.espacio.tocar()
+st.session_state.espacio_proyecto.tocar()
 
 # Sidebar con instrucciones
 with st.sidebar:
@@ -106,19 +152,27 @@ st.title("🎬 Creador de Videos SEO")
 if st.session_state.paso_actual == 1:
     st.header("Paso 1: Extraer contenido del artículo")
     
-    # Descargar la fuente en segundo plano
+    # La fuente se descarga una vez por nodo; las demás sesiones reutilizan la copia compartida
     if not st.session_state.fuente_path:
         with st.spinner("Preparando recursos..."):
-            st.session_state.fuente_path = descargar_fuente()
+            st.session_state.fuente_path = obtener_fuente(descargar_fuente)
     
     url = st.text_input("Ingresa la URL del artículo:", 
                          placeholder="https://www.ejemplo.com/articulo")
+    extraccion_rapida = st.checkbox(
+        "Extracción rápida (solo las mejores imágenes, a la resolución del video)", value=True
+    )
     
     if st.button("Extraer contenido"):
         if url:
             try:
                 with st.spinner("Extrayendo contenido del artículo..."):
-                    textos, imagenes_urls = extraer_contenido_articulo(url)
+                    if extraccion_rapida:
+                        textos, imagenes_urls = extraer_contenido_cacheado(
+                            url, extraer_articulo_streaming, variante="streaming"
+                        )
+                    else:
+                        textos, imagenes_urls = extraer_contenido_cacheado(url, extraer_contenido_medido)
                     
                     if not textos:
                         st.error("No se pudo extraer texto del artículo.")
@@ -129,7 +183,11 @@ if st.session_state.paso_actual == 1:
                         progress_bar = st.progress(0)
                         st.info(f"Descargando {len(imagenes_urls)} imágenes...")
                         
-                        imagenes_paths = descargar_imagenes(imagenes_urls, progress_bar)
+                        destino_dir = st.session_state.espacio_proyecto.subdirectorio("imagenes")
+                        imagenes_paths = descargar_imagenes_cacheadas(
+                            url, imagenes_urls, progress_bar,
+                            partial(descargar_imagenes, destino_dir=destino_dir), destino_dir=destino_dir
+                        )
                         
                         if not imagenes_paths:
                             st.warning("No se pudieron descargar imágenes del artículo.")
@@ -206,6 +264,7 @@ elif st.session_state.paso_actual == 3:
         
         # Mostrar imágenes en una cuadrícula con checkboxes
         cols = 4
+        precargar_miniaturas(st.session_state.imagenes)
         
         for i in range(0, len(st.session_state.imagenes), cols):
             row = st.columns(cols)
@@ -223,13 +282,23 @@ elif st.session_state.paso_actual == 3:
                                         type=["jpg", "jpeg", "png"], 
                                         accept_multiple_files=True)
     
-    imagenes_subidas = []
     if archivos_subidos:
+        # Cada archivo se procesa una sola vez por sesión, no en cada rerun
+        def clave_subida(archivo):
+            return getattr(archivo, "file_id", None) or (archivo.name, archivo.size)
+
+        nuevos = [a for a in archivos_subidos if clave_subida(a) not in st.session_state.subidas]
+        if nuevos:
+            with st.spinner(f"Procesando {len(nuevos)} imagen(es)..."):
+                for archivo, imagen_path in zip(nuevos, ingerir_subidas(
+                        nuevos, destino_dir=st.session_state.subidas_dir)):
+                    st.session_state.subidas[clave_subida(archivo)] = imagen_path
+                    if imagen_path is None:
+                        st.warning(f"No se pudo procesar la imagen {archivo.name}")
         for archivo in archivos_subidos:
-            st.write(f"Procesando imagen: {archivo.name}")
-            imagen_path = procesar_imagen_subida(archivo)
-            if imagen_path:
-                imagenes_subidas.append(imagen_path)
+            imagen_path = st.session_state.subidas.get(clave_subida(archivo))
+            # Las rutas dependen del contenido: un mismo archivo subido dos veces se añade una vez
+            if imagen_path and imagen_path not in st.session_state.imagenes:
                 st.session_state.imagenes.append(imagen_path)
                 # Actualizar imagenes_seleccionadas con True para las nuevas imágenes
                 imagenes_seleccionadas.append(True)
@@ -267,47 +336,104 @@ elif st.session_state.paso_actual == 4:
         st.write(f"✅ {len(st.session_state.imagenes)} imágenes seleccionadas")
         
         if not st.session_state.video_path:
-            if st.button("Generar Video"):
-                try:
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    def update_progress(progress):
-                        progress_bar.progress(progress)
-                        if progress < 0.25:
-                            status_text.text("Preparando imágenes...")
-                        elif progress < 0.5:
-                            status_text.text("Añadiendo textos a las imágenes...")
-                        elif progress < 0.75:
-                            status_text.text("Creando secuencias de video...")
-                        else:
-                            status_text.text("Finalizando el video...")
-                    
-                    with st.spinner("Creando video..."):
+            if st.session_state.render_job is None:
+                # El borrador se muestra en lugar del video hasta lanzar el render definitivo
+                entradas = (tuple(st.session_state.textos), tuple(st.session_state.imagenes))
+                if st.session_state.borrador_path and st.session_state.borrador_entradas == entradas:
+                    st.subheader("Vista previa rápida")
+                    st.video(get_file_url(st.session_state.borrador_path))
+                    st.caption("Borrador en baja resolución. Si todo está bien, genera el video definitivo: "
+                               "las diapositivas ya dibujadas se reutilizan.")
+                elif st.button("👁️ Vista previa rápida", help="Genera en pocos segundos un borrador en baja resolución"):
+                    try:
+                        st.session_state.render_job = enviar_render(
+                            st.session_state.textos,
+                            st.session_state.imagenes,
+                            st.session_state.textos[0],
+                            fuente_path=st.session_state.fuente_path,
+                            borrador=True,
+                            destino_dir=st.session_state.espacio_proyecto.subdirectorio("borrador")
+                        )
+                        st.session_state.borrador_entradas = entradas
+                        st.rerun()
+                    except ColaLlenaError as e:
+                        st.warning(str(e))
+                    except BrokenProcessPool:
+                        st.error("El servicio de render no está disponible ahora mismo. Inténtalo de nuevo en unos segundos.")
+
+                # Todos los formatos se generan en un solo trabajo, compartiendo imágenes y textos
+                formatos = st.multiselect("Formatos", list(FORMATOS), default=[FORMATO_PRINCIPAL],
+                                          help="16:9 horizontal, 9:16 vertical (historias, reels) y 1:1 cuadrado")
+                con_preview = st.checkbox("Incluir también una versión ligera (baja resolución)", value=False)
+                if st.button("Generar Video"):
+                    try:
                         titulo = st.session_state.textos[0]
-                        imagenes_con_texto, video_path = crear_video(
+                        st.session_state.render_job = enviar_render(
                             st.session_state.textos,
                             st.session_state.imagenes,
                             titulo,
                             fuente_path=st.session_state.fuente_path,
-                            progress_callback=update_progress
+                            formatos=formatos or [FORMATO_PRINCIPAL],
+                            preview=con_preview,
+                            destino_dir=st.session_state.espacio_proyecto.subdirectorio("render")
                         )
-                        
-                        st.session_state.imagenes_con_texto = imagenes_con_texto
-                        
+                        st.rerun()
+                    except ColaLlenaError as e:
+                        st.warning(str(e))
+                    except BrokenProcessPool:
+                        st.error("El servicio de render no está disponible ahora mismo. Inténtalo de nuevo en unos segundos.")
+            else:
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                def update_progress(progress):
+                    progress_bar.progress(progress)
+                    if progress < 0.25:
+                        status_text.text("Preparando imágenes...")
+                    elif progress < 0.5:
+                        status_text.text("Añadiendo textos a las imágenes...")
+                    elif progress < 0.75:
+                        status_text.text("Creando secuencias de video...")
+                    else:
+                        status_text.text("Finalizando el video...")
+                
+                # El render se ejecuta en el pool de procesos; aquí solo se consulta su progreso
+                estado = estado_render(st.session_state.render_job)
+                
+                if estado['estado'] in (PENDIENTE, EN_PROCESO):
+                    update_progress(estado['progreso'])
+                    if estado['estado'] == PENDIENTE:
+                        status_text.text("En cola, esperando a que haya un proceso libre...")
+                    time.sleep(1)
+                    st.rerun()
+                elif estado['estado'] == TERMINADO:
+                    # El resultado se guarda en la sesión antes de cualquier llamada a st.*
+                    # (que puede interrumpir la ejecución) y solo entonces se descarta el trabajo
+                    imagenes_con_texto, video_path, videos = estado['resultado']
+                    st.session_state.imagenes_con_texto = imagenes_con_texto
+                    if "borrador" in videos:
+                        st.session_state.borrador_path = video_path
+                    else:
+                        st.session_state.videos = videos
                         if video_path:
                             st.session_state.video_path = video_path
-                            progress_bar.progress(1.0)
-                            status_text.text("¡Video creado con éxito!")
-                        else:
-                            progress_bar.progress(1.0)
-                            status_text.text("No se pudo crear el video, pero se generaron las imágenes con texto.")
-                            st.warning("No se pudo crear el video, pero se han generado las imágenes con texto que puedes descargar. Si ves este mensaje después de instalar moviepy, es posible que falte FFmpeg u otras dependencias.")
-                        
+                    descartar_render(st.session_state.render_job)
+                    st.session_state.render_job = None
+                    
+                    if "borrador" in videos:
                         st.rerun()
-                        
-                except Exception as e:
-                    error_message = str(e)
+                    if video_path:
+                        progress_bar.progress(1.0)
+                        status_text.text("¡Video creado con éxito!")
+                        st.rerun()
+                    else:
+                        progress_bar.progress(1.0)
+                        status_text.text("No se pudo crear el video, pero se generaron las imágenes con texto.")
+                        st.warning("No se pudo crear el video, pero se han generado las imágenes con texto que puedes descargar. Si ves este mensaje después de instalar moviepy, es posible que falte FFmpeg u otras dependencias.")
+                else:
+                    descartar_render(st.session_state.render_job)
+                    st.session_state.render_job = None
+                    error_message = estado['error']
                     logging.error(f"Error al crear el video: {error_message}")
                     
                     # Mensajes más informativos según el tipo de error
@@ -328,14 +454,30 @@ elif st.session_state.paso_actual == 4:
                     try:
                         # El título es el primer texto seleccionado
                         titulo = st.session_state.textos[0]
-                        proyecto_id = guardar_proyecto(
-                            titulo, 
-                            url_articulo=st.session_state.url_articulo,
-                            video_path=st.session_state.video_path,
-                            textos=st.session_state.textos,
-                            imagenes_originales=st.session_state.imagenes,
-                            imagenes_con_texto=st.session_state.imagenes_con_texto
-                        )
+                        # Los archivos del proyecto pasan al almacén duradero para que el historial siga siendo válido
+                        st.session_state.video_path = guardar_duradero(st.session_state.video_path)
+                        # Siempre se guarda el formato, aunque solo se haya generado uno
+                        videos = st.session_state.videos or {FORMATO_PRINCIPAL: st.session_state.video_path}
+                        st.session_state.videos = {formato: guardar_duradero(video)
+                                                   for formato, video in videos.items()}
+                        st.session_state.imagenes = [guardar_duradero(img) for img in st.session_state.imagenes]
+                        st.session_state.imagenes_con_texto = [guardar_duradero(img)
+                                                               for img in st.session_state.imagenes_con_texto]
+                        # El proyecto se guarda con utils.database, cuyo esquema lee la página del historial
+                        with medir_etapa("guardar_proyecto"):
+                            proyecto_id = guardar_proyecto(
+                                titulo, 
+                                url_articulo=st.session_state.url_articulo,
+                                video_path=st.session_state.video_path,
+                                textos=st.session_state.textos,
+                                imagenes_originales=st.session_state.imagenes,
+                                imagenes_con_texto=st.session_state.imagenes_con_texto
+                            )
+                        # Los formatos son un complemento: si fallan, el proyecto ya tiene su video principal
+                        try:
+                            guardar_videos_proyecto(proyecto_id, st.session_state.videos)
+                        except Exception as e:
+                            logging.warning(f"No se pudieron guardar los formatos del proyecto {proyecto_id}: {str(e)}")
                         st.session_state.proyecto_guardado = True
                         st.success(f"Proyecto guardado en la base de datos (ID: {proyecto_id})")
                     except Exception as e:
@@ -343,12 +485,13 @@ elif st.session_state.paso_actual == 4:
                 
                 # Mostrar opciones de descarga
                 st.subheader("Descargar video")
-                video_name = os.path.basename(st.session_state.video_path)
-                st.markdown(get_binary_file_downloader_html(st.session_state.video_path, f"Descargar {video_name}"), unsafe_allow_html=True)
+                for formato, video in (st.session_state.videos or {FORMATO_PRINCIPAL: st.session_state.video_path}).items():
+                    video_name = os.path.basename(video)
+                    st.markdown(get_binary_file_downloader_html(video, f"Descargar {video_name} ({formato})"), unsafe_allow_html=True)
                 
                 # Visualización del video
                 st.subheader("Previsualización")
-                st.video(st.session_state.video_path)
+                st.video(get_file_url(st.session_state.video_path))
                 
                 # Enlace al historial de proyectos
                 st.markdown("---")
@@ -365,6 +508,7 @@ elif st.session_state.paso_actual == 4:
                     
                     # Mostrar imágenes en una cuadrícula
                     cols = 3
+                    precargar_miniaturas(st.session_state.imagenes_con_texto, width=300)
                     for i in range(0, len(st.session_state.imagenes_con_texto), cols):
                         row = st.columns(cols)
                         for j in range(cols):
@@ -378,6 +522,16 @@ elif st.session_state.paso_actual == 4:
                                         f"Descargar imagen {idx+1}"
                                     ), unsafe_allow_html=True)
             
+            # Volver a editar: el siguiente render solo regenera las diapositivas que cambien
+            if st.button("✏️ Editar textos y volver a generar"):
+                st.session_state.paso_actual = 2
+                st.session_state.video_path = None
+                st.session_state.proyecto_guardado = False
+                st.session_state.render_job = None
+                st.session_state.videos = {}
+                st.session_state.borrador_path = None
+                st.rerun()
+            
             # Opciones para volver a empezar
             if st.button("Crear otro video"):
                 # Reiniciar el estado
@@ -387,6 +541,11 @@ elif st.session_state.paso_actual == 4:
                 st.session_state.video_path = None
                 st.session_state.url_articulo = None
                 st.session_state.proyecto_guardado = False
+                st.session_state.render_job = None
+                st.session_state.borrador_path = None
+                # El proyecto termina: sus temporales quedan libres para la limpieza
+                st.session_state.espacio_proyecto.cerrar()
+                st.session_state.espacio_proyecto = espacio_proyecto()
                 if 'imagenes_con_texto' in st.session_state:
                     del st.session_state.imagenes_con_texto
                 st.rerun()
@@ -0,0 +1,316 @@
+"""
+Creación de videos por lotes, sin la interfaz de Streamlit.
+
+Encadena extraer_contenido_articulo -> descargar_imagenes -> render -> guardar_proyecto
+para cada URL de un archivo. La extracción y las descargas se ejecutan en un pool
+de hilos y los renders en un pool de procesos del tamaño de la máquina. Cada etapa
+deja un punto de control en disco, de modo que al relanzar el mismo lote se
+retoma donde se quedó.
+
+Uso:
+    python batch_videos.py urls.txt --salida lote/ [--sin-db] [--renders 4] [--metricas metricas.prom]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.metrics import medir_etapa, capturar_etapas, traza, registrar, exportar_prometheus
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ETAPAS = ("extraccion", "descarga", "render", "guardado")
+
+
+def leer_urls(path):
+    """Lee las URLs del archivo (una por línea; se ignoran vacías y comentarios)"""
+    urls = []
+    for linea in Path(path).read_text(encoding="utf-8").splitlines():
+        linea = linea.strip()
+        if linea and not linea.startswith("#") and linea not in urls:
+            urls.append(linea)
+    return urls
+
+
+class Articulo:
+    """Estado persistente de un artículo del lote (un punto de control por etapa)"""
+
+    def __init__(self, url, salida_dir):
+        self.url = url
+        self.dir = Path(salida_dir).resolve() / hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.path_estado = self.dir / "estado.json"
+        if self.path_estado.exists():
+            self.estado = json.loads(self.path_estado.read_text(encoding="utf-8"))
+        else:
+            self.estado = {"url": url, "etapas": {}, "tiempos": {}}
+
+    def completada(self, etapa):
+        return etapa in self.estado["etapas"]
+
+    def resultado(self, etapa):
+        return self.estado["etapas"].get(etapa)
+
+    def completar(self, etapa, resultado, segundos):
+        self.estado["etapas"][etapa] = resultado
+        self.estado["tiempos"][etapa] = segundos
+        self.estado.pop("error", None)
+        self.guardar()
+
+    def fallar(self, etapa, error):
+        self.estado["error"] = {"etapa": etapa, "mensaje": str(error)}
+        self.guardar()
+
+    def guardar(self):
+        temporal = self.path_estado.with_suffix(".tmp")
+        temporal.write_text(json.dumps(self.estado, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(temporal, self.path_estado)
+
+
+def etapa_extraccion_y_descarga(articulo):
+    """Extrae el artículo y descarga sus imágenes (se ejecuta en el pool de hilos)"""
+    from utils.article_extractor import extraer_contenido_articulo
+    from utils.image_downloader import descargar_imagenes
+
+    tiempos = {}
+    if not articulo.completada("extraccion"):
+        inicio = time.perf_counter()
+        with traza(articulo.dir.name), medir_etapa("extraer_contenido_articulo"):
+            textos, imagenes_urls = extraer_contenido_articulo(articulo.url)
+        if not textos:
+            raise ValueError("No se pudo extraer texto del artículo")
+        tiempos["extraccion"] = time.perf_counter() - inicio
+        articulo.completar("extraccion", {"textos": textos, "imagenes_urls": imagenes_urls},
+                           tiempos["extraccion"])
+
+    if not articulo.completada("descarga"):
+        inicio = time.perf_counter()
+        # Las imágenes se guardan en el directorio del artículo para que sobrevivan a un reinicio
+        imagenes_dir = articulo.dir / "imagenes"
+        imagenes_dir.mkdir(exist_ok=True)
+        with traza(articulo.dir.name):
+            imagenes = descargar_imagenes(articulo.resultado("extraccion")["imagenes_urls"],
+                                          destino_dir=str(imagenes_dir))
+        if not imagenes:
+            raise ValueError("No se pudieron descargar imágenes del artículo")
+        tiempos["descarga"] = time.perf_counter() - inicio
+        articulo.completar("descarga", {"imagenes": imagenes}, tiempos["descarga"])
+
+    return tiempos
+
+
+def etapa_render(textos, imagenes, fuente_path, output_path):
+    """
+    Genera el video de un artículo (se ejecuta en el pool de procesos).
+
+    Devuelve también las etapas medidas en el proceso hijo para registrarlas
+    en las métricas del lote.
+    """
+    from utils.incremental_render import renderizar_incremental
+
+    inicio = time.perf_counter()
+    with traza(Path(output_path).parent.name), capturar_etapas() as muestras:
+        imagenes_con_texto, video_path = renderizar_incremental(textos, imagenes, output_path,
+                                                                fuente_path=fuente_path)
+    return imagenes_con_texto, video_path, time.perf_counter() - inicio, muestras
+
+
+def etapa_guardado(articulos):
+    """Guarda en la base de datos un grupo de artículos terminados en una sola transacción"""
+    from utils.db_pool import guardar_proyectos_lote
+
+    inicio = time.perf_counter()
+    proyectos = []
+    for articulo in articulos:
+        textos = articulo.resultado("extraccion")["textos"]
+        render = articulo.resultado("render")
+        proyectos.append({
+            "titulo": textos[0],
+            "url_articulo": articulo.url,
+            "video_path": render["video_path"],
+            "textos": textos,
+            "imagenes_originales": articulo.resultado("descarga")["imagenes"],
+            "imagenes_con_texto": render["imagenes_con_texto"],
+        })
+    ids = guardar_proyectos_lote(proyectos)
+    segundos = time.perf_counter() - inicio
+    for articulo, proyecto_id in zip(articulos, ids):
+        articulo.completar("guardado", {"proyecto_id": proyecto_id}, segundos / len(articulos))
+    return segundos
+
+
+def procesar_lote(urls, salida_dir, guardar_en_db=True, max_descargas=8, max_renders=None,
+                  tamano_lote_db=25):
+    """
+    Procesa una lista de URLs y devuelve el resumen de la ejecución.
+
+    Returns:
+        dict: artículos completados y fallidos, tiempo total y segundos por etapa.
+    """
+    max_renders = max_renders or os.cpu_count() or 1
+    # Rutas absolutas: los puntos de control y la base de datos deben servir desde cualquier directorio
+    salida_dir = Path(salida_dir).resolve()
+    articulos = [Articulo(url, salida_dir) for url in urls]
+    tiempos = defaultdict(float)
+    completados, fallidos, reanudados, omitidos = 0, 0, 0, 0
+    inicio_lote = time.perf_counter()
+
+    fuente_path = None
+    try:
+        from utils.image_processor import descargar_fuente
+        from utils.assets import obtener_fuente
+        fuente_path = obtener_fuente(descargar_fuente)
+    except Exception as e:
+        logging.warning(f"No se pudo descargar la fuente, se usará la predeterminada: {str(e)}")
+
+    por_guardar = []
+
+    def guardar_pendientes():
+        nonlocal completados, fallidos
+        if not por_guardar:
+            return
+        grupo = list(por_guardar)
+        por_guardar.clear()
+        try:
+            tiempos["guardado"] += etapa_guardado(grupo)
+        except Exception as e:
+            logging.error(f"Error al guardar {len(grupo)} proyectos: {str(e)}")
+            for articulo in grupo:
+                articulo.fallar("guardado", e)
+            fallidos += len(grupo)
+            return
+        completados += len(grupo)
+        logging.info(f"[{completados + fallidos}/{len(articulos)}] {len(grupo)} proyectos guardados")
+
+    def terminar(articulo):
+        nonlocal completados
+        if guardar_en_db and not articulo.completada("guardado"):
+            por_guardar.append(articulo)
+            if len(por_guardar) >= tamano_lote_db:
+                guardar_pendientes()
+            return
+        completados += 1
+        logging.info(f"[{completados + fallidos}/{len(articulos)}] Completado: {articulo.url}")
+
+    contexto = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(max_workers=max_descargas) as pool_io, \
+            ProcessPoolExecutor(max_workers=max_renders, mp_context=contexto) as pool_cpu:
+        pendientes = {}
+        for articulo in articulos:
+            if all(articulo.completada(e) for e in ETAPAS if guardar_en_db or e != "guardado"):
+                omitidos += 1
+                completados += 1
+                continue
+            if articulo.estado["etapas"]:
+                reanudados += 1
+            pendientes[pool_io.submit(etapa_extraccion_y_descarga, articulo)] = ("io", articulo)
+
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                tipo, articulo = pendientes.pop(futuro)
+                if tipo == "io":
+                    etapa = "descarga" if articulo.completada("extraccion") else "extraccion"
+                else:
+                    etapa = "render"
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    logging.error(f"Error en la etapa {etapa} de {articulo.url}: {str(e)}")
+                    articulo.fallar(etapa, e)
+                    fallidos += 1
+                    continue
+
+                if tipo == "io":
+                    for nombre, segundos in resultado.items():
+                        tiempos[nombre] += segundos
+                    if articulo.completada("render"):
+                        terminar(articulo)
+                        continue
+                    futuro_render = pool_cpu.submit(
+                        etapa_render,
+                        articulo.resultado("extraccion")["textos"],
+                        articulo.resultado("descarga")["imagenes"],
+                        fuente_path,
+                        str(articulo.dir / "video.mp4"),
+                    )
+                    pendientes[futuro_render] = ("cpu", articulo)
+                else:
+                    imagenes_con_texto, video_path, segundos, muestras = resultado
+                    for muestra in muestras:
+                        registrar(muestra)
+                    tiempos["render"] += segundos
+                    articulo.completar("render", {"imagenes_con_texto": imagenes_con_texto,
+                                                  "video_path": video_path}, segundos)
+                    terminar(articulo)
+
+    guardar_pendientes()
+    return {
+        "articulos": len(articulos),
+        "completados": completados,
+        "fallidos": fallidos,
+        "reanudados": reanudados,
+        "omitidos": omitidos,
+        "segundos": time.perf_counter() - inicio_lote,
+        "tiempos_etapas": dict(tiempos),
+    }
+
+
+def imprimir_resumen(resumen):
+    minutos = resumen["segundos"] / 60
+    # Los artículos ya terminados en una ejecución anterior no cuentan para el rendimiento
+    nuevos = resumen["completados"] - resumen["omitidos"]
+    procesados = nuevos + resumen["fallidos"]
+    print("\nResumen del lote")
+    print(f"  Artículos:    {resumen['articulos']} ({resumen['completados']} completados, "
+          f"{resumen['fallidos']} fallidos, {resumen['reanudados']} retomados, "
+          f"{resumen['omitidos']} ya terminados)")
+    print(f"  Tiempo total: {resumen['segundos']:.1f} s")
+    if minutos > 0:
+        print(f"  Rendimiento:  {nuevos / minutos:.1f} artículos/min")
+    for etapa in ETAPAS:
+        segundos = resumen["tiempos_etapas"].get(etapa)
+        if segundos is not None:
+            media = segundos / max(1, procesados)
+            print(f"  {etapa:<12}  {segundos:8.1f} s acumulados  ({media:.2f} s/artículo)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("urls", help="Archivo con una URL por línea")
+    parser.add_argument("--salida", default="lote", help="Directorio de salida y puntos de control")
+    parser.add_argument("--sin-db", action="store_true", help="No guardar los proyectos en la base de datos")
+    parser.add_argument("--descargas", type=int, default=8, help="Hilos para extracción y descargas")
+    parser.add_argument("--renders", type=int, default=None, help="Procesos de render (por defecto, núcleos)")
+    parser.add_argument("--lote-db", type=int, default=25, help="Proyectos por transacción al guardar")
+    parser.add_argument("--metricas", help="Archivo donde escribir las métricas por etapa (formato Prometheus)")
+    args = parser.parse_args()
+
+    urls = leer_urls(args.urls)
+    if not urls:
+        print("El archivo no contiene URLs.")
+        return 1
+
+    if not args.sin_db:
+        from utils.db_pool import inicializar_una_vez
+        inicializar_una_vez()
+
+    resumen = procesar_lote(urls, args.salida, guardar_en_db=not args.sin_db,
+                            max_descargas=args.descargas, max_renders=args.renders,
+                            tamano_lote_db=args.lote_db)
+    imprimir_resumen(resumen)
+    if args.metricas:
+        Path(args.metricas).write_text(exportar_prometheus(), encoding="utf-8")
+    return 0 if resumen["fallidos"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark del arranque en frío y de la latencia del primer render.
+
+Cada medida se hace en un intérprete nuevo (subproceso) para partir de un
+proceso sin módulos, sin FFmpeg localizado y sin pool de render:
+  - imports:   tiempo de importar los módulos que carga app.py al arrancar
+  - frio:      primer render sin precalentar (imports, pool y fuente bajo demanda)
+  - precalentado: primer render después de utils.assets.precalentar()
+  - segundo:   un segundo render en el mismo proceso, como referencia
+
+La descarga de la fuente se simula copiando un TTF local con un retardo fijo
+(--retardo-fuente), igual en todos los modos.
+
+Uso:
+    python benchmarks/bench_arranque.py --repeticiones 3 --fuente /ruta/a/fuente.ttf
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+MODULOS_APP = [
+    "utils.render_jobs", "utils.uploads", "utils.cache", "utils.thumbnails", "utils.descargas",
+    "utils.image_downloader", "utils.db_pool", "utils.metrics", "utils.assets",
+]
+
+
+def crear_imagenes(n):
+    from PIL import Image
+    destino = Path(tempfile.mkdtemp())
+    rutas = []
+    for i in range(n):
+        path = destino / f"imagen_{i}.jpg"
+        Image.new("RGB", (1600, 1200), (40 * i % 255, 120, 200)).save(path, quality=90)
+        rutas.append(str(path))
+    return rutas
+
+
+def renderizar(textos, imagenes, fuente_path):
+    from utils.render_jobs import enviar_render, estado_render, descartar_render, TERMINADO, ERROR
+    job_id = enviar_render(textos, imagenes, "bench arranque", fuente_path=fuente_path)
+    while True:
+        estado = estado_render(job_id)
+        if estado["estado"] in (TERMINADO, ERROR):
+            descartar_render(job_id)
+            if estado["error"]:
+                raise RuntimeError(estado["error"])
+            return
+        time.sleep(0.02)
+
+
+def medir_interno(modo, fuente, retardo):
+    """Se ejecuta en el subproceso; imprime un JSON con los tiempos"""
+    inicio = time.perf_counter()
+    for modulo in MODULOS_APP:
+        __import__(modulo)
+    resultado = {"imports": time.perf_counter() - inicio, "numpy_cargado": "numpy" in sys.modules}
+    if modo == "imports":
+        return resultado
+
+    from utils.assets import obtener_fuente, precalentar
+
+    def descargar_fuente():
+        time.sleep(retardo)
+        destino = Path(tempfile.mkdtemp()) / "fuente.ttf"
+        shutil.copyfile(fuente, destino)
+        return str(destino)
+
+    imagenes = crear_imagenes(4)
+    # Textos distintos en cada ejecución para que no se reutilicen segmentos en caché
+    sufijo = f"{os.getpid()}-{time.time()}"
+    textos = [f"Diapositiva {i} del benchmark de arranque {sufijo}" for i in range(4)]
+
+    if modo == "precalentado":
+        inicio = time.perf_counter()
+        precalentar(descargar_fuente).join()
+        resultado["precalentar"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    fuente_path = obtener_fuente(descargar_fuente)
+    renderizar(textos, imagenes, fuente_path)
+    resultado["primer_render"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    renderizar([t + " (2)" for t in textos], imagenes, obtener_fuente(descargar_fuente))
+    resultado["segundo_render"] = time.perf_counter() - inicio
+    return resultado
+
+
+def medir(modo, args, assets_dir):
+    entorno = dict(os.environ, ASSETS_DIR=str(assets_dir), PYTHONPATH=str(RAIZ))
+    salida = subprocess.run(
+        [sys.executable, __file__, "--interno", modo, "--fuente", args.fuente,
+         "--retardo-fuente", str(args.retardo_fuente)],
+        capture_output=True, text=True, env=entorno, check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--fuente", help="TTF local usado para simular la descarga de la fuente")
+    parser.add_argument("--retardo-fuente", type=float, default=0.5, help="Segundos que tarda la descarga simulada")
+    parser.add_argument("--interno", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(medir_interno(args.interno, args.fuente, args.retardo_fuente)))
+        return
+
+    if not args.fuente:
+        parser.error("Indica --fuente con la ruta de un archivo TTF")
+
+    print(f"{'modo':<14} {'imports (s)':>12} {'numpy':>6} {'precalentar (s)':>16} "
+          f"{'1er render (s)':>15} {'2º render (s)':>14}")
+    for modo in ("imports", "frio", "precalentado"):
+        medidas = []
+        for _ in range(args.repeticiones):
+            # Caché de recursos vacía en cada repetición: el caso de un nodo recién arrancado
+            assets_dir = Path(tempfile.mkdtemp())
+            medidas.append(medir(modo, args, assets_dir))
+            shutil.rmtree(assets_dir, ignore_errors=True)
+
+        def mediana(clave):
+            valores = [m[clave] for m in medidas if clave in m]
+            return f"{statistics.median(valores):.3f}" if valores else "-"
+
+        print(f"{modo:<14} {mediana('imports'):>12} {str(medidas[0]['numpy_cargado']):>6} "
+              f"{mediana('precalentar'):>16} {mediana('primer_render'):>15} {mediana('segundo_render'):>14}")
+
+
+if __name__ == "__main__":
+    main()
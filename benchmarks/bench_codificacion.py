@@ -0,0 +1,79 @@
+"""
+Compara el codificador de diapositivas fijas con la ruta de moviepy.
+
+Para 5, 20 y 50 diapositivas creadas con crear_imagen_test mide el tiempo de
+codificación y el tamaño del MP4 resultante de:
+  - moviepy: ImageClip + concatenate_videoclips(method="compose") a 24 fps
+  - concat:  utils.slide_encoder.codificar_diapositivas con cada preset
+             (frecuencia variable) y con el preset balanced a 24 fps constantes
+
+Uso:
+    python benchmarks/bench_codificacion.py --diapositivas 5 20 50 --duracion 3
+"""
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from test_moviepy import crear_imagen_test
+from utils.slide_encoder import codificar_diapositivas, PRESETS
+
+
+def codificar_moviepy(imagenes, duracion, output_path):
+    """Ruta actual: un ImageClip por imagen unido con method="compose" """
+    try:
+        from moviepy import ImageClip, concatenate_videoclips
+        clips = [ImageClip(img).with_duration(duracion) for img in imagenes]
+    except ImportError:
+        from moviepy.editor import ImageClip, concatenate_videoclips
+        clips = [ImageClip(img).set_duration(duracion) for img in imagenes]
+    final_clip = concatenate_videoclips(clips, method="compose")
+    final_clip.write_videofile(str(output_path), fps=24, logger=None)
+    final_clip.close()
+
+
+def medir(funcion, output_path):
+    inicio = time.perf_counter()
+    funcion(output_path)
+    return time.perf_counter() - inicio, output_path.stat().st_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--diapositivas", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--duracion", type=float, default=3)
+    parser.add_argument("--sin-moviepy", action="store_true", help="Omitir la ruta de moviepy")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    salida_dir = Path(tempfile.mkdtemp())
+    colores = ["white", "lightyellow", "lightblue", "mistyrose", "honeydew"]
+    print(f"{'diapositivas':>12} {'motor':>16} {'tiempo (s)':>11} {'tamaño (KB)':>12}")
+    try:
+        for n in args.diapositivas:
+            imagenes = [crear_imagen_test(f"Diapositiva {i + 1}", i, size=(1280, 720),
+                                          color=colores[i % len(colores)]) for i in range(n)]
+            if not args.sin_moviepy:
+                t, tamano = medir(lambda p: codificar_moviepy(imagenes, args.duracion, p),
+                                  salida_dir / f"moviepy_{n}.mp4")
+                print(f"{n:>12} {'moviepy/compose':>16} {t:>11.2f} {tamano / 1024:>12.0f}")
+            for preset in PRESETS:
+                t, tamano = medir(lambda p: codificar_diapositivas(imagenes, args.duracion, p, preset=preset),
+                                  salida_dir / f"concat_{preset}_{n}.mp4")
+                print(f"{n:>12} {'concat/' + preset:>16} {t:>11.2f} {tamano / 1024:>12.0f}")
+            t, tamano = medir(lambda p: codificar_diapositivas(imagenes, args.duracion, p, fps=24),
+                              salida_dir / f"concat_cfr_{n}.mp4")
+            print(f"{n:>12} {'concat/24fps':>16} {t:>11.2f} {tamano / 1024:>12.0f}")
+            for img in imagenes:
+                shutil.rmtree(Path(img).parent, ignore_errors=True)
+    finally:
+        shutil.rmtree(salida_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark de guardado de proyectos en PostgreSQL.
+
+Compara, con varias sesiones concurrentes:
+  - conexion_nueva: una conexión psycopg2 y una fila por sentencia por proyecto
+  - pool:           utils.db_pool.guardar_proyecto_pool (una transacción por proyecto)
+  - lote:           utils.db_pool.guardar_proyectos_lote (execute_values por grupos)
+
+Informa proyectos insertados por segundo y el máximo de conexiones abiertas
+observado en pg_stat_activity. Usa --dsn o DATABASE_URL; si no hay ninguno y
+está instalado pgserver, arranca un PostgreSQL local temporal.
+
+Uso:
+    python benchmarks/bench_db.py --proyectos 2000 --sesiones 8
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def proyecto_sintetico(i):
+    return {
+        "titulo": f"Proyecto de prueba {i}",
+        "url_articulo": f"https://ejemplo.com/articulo/{i}",
+        "video_path": f"/tmp/videos/{i}.mp4",
+        "textos": [f"Texto {j} del proyecto {i}" for j in range(8)],
+        "imagenes_originales": [f"/tmp/imagenes/{i}_{j}.jpg" for j in range(6)],
+        "imagenes_con_texto": [f"/tmp/imagenes/{i}_{j}_texto.jpg" for j in range(8)],
+    }
+
+
+def guardar_conexion_nueva(dsn, p):
+    """Referencia: conexión nueva y una sentencia por fila"""
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO proyectos (titulo, url_articulo, video_path) VALUES (%s, %s, %s) RETURNING id",
+                        (p["titulo"], p["url_articulo"], p["video_path"]))
+            pid = cur.fetchone()[0]
+            for i, texto in enumerate(p["textos"]):
+                cur.execute("INSERT INTO textos_proyecto (proyecto_id, orden, texto) VALUES (%s, %s, %s)",
+                            (pid, i, texto))
+            for tipo, clave in (("original", "imagenes_originales"), ("con_texto", "imagenes_con_texto")):
+                for i, ruta in enumerate(p[clave]):
+                    cur.execute("INSERT INTO imagenes_proyecto (proyecto_id, orden, tipo, ruta) VALUES (%s, %s, %s, %s)",
+                                (pid, i, tipo, ruta))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class MonitorConexiones:
+    """Muestrea pg_stat_activity para registrar el máximo de conexiones abiertas"""
+
+    def __init__(self, dsn):
+        self.conn = psycopg2.connect(dsn)
+        self.conn.autocommit = True
+        self.maximo = 0
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        with self.conn.cursor() as cur:
+            while not self._parar.is_set():
+                cur.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() "
+                            "AND pid <> pg_backend_pid()")
+                self.maximo = max(self.maximo, cur.fetchone()[0])
+                time.sleep(0.01)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *args):
+        self._parar.set()
+        self._hilo.join()
+        self.conn.close()
+
+
+def ejecutar(nombre, dsn, trabajos, sesiones):
+    with MonitorConexiones(dsn) as monitor:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sesiones) as executor:
+            total = sum(executor.map(lambda t: t(), trabajos))
+        segundos = time.perf_counter() - inicio
+    print(f"{nombre:>15} {total:>10} {total / segundos:>14.0f} {monitor.maximo:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--proyectos", type=int, default=2000)
+    parser.add_argument("--sesiones", type=int, default=8)
+    parser.add_argument("--tamano-lote", type=int, default=100)
+    args = parser.parse_args()
+
+    servidor = None
+    if not args.dsn:
+        try:
+            import pgserver
+        except ImportError:
+            parser.error("Indica --dsn o DATABASE_URL (o instala pgserver para usar un PostgreSQL temporal)")
+        servidor = pgserver.get_server(tempfile.mkdtemp(), cleanup_mode="delete")
+        args.dsn = servidor.get_uri()
+    os.environ["DATABASE_URL"] = args.dsn
+
+    from utils import db_pool
+    db_pool.inicializar_una_vez()
+    db_pool.obtener_pool()
+
+    proyectos = [proyecto_sintetico(i) for i in range(args.proyectos)]
+    print(f"{args.proyectos} proyectos, {args.sesiones} sesiones concurrentes, pool máx. {db_pool.DB_POOL_MAX}")
+    print(f"{'modo':>15} {'proyectos':>10} {'proyectos/s':>14} {'conexiones':>12}")
+
+    def uno(funcion, p):
+        return lambda: (funcion(p), 1)[1]
+
+    ejecutar("conexion_nueva", args.dsn,
+             [uno(lambda p: guardar_conexion_nueva(args.dsn, p), p) for p in proyectos], args.sesiones)
+    ejecutar("pool", args.dsn,
+             [uno(lambda p: db_pool.guardar_proyecto_pool(**p), p) for p in proyectos], args.sesiones)
+    grupos = [proyectos[i:i + args.tamano_lote] for i in range(0, len(proyectos), args.tamano_lote)]
+    ejecutar("lote", args.dsn,
+             [(lambda g: lambda: len(db_pool.guardar_proyectos_lote(g)))(g) for g in grupos], args.sesiones)
+
+    db_pool.cerrar_pool()
+    if servidor is not None:
+        servidor.cleanup()
+
+
+if __name__ == "__main__":
+    main()
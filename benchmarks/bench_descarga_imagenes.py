@@ -0,0 +1,138 @@
+"""
+Benchmark de descarga de imágenes contra un servidor HTTP local.
+
+Sirve un conjunto de imágenes sintéticas (fotos normales, píxeles de seguimiento
+y originales enormes) con una latencia artificial por petición y compara una
+descarga secuencial simple con utils.image_downloader.descargar_imagenes.
+
+Uso:
+    python benchmarks/bench_descarga_imagenes.py --imagenes 60 --latencia 0.08
+"""
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import image_downloader
+from utils.image_downloader import descargar_imagenes
+
+
+def generar_imagenes(n):
+    """Genera el contenido servido: la mayoría fotos, algunos píxeles y algún original enorme"""
+    imagenes = {}
+    for i in range(n):
+        if i % 10 == 0:
+            img, formato = Image.new("RGB", (1, 1)), "GIF"
+        elif i % 25 == 1:
+            img, formato = Image.new("RGB", (9000, 6000), (i % 255, 80, 120)), "JPEG"
+        else:
+            img, formato = Image.effect_noise((1200, 800), 40 + i % 30).convert("RGB"), "JPEG"
+        buf = BytesIO()
+        img.save(buf, format=formato, quality=85)
+        imagenes[f"/img/{i}.{formato.lower()}"] = buf.getvalue()
+    return imagenes
+
+
+def crear_servidor(imagenes, latencia):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            data = imagenes.get(self.path)
+            time.sleep(latencia)
+            if data is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                # Enviar por bloques para simular una red real
+                for i in range(0, len(data), 64 * 1024):
+                    self.wfile.write(data[i:i + 64 * 1024])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    class Servidor(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # El cliente corta la conexión al descartar una imagen: es lo esperado
+            pass
+
+    servidor = Servidor(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def descarga_secuencial(urls):
+    """Referencia: una petición nueva por imagen, cuerpo completo y decodificación completa"""
+    destino = Path(tempfile.mkdtemp())
+    rutas = []
+    total_bytes = 0
+    for i, url in enumerate(urls):
+        try:
+            r = requests.get(url, timeout=30)
+            r.raise_for_status()
+            total_bytes += len(r.content)
+            img = Image.open(BytesIO(r.content))
+            if (min(img.size) < image_downloader.MIN_LADO_IMAGEN
+                    or img.width * img.height > image_downloader.MAX_PIXELES_IMAGEN):
+                continue
+            img = img.convert("RGB")
+            path = destino / f"imagen_{i}.jpg"
+            img.save(path, format="JPEG")
+            rutas.append(str(path))
+        except Exception:
+            continue
+    shutil.rmtree(destino, ignore_errors=True)
+    return rutas, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--imagenes", type=int, default=60)
+    parser.add_argument("--latencia", type=float, default=0.08, help="Latencia por petición en segundos")
+    args = parser.parse_args()
+
+    imagenes = generar_imagenes(args.imagenes)
+    servidor = crear_servidor(imagenes, args.latencia)
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    urls = [base + ruta for ruta in imagenes]
+    print(f"{len(urls)} imágenes, {sum(map(len, imagenes.values())) / 1e6:.1f} MB servidos, "
+          f"latencia {args.latencia * 1000:.0f} ms")
+
+    inicio = time.perf_counter()
+    rutas, total_bytes = descarga_secuencial(urls)
+    t_secuencial = time.perf_counter() - inicio
+    print(f"secuencial:  {t_secuencial:6.2f} s  {len(rutas)} imágenes  {total_bytes / 1e6:.1f} MB leídos")
+
+    inicio = time.perf_counter()
+    rutas = descargar_imagenes(urls)
+    t_concurrente = time.perf_counter() - inicio
+    print(f"concurrente: {t_concurrente:6.2f} s  {len(rutas)} imágenes  "
+          f"({t_secuencial / t_concurrente:.1f}x)")
+
+    if rutas:
+        shutil.rmtree(Path(rutas[0]).parent, ignore_errors=True)
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compara el enlace de descarga en base64 con la publicación en la ruta estática.
+
+Para cada tamaño de video mide el pico de memoria (RSS) del proceso y el tiempo
+hasta el primer byte que recibiría el navegador. Cada variante se ejecuta en un
+subproceso para que el RSS de una no contamine la otra.
+
+Uso:
+    python benchmarks/bench_descarga_video.py --tamanos 20 60 100
+"""
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from pathlib import Path
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.descargas import publicar_archivo, enlace_descarga_html
+
+
+def enlace_base64(bin_file, file_label='Archivo'):
+    """Implementación anterior de get_binary_file_downloader_html"""
+    with open(bin_file, 'rb') as f:
+        data = f.read()
+    b64 = base64.b64encode(data).decode()
+    href = f'<a href="data:video/mp4;base64,{b64}" download="{os.path.basename(bin_file)}">{file_label}</a>'
+    return href
+
+
+def crear_video_falso(directorio, mb):
+    """Crea un archivo .mp4 de relleno del tamaño indicado"""
+    path = Path(directorio) / f"video_{mb}mb.mp4"
+    bloque = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(mb):
+            f.write(bloque)
+    return path
+
+
+class _Silencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def medir_base64(video):
+    inicio = time.perf_counter()
+    html = enlace_base64(video)
+    # El navegador no recibe nada hasta que el HTML completo viaja por el websocket
+    ttfb = time.perf_counter() - inicio
+    return {"ttfb_s": ttfb, "payload_bytes": len(html)}
+
+
+def medir_estatico(video, static_dir):
+    handler = partial(_Silencioso, directory=str(static_dir))
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        inicio = time.perf_counter()
+        nombre = publicar_archivo(video, static_dir)
+        html = enlace_descarga_html(video, url=f"/{nombre}")
+        url = f"http://127.0.0.1:{servidor.server_port}/{nombre}"
+        with urllib.request.urlopen(url) as resp:
+            resp.read(64 * 1024)
+            ttfb = time.perf_counter() - inicio
+            # Consumir el resto por bloques, como lo haría el navegador
+            while resp.read(1024 * 1024):
+                pass
+        return {"ttfb_s": ttfb, "payload_bytes": len(html)}
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def ejecutar_variante(variante, video, static_dir):
+    if variante == "base64":
+        resultado = medir_base64(video)
+    else:
+        resultado = medir_estatico(video, static_dir)
+    # ru_maxrss está en KB en Linux
+    resultado["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(resultado))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[20, 60, 100],
+                        help="Tamaños de video en MB")
+    parser.add_argument("--variante", choices=["base64", "estatico"], help=argparse.SUPPRESS)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    parser.add_argument("--static-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variante:
+        ejecutar_variante(args.variante, args.video, args.static_dir)
+        return
+
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        print(f"{'MB':>5} {'variante':>9} {'RSS pico (MB)':>14} {'TTFB (s)':>9} {'HTML (bytes)':>13}")
+        for mb in args.tamanos:
+            video = crear_video_falso(temp_dir, mb)
+            for variante in ("base64", "estatico"):
+                static_dir = temp_dir / f"static_{variante}_{mb}"
+                salida = subprocess.run(
+                    [sys.executable, __file__, "--variante", variante,
+                     "--video", str(video), "--static-dir", str(static_dir)],
+                    check=True, capture_output=True, text=True,
+                )
+                r = json.loads(salida.stdout.strip().splitlines()[-1])
+                print(f"{mb:>5} {variante:>9} {r['peak_rss_mb']:>14.1f} {r['ttfb_s']:>9.3f} {r['payload_bytes']:>13}")
+            video.unlink()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark de extracción de artículos con las páginas guardadas en fixtures/articulos.
+
+Sirve cada página y sus imágenes desde un servidor HTTP local (las imágenes se
+generan según el ancho indicado en su nombre: foto-1280w.jpg mide 1280 px; sin
+ancho, es un original de 4000 px) y compara:
+  - completo:  descarga todo el HTML y todas las imágenes que aparecen en él
+               (img src/data-src y og:image), como hace el paso 1 con el extractor original
+  - streaming: utils.article_stream.extraer_articulo_streaming (HTML limitado, una
+               pasada, top-N imágenes con la variante de srcset adecuada)
+
+En ambos casos las imágenes se descargan con utils.image_downloader.descargar_imagenes.
+
+Uso:
+    python benchmarks/bench_extraccion.py --latencia 0.03
+"""
+import re
+import sys
+import time
+import argparse
+import threading
+from io import BytesIO
+from pathlib import Path
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import metrics
+from utils.article_stream import extraer_articulo_streaming
+from utils.image_downloader import descargar_imagenes
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "articulos"
+ANCHO_ORIGINAL = 4000
+
+
+@lru_cache(maxsize=64)
+def generar_imagen(ancho, formato):
+    img = Image.effect_noise((ancho, ancho * 2 // 3), 30).convert("RGB")
+    buf = BytesIO()
+    img.save(buf, format=formato, quality=85)
+    return buf.getvalue()
+
+
+def contenido_imagen(ruta):
+    coincidencia = re.search(r"-(\d{2,4})w\.(\w+)$", ruta)
+    formato = "WEBP" if ruta.endswith(".webp") else "JPEG"
+    if "avatar" in ruta or "mas-leidas" in ruta:
+        return generar_imagen(100, formato)
+    return generar_imagen(int(coincidencia.group(1)) if coincidencia else ANCHO_ORIGINAL, formato)
+
+
+def crear_servidor(latencia):
+    enviados = {"html": 0, "imagenes": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latencia)
+            ruta = self.path.split("?")[0]
+            if ruta.startswith("/noticia/") and (FIXTURES / f"{ruta.rsplit('/', 1)[1]}.html").exists():
+                html = (FIXTURES / f"{ruta.rsplit('/', 1)[1]}.html").read_text(encoding="utf-8")
+                # Todas las URL absolutas de la página apuntan al servidor local
+                base = f"http://{self.headers['Host']}"
+                data = re.sub(r"https://[a-z0-9.-]+", base, html).encode("utf-8")
+                tipo, contador = "text/html; charset=utf-8", "html"
+            elif ruta.startswith("/img/"):
+                data, tipo, contador = contenido_imagen(ruta), "image/jpeg", "imagenes"
+            else:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                for i in range(0, len(data), 64 * 1024):
+                    self.wfile.write(data[i:i + 64 * 1024])
+                    with lock:
+                        enviados[contador] += len(data[i:i + 64 * 1024])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    class Servidor(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            pass
+
+    servidor = Servidor(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, enviados
+
+
+def extraer_completo(url):
+    """Referencia: HTML completo y todas las URL de imagen que contiene"""
+    html = requests.get(url, timeout=30).text
+    urls = re.findall(r'<meta[^>]+property="og:image"[^>]+content="([^"]+)"', html)
+    for etiqueta in re.findall(r"<img\b[^>]*>", html):
+        origen = re.search(r'\s(?:data-src|src)="([^"]+)"', etiqueta)
+        if origen and not origen.group(1).startswith("data:"):
+            urls.append(requests.compat.urljoin(url, origen.group(1)))
+    return len(html.encode("utf-8")), list(dict.fromkeys(urls))
+
+
+def extraer_streaming(url):
+    antes = metrics._bytes_entrada["extraer_articulo_streaming"]
+    _, urls = extraer_articulo_streaming(url)
+    return metrics._bytes_entrada["extraer_articulo_streaming"] - antes, urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latencia", type=float, default=0.03, help="Segundos de latencia por petición")
+    args = parser.parse_args()
+
+    servidor, enviados = crear_servidor(args.latencia)
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    # Generar las imágenes antes de medir para no contar su creación
+    for fixture in FIXTURES.glob("*.html"):
+        for ruta in set(re.findall(r"/img/[\w.-]+", fixture.read_text(encoding="utf-8"))):
+            contenido_imagen(ruta)
+
+    print(f"{'página':<16} {'modo':<10} {'HTML (KB)':>10} {'imágenes':>9} {'img (MB)':>9} "
+          f"{'extracción (s)':>15} {'total (s)':>10}")
+    for fixture in sorted(FIXTURES.glob("*.html")):
+        url = f"{base}/noticia/{fixture.stem}"
+        for modo, extraer in (("completo", extraer_completo), ("streaming", extraer_streaming)):
+            enviados["imagenes"] = 0
+            inicio = time.perf_counter()
+            bytes_html, urls = extraer(url)
+            extraccion = time.perf_counter() - inicio
+            rutas = descargar_imagenes(urls)
+            total = time.perf_counter() - inicio
+            print(f"{fixture.stem:<16} {modo:<10} {bytes_html / 1024:>10.0f} {len(rutas):>4}/{len(urls):<4} "
+                  f"{enviados['imagenes'] / 1024 ** 2:>9.1f} {extraccion:>15.3f} {total:>10.2f}")
+
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark de las consultas del historial de proyectos.
+
+Siembra N proyectos (100k por defecto) con sus textos e imágenes y mide las
+latencias p50/p95 de:
+  - primera página y páginas profundas con paginación por clave (listar_proyectos)
+  - la misma profundidad con LIMIT/OFFSET, como referencia
+  - búsqueda por título y filtro por URL
+  - carga diferida del detalle de un proyecto
+
+Usa --dsn o DATABASE_URL; si no hay ninguno y está instalado pgserver, arranca
+un PostgreSQL local temporal.
+
+Uso:
+    python benchmarks/bench_historial.py --proyectos 100000 --repeticiones 50
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SEMBRAR = """
+INSERT INTO proyectos (titulo, url_articulo, video_path, fecha_creacion)
+SELECT 'Artículo ' || md5(g::text) || ' sobre ' || (ARRAY['economía','deportes','cultura','tecnología','viajes'])[1 + g %% 5],
+       'https://ejemplo.com/articulo/' || g,
+       '/tmp/videos/' || g || '.mp4',
+       NOW() - (g || ' minutes')::interval
+FROM generate_series(1, %(n)s) AS g;
+
+INSERT INTO textos_proyecto (proyecto_id, orden, texto)
+SELECT p.id, o, 'Texto ' || o || ' del proyecto ' || p.id
+FROM proyectos p, generate_series(0, 7) AS o;
+
+INSERT INTO imagenes_proyecto (proyecto_id, orden, tipo, ruta)
+SELECT p.id, o, t, '/tmp/imagenes/' || p.id || '_' || t || '_' || o || '.jpg'
+FROM proyectos p, generate_series(0, 5) AS o, unnest(ARRAY['original', 'con_texto']) AS t;
+
+ANALYZE;
+"""
+
+
+def percentiles(muestras):
+    ordenadas = sorted(muestras)
+    p95 = ordenadas[min(len(ordenadas) - 1, int(round(0.95 * (len(ordenadas) - 1))))]
+    return statistics.median(ordenadas) * 1000, p95 * 1000
+
+
+def medir(nombre, funcion, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        muestras.append(time.perf_counter() - inicio)
+    p50, p95 = percentiles(muestras)
+    print(f"{nombre:<32} {p50:>9.2f} {p95:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--proyectos", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--profundidad", type=int, default=200, help="Página usada para las medidas profundas")
+    args = parser.parse_args()
+
+    servidor = None
+    if not args.dsn:
+        try:
+            import pgserver
+        except ImportError:
+            parser.error("Indica --dsn o DATABASE_URL (o instala pgserver para usar un PostgreSQL temporal)")
+        servidor = pgserver.get_server(tempfile.mkdtemp(), cleanup_mode="delete")
+        args.dsn = servidor.get_uri()
+    os.environ["DATABASE_URL"] = args.dsn
+
+    from utils import db_pool
+    from utils.history import (listar_proyectos, detalle_proyecto, crear_indices_historial,
+                               TAMANO_PAGINA_HISTORIAL)
+
+    db_pool.inicializar_una_vez()
+    with db_pool.conexion() as conn, conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM proyectos")
+        existentes = cur.fetchone()[0]
+    if existentes < args.proyectos:
+        inicio = time.perf_counter()
+        with db_pool.conexion() as conn, conn.cursor() as cur:
+            cur.execute(SEMBRAR, {"n": args.proyectos - existentes})
+        print(f"Sembrados {args.proyectos - existentes} proyectos en {time.perf_counter() - inicio:.1f} s")
+    db_pool.inicializar_una_vez(crear_indices_historial)
+
+    # Cursor de la página profunda, obtenido recorriendo el historial una vez
+    cursor = None
+    for _ in range(args.profundidad):
+        _, cursor = listar_proyectos(despues=cursor)
+
+    def pagina_offset():
+        with db_pool.conexion() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, titulo, url_articulo, video_path, fecha_creacion FROM proyectos "
+                "ORDER BY fecha_creacion DESC, id DESC LIMIT %s OFFSET %s",
+                (TAMANO_PAGINA_HISTORIAL, TAMANO_PAGINA_HISTORIAL * args.profundidad),
+            )
+            cur.fetchall()
+
+    with db_pool.conexion() as conn, conn.cursor() as cur:
+        cur.execute("SELECT min(id), max(id) FROM proyectos")
+        id_min, id_max = cur.fetchone()
+
+    print(f"{args.proyectos} proyectos, {args.repeticiones} repeticiones, página profunda = {args.profundidad}")
+    print(f"{'consulta':<32} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    medir("primera página", lambda: listar_proyectos(), args.repeticiones)
+    medir("página profunda (clave)", lambda: listar_proyectos(despues=cursor), args.repeticiones)
+    medir("página profunda (OFFSET)", pagina_offset, args.repeticiones)
+    medir("búsqueda por título", lambda: listar_proyectos(busqueda="tecnología"), args.repeticiones)
+    medir("filtro por URL", lambda: listar_proyectos(
+        url_articulo=f"https://ejemplo.com/articulo/{random.randint(1, args.proyectos)}"), args.repeticiones)
+    medir("detalle (al expandir)", lambda: detalle_proyecto(random.randint(id_min, id_max)), args.repeticiones)
+
+    db_pool.cerrar_pool()
+    if servidor is not None:
+        servidor.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Benchmark de render con control de regresiones frente a una línea base guardada.
+
+Genera diapositivas sintéticas con crear_imagen_test (test_moviepy.py) y, para
+cada combinación de resolución, número de diapositivas, motor y preset, mide:
+  - superposición: tiempo de dibujar los textos (etapa superposicion_texto)
+  - codificación:  tiempo de FFmpeg (etapas codificacion y concatenacion)
+  - total:         render completo, sin contar la creación de las imágenes
+  - memoria pico:  RSS máximo (VmHWM) del proceso de render, sin contar FFmpeg
+  - bytes:         tamaño del MP4 generado
+
+Motores:
+  - tuberia:     componer_diapositivas + codificar_frames (cuadros por tubería)
+  - incremental: utils.incremental_render.renderizar_incremental con la caché vacía
+  - concat:      imágenes con texto en disco + codificar_diapositivas
+  - moviepy:     ImageSequenceClip a 24 fps, la ruta original
+
+Cada caso se ejecuta en un intérprete nuevo para que la memoria pico sea la suya.
+Los resultados se escriben en JSON (--salida); con --linea-base se comparan con
+una ejecución anterior y el script termina con código 1 si alguna métrica empeora
+más que --umbral (y que el margen absoluto correspondiente).
+
+Uso:
+    python benchmarks/bench_regresion.py --salida resultados.json
+    python benchmarks/bench_regresion.py --linea-base benchmarks/linea_base_render.json
+    python benchmarks/bench_regresion.py --guardar-linea-base benchmarks/linea_base_render.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from fractions import Fraction
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+MOTORES = ("tuberia", "incremental", "concat", "moviepy")
+DURACION = 3
+# Métricas comparadas con la línea base y margen absoluto por debajo del cual
+# una diferencia se considera ruido
+METRICAS = {
+    "segundos_superposicion": 0.1,
+    "segundos_codificacion": 0.25,
+    "segundos_total": 0.25,
+    "memoria_pico_mb": 10,
+    "bytes_salida": 16 * 1024,
+}
+COLORES = ["white", "lightyellow", "lightblue", "mistyrose", "honeydew"]
+
+
+def clave_caso(caso):
+    return f"{caso['motor']}/{caso['preset']}/{caso['resolucion']}/{caso['diapositivas']}"
+
+
+def renderizar_moviepy(cuadros, duracion, output_path, preset):
+    from utils.slide_encoder import PRESETS
+    try:
+        from moviepy import ImageSequenceClip
+    except ImportError:
+        from moviepy.editor import ImageSequenceClip
+    clip = ImageSequenceClip(cuadros, durations=[duracion] * len(cuadros))
+    clip.write_videofile(str(output_path), fps=24, codec="libx264", audio=False, logger=None,
+                         preset=PRESETS[preset]["preset"], ffmpeg_params=["-crf", str(PRESETS[preset]["crf"])])
+    clip.close()
+
+
+def renderizar(motor, preset, textos, imagenes, resolucion, salida_dir):
+    """Ejecuta un render completo con el motor indicado y devuelve la ruta del MP4"""
+    from utils.metrics import medir_etapa
+    from utils.slide_encoder import codificar_frames, codificar_diapositivas
+    from utils.text_overlay import componer_diapositivas, guardar_diapositivas
+    from utils.incremental_render import renderizar_incremental
+
+    output_path = salida_dir / f"{motor}.mp4"
+    if motor == "incremental":
+        renderizar_incremental(textos, imagenes, output_path, resolucion=resolucion,
+                               duracion=DURACION, preset=preset)
+        return output_path
+
+    with medir_etapa("superposicion_texto") as etapa:
+        cuadros = componer_diapositivas(textos, imagenes, resolucion=resolucion)
+        if motor == "concat":
+            rutas = guardar_diapositivas(cuadros, salida_dir / "diapositivas")
+        etapa.bytes_salida = sum(cuadro.nbytes for cuadro in cuadros)
+    if motor == "tuberia":
+        codificar_frames(cuadros, DURACION, output_path, preset=preset, fps_entrada=1 / Fraction(DURACION))
+    elif motor == "concat":
+        codificar_diapositivas(rutas, DURACION, output_path, preset=preset)
+    elif motor == "moviepy":
+        with medir_etapa("codificacion", incluir_subprocesos=True):
+            renderizar_moviepy(cuadros, DURACION, output_path, preset)
+    else:
+        raise ValueError(f"Motor desconocido: {motor}")
+    return output_path
+
+
+def memoria_pico_mb():
+    """RSS máximo del proceso actual; ru_maxrss no sirve porque se hereda del padre a través de exec"""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_interno(caso):
+    """Se ejecuta en el subproceso; devuelve las medidas de un caso"""
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    from test_moviepy import crear_imagen_test
+    from utils.metrics import capturar_etapas
+
+    ancho, alto = (int(v) for v in caso["resolucion"].split("x"))
+    n = caso["diapositivas"]
+    # Menos imágenes que textos, como en un artículo real: se reutilizan en ciclo
+    imagenes = [crear_imagen_test(f"Imagen {i + 1}", i, size=(ancho, alto), color=COLORES[i % len(COLORES)])
+                for i in range(max(1, n // 3))]
+    textos = [f"Diapositiva {i + 1} de {n}: texto de prueba con la longitud de una frase de artículo"
+              for i in range(n)]
+    salida_dir = Path(tempfile.mkdtemp())
+    try:
+        inicio = time.perf_counter()
+        with capturar_etapas() as muestras:
+            output_path = renderizar(caso["motor"], caso["preset"], textos, imagenes, (ancho, alto), salida_dir)
+        total = time.perf_counter() - inicio
+
+        def segundos(*etapas):
+            return sum(m["segundos"] for m in muestras if m["etapa"] in etapas)
+
+        return {
+            "segundos_superposicion": segundos("superposicion_texto"),
+            "segundos_codificacion": segundos("codificacion", "concatenacion"),
+            "segundos_total": total,
+            "memoria_pico_mb": memoria_pico_mb(),
+            "bytes_salida": output_path.stat().st_size,
+        }
+    finally:
+        shutil.rmtree(salida_dir, ignore_errors=True)
+        for imagen in imagenes:
+            shutil.rmtree(Path(imagen).parent, ignore_errors=True)
+
+
+def medir(caso):
+    # Caché de segmentos vacía en cada ejecución para medir el render completo
+    segmentos_dir = tempfile.mkdtemp()
+    entorno = dict(os.environ, SEGMENTOS_DIR=segmentos_dir, PYTHONPATH=str(RAIZ))
+    try:
+        salida = subprocess.run([sys.executable, __file__, "--interno", json.dumps(caso)],
+                                capture_output=True, text=True, env=entorno)
+    finally:
+        shutil.rmtree(segmentos_dir, ignore_errors=True)
+    if salida.returncode != 0:
+        raise RuntimeError(f"El caso {clave_caso(caso)} falló:\n{salida.stderr[-2000:]}")
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def entorno_ejecucion():
+    from utils.slide_encoder import obtener_ffmpeg
+    version = subprocess.run([obtener_ffmpeg(), "-version"], capture_output=True, text=True).stdout
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=RAIZ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ffmpeg": version.splitlines()[0] if version else None,
+    }
+
+
+def comparar(resultados, linea_base, umbral):
+    """Devuelve las regresiones: (clave, métrica, base, actual) que superan umbral y margen"""
+    base = {r["clave"]: r for r in linea_base["resultados"]}
+    regresiones = []
+    for resultado in resultados:
+        anterior = base.get(resultado["clave"])
+        if anterior is None:
+            continue
+        for metrica, margen in METRICAS.items():
+            actual, referencia = resultado[metrica], anterior.get(metrica)
+            if referencia is None:
+                continue
+            if actual > referencia * (1 + umbral) and actual - referencia > margen:
+                regresiones.append((resultado["clave"], metrica, referencia, actual))
+    return regresiones
+
+
+def main():
+    from utils.slide_encoder import PRESETS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resoluciones", nargs="+", default=["1280x720", "1920x1080"])
+    parser.add_argument("--diapositivas", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--motores", nargs="+", choices=MOTORES, default=list(MOTORES))
+    parser.add_argument("--presets", nargs="+", choices=list(PRESETS), default=["fast", "balanced"])
+    parser.add_argument("--repeticiones", type=int, default=3, help="Se informa la mediana de cada métrica")
+    parser.add_argument("--salida", help="Archivo JSON donde escribir los resultados")
+    parser.add_argument("--linea-base", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--guardar-linea-base", help="Escribe los resultados como nueva línea base")
+    parser.add_argument("--umbral", type=float, default=float(os.environ.get("UMBRAL_REGRESION", 0.2)),
+                        help="Empeoramiento relativo máximo permitido (0.2 = 20%%)")
+    parser.add_argument("--interno", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(medir_interno(json.loads(args.interno))))
+        return
+
+    casos = [{"motor": motor, "preset": preset, "resolucion": resolucion, "diapositivas": n}
+             for resolucion in args.resoluciones for n in args.diapositivas
+             for motor in args.motores for preset in args.presets]
+
+    print(f"{'caso':<38} {'superp. (s)':>11} {'codif. (s)':>10} {'total (s)':>10} "
+          f"{'RSS (MB)':>9} {'tamaño (KB)':>12}")
+    resultados = []
+    for caso in casos:
+        medidas = [medir(caso) for _ in range(args.repeticiones)]
+        resultado = {"clave": clave_caso(caso), **caso,
+                     **{m: statistics.median(medida[m] for medida in medidas) for m in METRICAS}}
+        resultados.append(resultado)
+        print(f"{resultado['clave']:<38} {resultado['segundos_superposicion']:>11.2f} "
+              f"{resultado['segundos_codificacion']:>10.2f} {resultado['segundos_total']:>10.2f} "
+              f"{resultado['memoria_pico_mb']:>9.0f} "
+              f"{resultado['bytes_salida'] / 1024:>12.0f}")
+
+    informe = {"entorno": entorno_ejecucion(), "repeticiones": args.repeticiones, "resultados": resultados}
+    for destino in (args.salida, args.guardar_linea_base):
+        if destino:
+            Path(destino).write_text(json.dumps(informe, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            print(f"Resultados escritos en {destino}")
+
+    if args.linea_base:
+        linea_base = json.loads(Path(args.linea_base).read_text(encoding="utf-8"))
+        if linea_base["entorno"].get("cpus") != informe["entorno"]["cpus"]:
+            print(f"Aviso: la línea base se midió con {linea_base['entorno'].get('cpus')} CPU y esta "
+                  f"ejecución con {informe['entorno']['cpus']}; los tiempos pueden no ser comparables")
+        sin_base = [r["clave"] for r in resultados
+                    if r["clave"] not in {b["clave"] for b in linea_base["resultados"]}]
+        if sin_base:
+            print(f"Casos sin línea base (no se comparan): {', '.join(sin_base)}")
+        regresiones = comparar(resultados, linea_base, args.umbral)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresiones (umbral {args.umbral:.0%}):")
+            for clave, metrica, referencia, actual in regresiones:
+                print(f"  {clave:<38} {metrica:<24} {referencia:>12.2f} -> {actual:>12.2f} "
+                      f"({actual / referencia - 1:+.0%})")
+            sys.exit(1)
+        print(f"\nSin regresiones respecto a {args.linea_base} (umbral {args.umbral:.0%})")
+
+
+if __name__ == "__main__":
+    main()
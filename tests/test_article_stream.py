@@ -0,0 +1,113 @@
+import pytest
+
+from utils import article_stream
+from utils.article_stream import parsear_srcset, elegir_de_srcset, analizar_html, detectar_codificacion
+
+BASE = "https://ejemplo.com/noticias/nota"
+PARRAFO = "Este es un párrafo del artículo con texto suficiente para contar como bloque"
+
+
+def _articulo(titulo, parrafos, clase=""):
+    cuerpo = "".join(f"<p>{titulo} {i}: {PARRAFO}.</p>" for i in range(parrafos))
+    return f'<article class="{clase}"><h2>{titulo}</h2>{cuerpo}</article>'
+
+
+def _fragmentos(html, tamano=64):
+    return [html[i:i + tamano] for i in range(0, len(html), tamano)]
+
+
+def test_parsear_srcset_descriptores_y_comas_en_urls():
+    srcset = "a.jpg 320w, https://cdn.ejemplo.com/i/w_640,h_360/b.jpg 640w, c.jpg 2x, d.jpg"
+    assert parsear_srcset(srcset) == [
+        ("a.jpg", 320.0, "w"),
+        ("https://cdn.ejemplo.com/i/w_640,h_360/b.jpg", 640.0, "w"),
+        ("c.jpg", 2.0, "x"),
+        ("d.jpg", 1.0, "x"),
+    ]
+    assert parsear_srcset("  ") == []
+
+
+@pytest.mark.parametrize("srcset, objetivo, declarado, esperado", [
+    ("a.jpg 480w, b.jpg 1400w, c.jpg 2400w", 1280, None, ("b.jpg", 1400)),
+    ("a.jpg 480w, b.jpg 800w", 1280, None, ("b.jpg", 800)),
+    ("a.jpg 1x, b.jpg 2x", 1280, 700, ("b.jpg", 1400)),
+    ("a.jpg 1x, b.jpg 2x", 1280, None, ("b.jpg", None)),
+    ("", 1280, None, (None, None)),
+])
+def test_elegir_de_srcset(srcset, objetivo, declarado, esperado):
+    assert elegir_de_srcset(srcset, objetivo, declarado) == esperado
+
+
+def test_analizar_html_textos_e_imagenes():
+    html = (
+        '<html><head><meta property="og:title" content="Título de la noticia">'
+        '<meta property="og:image" content="/img/portada.jpg"></head><body>'
+        '<nav><p>Un enlace del menú que no forma parte del artículo en absoluto</p></nav>'
+        '<article><img src="/img/logo.png" width="600" height="300">'
+        '<img srcset="/img/foto-480w.jpg 480w, /img/foto-1600w.jpg 1600w" width="800" height="450" alt="Foto">'
+        + "".join(f"<p>{PARRAFO} {i}.</p>" for i in range(3))
+        + '<div class="share"><p>Compártelo en tus redes sociales favoritas ahora mismo</p></div>'
+        '</article></body></html>'
+    )
+    textos, imagenes, _ = analizar_html(_fragmentos(html), BASE)
+    assert textos == ["Título de la noticia"] + [f"{PARRAFO} {i}." for i in range(3)]
+    assert imagenes == ["https://ejemplo.com/img/portada.jpg", "https://ejemplo.com/img/foto-1600w.jpg"]
+    assert "https://ejemplo.com/img/logo.png" not in imagenes
+
+
+def test_analizar_html_elige_el_articulo_con_mas_texto():
+    html = "<html><body>" + _articulo("Destacado", 3) + _articulo("Cuerpo", 8) + "</body></html>"
+    textos, _, _ = analizar_html(_fragmentos(html), BASE)
+    assert any(t.startswith("Cuerpo 7") for t in textos)
+    assert not any(t.startswith("Destacado") for t in textos)
+
+
+def test_analizar_html_deja_de_leer_tras_el_margen(monkeypatch):
+    monkeypatch.setattr(article_stream, "MARGEN_TRAS_ARTICULO", 1024)
+    relacionados = "".join(_articulo(f"Relacionado {i}", 3) for i in range(50))
+    html = "<html><body>" + _articulo("Cuerpo", 6) + relacionados + "</body></html>"
+    textos, _, leidos = analizar_html(_fragmentos(html), BASE)
+    assert leidos < len(html) / 4
+    assert not any(t.startswith("Relacionado") for t in textos)
+
+
+@pytest.mark.parametrize("inicio, esperada", [
+    (b'<html><head><meta charset="windows-1252">', "cp1252"),
+    (b"<meta http-equiv='Content-Type' content='text/html; charset=ISO-8859-1'>", "iso8859-1"),
+    (b"\xef\xbb\xbf<html>", "utf-8-sig"),
+    (b'<meta charset="desconocida">', None),
+    (b"<html><head><title>", None),
+])
+def test_detectar_codificacion(inicio, esperada):
+    assert detectar_codificacion(inicio) == esperada
+
+
+class _Respuesta:
+    def __init__(self, cuerpo, content_type, encoding=None):
+        self.cuerpo = cuerpo
+        self.headers = {"Content-Type": content_type}
+        self.encoding = encoding
+        self.url = BASE
+
+    def iter_content(self, tamano):
+        for i in range(0, len(self.cuerpo), tamano):
+            yield self.cuerpo[i:i + tamano]
+
+
+class _Etapa:
+    bytes_entrada = 0
+
+
+def test_fragmentos_respuesta_usa_el_meta_charset_sin_cabecera():
+    html = '<html><head><meta charset="windows-1252"></head><body><p>Año, camión</p>'.encode("cp1252")
+    texto = "".join(article_stream._fragmentos_respuesta(_Respuesta(html, "text/html"), 10 ** 6, _Etapa()))
+    assert "Año, camión" in texto
+
+
+def test_fragmentos_respuesta_respeta_la_cabecera_y_el_limite():
+    html = "<p>Año</p>".encode("latin-1") + b"x" * 100
+    respuesta = _Respuesta(html, "text/html; charset=ISO-8859-1", encoding="ISO-8859-1")
+    etapa = _Etapa()
+    texto = "".join(article_stream._fragmentos_respuesta(respuesta, 20, etapa))
+    assert texto.startswith("<p>Año</p>")
+    assert etapa.bytes_entrada == 20
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from utils import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    # Ninguna prueba debe hacer peticiones HEAD salvo que lo indique
+    monkeypatch.setattr(cache, "validadores_url", lambda url: pytest.fail(f"HEAD inesperado a {url}"))
+
+
+def _envejecer(clave, segundos):
+    with cache._conexion(escritura=True) as conn:
+        conn.execute("UPDATE entradas SET creado = creado - ?, usado = usado - ? WHERE clave = ?",
+                     (segundos, segundos, clave))
+
+
+@pytest.mark.parametrize("url, esperada", [
+    ("HTTPS://Ejemplo.com:443/noticia/", "https://ejemplo.com/noticia"),
+    ("http://ejemplo.com:80/a?b=2&a=1#comentarios", "http://ejemplo.com/a?a=1&b=2"),
+    ("https://ejemplo.com/a?utm_source=tw&id=3&fbclid=x", "https://ejemplo.com/a?id=3"),
+    ("https://ejemplo.com", "https://ejemplo.com/"),
+    ("https://ejemplo.com:8443/a", "https://ejemplo.com:8443/a"),
+])
+def test_normalizar_url(url, esperada):
+    assert cache.normalizar_url(url) == esperada
+
+
+def test_clave_url_no_hace_peticiones_y_agrupa_urls_equivalentes():
+    assert cache.clave_url("https://ejemplo.com/a/?utm_medium=x", "articulo") == \
+        cache.clave_url("https://EJEMPLO.com/a", "articulo")
+    assert cache.clave_url("https://ejemplo.com/a", "articulo") != cache.clave_url("https://ejemplo.com/a", "imagenes")
+
+
+def test_acierto_dentro_del_ttl_sin_revalidar():
+    cache.guardar("k", {"textos": ["hola"]})
+    assert cache.obtener("k", "articulo", "https://ejemplo.com/a") == {"textos": ["hola"]}
+    assert cache.estadisticas_cache()["articulo_aciertos"] == 1
+
+
+def test_entrada_caducada_se_revalida_con_los_validadores(monkeypatch):
+    monkeypatch.setattr(cache, "validadores_url", lambda url: ('"v1"', ""))
+    cache.guardar("k", [1], "https://ejemplo.com/a")
+    _envejecer("k", cache.CACHE_TTL + 10)
+    assert cache.obtener("k", "articulo", "https://ejemplo.com/a") == [1]
+
+    _envejecer("k", cache.CACHE_TTL + 10)
+    monkeypatch.setattr(cache, "validadores_url", lambda url: ('"v2"', ""))
+    assert cache.obtener("k", "articulo", "https://ejemplo.com/a") is None
+
+
+def test_expulsar_borra_caducadas_sin_validadores(monkeypatch):
+    cache.guardar("vieja", [1])
+    _envejecer("vieja", cache.CACHE_TTL + 10)
+    cache.guardar("nueva", [2])
+    with cache._conexion() as conn:
+        claves = {fila[0] for fila in conn.execute("SELECT clave FROM entradas")}
+    assert claves == {"nueva"}
+
+
+def test_expulsar_respeta_el_limite_por_orden_lru(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", 250)
+    valor = "x" * 90
+    for i, clave in enumerate(["a", "b"]):
+        cache.guardar(clave, valor)
+        _envejecer(clave, 100 - i)
+    # Usar "a" la hace más reciente que "b"
+    assert cache.obtener("a", "articulo") == valor
+    cache.guardar("c", valor)
+
+    with cache._conexion() as conn:
+        claves = {fila[0] for fila in conn.execute("SELECT clave FROM entradas")}
+    assert claves == {"a", "c"}
+    assert cache.estadisticas_cache()["expulsiones"] == 1
+
+
+def test_expulsar_borra_los_archivos_de_los_blobs(tmp_path, monkeypatch):
+    origen = tmp_path / "imagen.jpg"
+    origen.write_bytes(b"y" * 400)
+    h = cache.guardar_archivo(origen)
+    with cache._conexion() as conn:
+        ruta = conn.execute("SELECT ruta FROM blobs WHERE hash = ?", (h,)).fetchone()[0]
+
+    monkeypatch.setattr(cache, "CACHE_MAX_BYTES", 100)
+    time.sleep(0.01)
+    cache.guardar("k", [1])
+    assert not (tmp_path / ruta).exists()
+
+
+def test_recuperar_archivos_blob_expulsado_durante_la_restauracion(tmp_path, monkeypatch):
+    hashes = []
+    for i in range(2):
+        origen = tmp_path / f"imagen_{i}.jpg"
+        origen.write_bytes(bytes([i]) * 100)
+        hashes.append(cache.guardar_archivo(origen))
+    with cache._conexion() as conn:
+        segundo = conn.execute("SELECT ruta FROM blobs WHERE hash = ?", (hashes[1],)).fetchone()[0]
+
+    enlazar = cache.os.link
+
+    def enlazar_tras_expulsar(origen, destino):
+        # Otro proceso expulsa el segundo blob después de la consulta a la base de datos
+        if origen == segundo:
+            cache.os.unlink(segundo)
+        enlazar(origen, destino)
+
+    monkeypatch.setattr(cache.os, "link", enlazar_tras_expulsar)
+    destino_dir = tmp_path / "destino"
+    assert cache.recuperar_archivos(hashes, destino_dir) is None
+    assert list(destino_dir.iterdir()) == []
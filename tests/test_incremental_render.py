@@ -0,0 +1,109 @@
+import re
+import subprocess
+
+import pytest
+from PIL import Image
+
+from utils import incremental_render
+from utils.slide_encoder import obtener_ffmpeg, FPS_POR_DEFECTO
+
+RESOLUCION = (320, 180)
+
+
+@pytest.fixture(autouse=True)
+def segmentos_temporales(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental_render, "SEGMENTOS_DIR", tmp_path / "segmentos")
+
+
+@pytest.fixture
+def imagenes(tmp_path):
+    rutas = []
+    for i, color in enumerate([(200, 30, 30), (30, 200, 30)]):
+        ruta = tmp_path / f"imagen_{i}.jpg"
+        Image.new("RGB", (400, 300), color).save(ruta)
+        rutas.append(str(ruta))
+    return rutas
+
+
+def info_video(path):
+    """(duración en s, cuadros por segundo) según FFmpeg"""
+    salida = subprocess.run([obtener_ffmpeg(), "-i", str(path)], capture_output=True, text=True).stderr
+    horas, minutos, segundos = re.search(r"Duration: (\d+):(\d+):([\d.]+)", salida).groups()
+    fps = float(re.search(r"([\d.]+) fps", salida).group(1))
+    return int(horas) * 3600 + int(minutos) * 60 + float(segundos), fps
+
+
+def _renderizar(textos, imagenes, salida_dir):
+    salida_dir.mkdir(exist_ok=True)
+    return incremental_render.renderizar_incremental(textos, imagenes, salida_dir / "video.mp4",
+                                                     resolucion=RESOLUCION, duracion=1)
+
+
+def _contar_codificados(monkeypatch):
+    codificados = []
+    original = incremental_render._guardar_segmento
+
+    def guardar(cuadro, duracion, preset, huella):
+        codificados.append(huella)
+        original(cuadro, duracion, preset, huella)
+
+    monkeypatch.setattr(incremental_render, "_guardar_segmento", guardar)
+    return codificados
+
+
+def test_huella_depende_del_contenido_y_de_los_parametros(imagenes):
+    base = ("Hola", imagenes[0], None, RESOLUCION, "degradado", 3, "fast")
+    huella = incremental_render.huella_diapositiva(*base)
+    assert incremental_render.huella_diapositiva(*base) == huella
+    assert incremental_render.huella_diapositiva("Adiós", *base[1:]) != huella
+    assert incremental_render.huella_diapositiva(base[0], imagenes[1], *base[2:]) != huella
+    assert incremental_render.huella_diapositiva(*base[:3], (640, 360), *base[4:]) != huella
+    assert incremental_render.huella_diapositiva(*base[:6], "balanced") != huella
+
+
+def test_solo_se_codifican_las_diapositivas_cambiadas(tmp_path, imagenes, monkeypatch):
+    codificados = _contar_codificados(monkeypatch)
+    imagenes_con_texto, video = _renderizar(["Uno", "Dos", "Tres"], imagenes, tmp_path / "a")
+    assert len(codificados) == 3
+    assert len(imagenes_con_texto) == 3
+
+    codificados.clear()
+    _, video = _renderizar(["Uno", "Otro", "Tres"], imagenes, tmp_path / "b")
+    assert len(codificados) == 1
+    assert info_video(video) == (pytest.approx(3, abs=0.05), FPS_POR_DEFECTO)
+    # El directorio de trabajo con los segmentos enlazados no queda en la salida
+    assert sorted(p.name for p in (tmp_path / "b").iterdir()) == [
+        "imagen_con_texto_1.jpg", "imagen_con_texto_2.jpg", "imagen_con_texto_3.jpg", "video.mp4"]
+
+
+def test_diapositiva_expulsada_durante_el_render_se_regenera(tmp_path, imagenes, monkeypatch):
+    _renderizar(["Uno"], imagenes, tmp_path / "a")
+    guardada = incremental_render.huella_diapositiva("Uno", imagenes[0], None, RESOLUCION, "degradado", 1,
+                                                     incremental_render.PRESET_POR_DEFECTO)
+    codificados = _contar_codificados(monkeypatch)
+    original = incremental_render._codificar_pendientes
+    llamadas = []
+
+    def codificar_y_expulsar(*args, **kwargs):
+        original(*args, **kwargs)
+        llamadas.append(args)
+        if len(llamadas) == 1:
+            # Otro proceso ejecuta limpiar_segmentos justo después de la comprobación
+            for path in incremental_render._rutas_segmento(guardada):
+                path.unlink()
+
+    monkeypatch.setattr(incremental_render, "_codificar_pendientes", codificar_y_expulsar)
+    imagenes_con_texto, video = _renderizar(["Uno", "Dos"], imagenes, tmp_path / "b")
+    assert len(llamadas) == 2
+    assert codificados[0] != guardada
+    assert codificados[1:] == [guardada]
+    assert len(imagenes_con_texto) == 2
+    assert (tmp_path / "b" / "video.mp4").stat().st_size > 0
+
+
+def test_borrador_usa_un_cuadro_por_diapositiva(tmp_path, imagenes):
+    _, borrador = incremental_render.renderizar_borrador(["Uno", "Dos"], imagenes, tmp_path / "borrador.mp4",
+                                                         resolucion=RESOLUCION, duracion=1)
+    duracion, fps = info_video(borrador)
+    assert duracion == pytest.approx(2, abs=0.05)
+    assert fps <= 1
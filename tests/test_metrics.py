@@ -0,0 +1,81 @@
+import socket
+
+import pytest
+
+from utils import metrics
+
+
+@pytest.fixture
+def servidor_limpio(monkeypatch):
+    monkeypatch.setattr(metrics, "_servidor", None)
+    monkeypatch.setattr(metrics, "_servidor_fallido", False)
+    yield
+    if metrics._servidor is not None:
+        metrics._servidor.shutdown()
+        metrics._servidor.server_close()
+
+
+requiere_clear_refs = pytest.mark.skipif(not metrics._reiniciar_pico(),
+                                         reason="Sin /proc/self/clear_refs no se puede medir el pico por etapa")
+
+
+def _reservar(mb):
+    reservado = bytearray(mb * 1024 ** 2)
+    reservado[::4096] = b"x" * len(reservado[::4096])
+    return reservado
+
+
+@requiere_clear_refs
+def test_medir_etapa_registra_el_pico_aunque_se_libere_la_memoria():
+    with metrics.medir_etapa("prueba_pico") as etapa:
+        inicio, _ = metrics._memoria_proceso()
+        bloque = _reservar(64)
+        del bloque
+    final, _ = metrics._memoria_proceso()
+    muestra = etapa.como_dict()
+    assert muestra["memoria_pico"] >= inicio + 48 * 1024 ** 2
+    assert muestra["memoria_pico"] > final + 32 * 1024 ** 2
+    texto = metrics.exportar_prometheus()
+    assert 'app_etapa_memoria_pico_bytes{etapa="prueba_pico"}' in texto
+
+
+@requiere_clear_refs
+def test_pico_por_etapa_no_arrastra_el_de_etapas_anteriores():
+    with metrics.medir_etapa("prueba_grande"):
+        bloque = _reservar(96)
+        del bloque
+    with metrics.medir_etapa("prueba_pequena") as pequena:
+        pass
+    rss, _ = metrics._memoria_proceso()
+    assert pequena.memoria_pico < rss + 16 * 1024 ** 2
+
+
+@requiere_clear_refs
+def test_etapa_externa_conserva_el_pico_de_una_anidada():
+    with metrics.medir_etapa("prueba_externa") as externa:
+        with metrics.medir_etapa("prueba_interna"):
+            bloque = _reservar(64)
+            del bloque
+        with metrics.medir_etapa("prueba_posterior"):
+            pass
+    rss, _ = metrics._memoria_proceso()
+    assert externa.memoria_pico > rss + 32 * 1024 ** 2
+
+
+def test_servidor_escucha_solo_en_local_por_defecto(servidor_limpio):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    servidor = metrics.iniciar_servidor_metricas(puerto)
+    assert servidor.server_address[0] == "127.0.0.1"
+    assert metrics.iniciar_servidor_metricas(puerto) is servidor
+
+
+def test_fallo_al_abrir_el_puerto_no_se_reintenta(servidor_limpio, caplog):
+    with socket.socket() as ocupado:
+        ocupado.bind(("127.0.0.1", 0))
+        ocupado.listen()
+        puerto = ocupado.getsockname()[1]
+        assert metrics.iniciar_servidor_metricas(puerto) is None
+        assert metrics.iniciar_servidor_metricas(puerto) is None
+    assert len([r for r in caplog.records if "servidor de métricas" in r.getMessage()]) == 1
@@ -0,0 +1,79 @@
+import re
+import subprocess
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from utils import multi_render
+from utils.slide_encoder import obtener_ffmpeg, FPS_POR_DEFECTO
+
+
+def dimensiones_video(path):
+    salida = subprocess.run([obtener_ffmpeg(), "-i", str(path)], capture_output=True, text=True).stderr
+    ancho, alto = re.search(r"Video: .*?, (\d{2,5})x(\d{2,5})", salida).groups()
+    return int(ancho), int(alto)
+
+
+def info_video(path):
+    """(duración en s, r_frame_rate) según FFmpeg"""
+    salida = subprocess.run([obtener_ffmpeg(), "-i", str(path)], capture_output=True, text=True).stderr
+    horas, minutos, segundos = re.search(r"Duration: (\d+):(\d+):([\d.]+)", salida).groups()
+    fps = float(re.search(r"([\d.]+) tbr", salida).group(1))
+    return int(horas) * 3600 + int(minutos) * 60 + float(segundos), fps
+
+
+@pytest.fixture
+def imagenes(tmp_path):
+    rutas = []
+    for i, color in enumerate(["red", "green", "blue"]):
+        path = tmp_path / f"imagen_{i}.jpg"
+        Image.new("RGB", (800, 600), color).save(path)
+        rutas.append(str(path))
+    return rutas
+
+
+@pytest.mark.parametrize("resolucion, esperada", [
+    ((1280, 720), (640, 360)),
+    ((720, 1280), (360, 640)),
+    ((1080, 1080), (480, 480)),
+    ((320, 180), (320, 180)),
+])
+def test_resolucion_preview_conserva_la_proporcion(resolucion, esperada):
+    assert multi_render.resolucion_preview(resolucion) == esperada
+
+
+def test_preview_de_un_principal_vertical_no_se_deforma(imagenes, tmp_path, monkeypatch):
+    monkeypatch.setitem(multi_render.FORMATOS, "9:16", (180, 320))
+    _, videos = multi_render.renderizar_multiformato(["Uno", "Dos"], imagenes, tmp_path, "Prueba",
+                                                     formatos=["9:16"], preview=True, duracion=1)
+    assert set(videos) == {"9:16", "preview"}
+    ancho, alto = dimensiones_video(videos["preview"])
+    assert ancho < alto
+
+
+def test_formatos_entregables_a_frecuencia_constante(imagenes, tmp_path, monkeypatch):
+    for formato, (ancho, alto) in {"16:9": (320, 180), "9:16": (180, 320), "1:1": (240, 240)}.items():
+        monkeypatch.setitem(multi_render.FORMATOS, formato, (ancho, alto))
+    _, videos = multi_render.renderizar_multiformato(["Uno", "Dos", "Tres"], imagenes, tmp_path, "Prueba",
+                                                     preview=True, duracion=1)
+    assert set(videos) == {"16:9", "9:16", "1:1", "preview"}
+    for formato in ("16:9", "9:16", "1:1"):
+        assert info_video(videos[formato]) == (pytest.approx(3, abs=0.05), FPS_POR_DEFECTO)
+    # La vista previa conserva un cuadro por diapositiva
+    duracion, fps = info_video(videos["preview"])
+    assert duracion == pytest.approx(3, abs=0.05)
+    assert fps <= 1
+
+
+def test_imagenes_decodificadas_respetan_el_limite(imagenes):
+    decodificadas = multi_render._ImagenesDecodificadas([(320, 180)], max_bytes=1)
+    for imagen in imagenes * 2:
+        decodificadas.obtener(imagen)
+    assert list(decodificadas._cache) == [imagenes[-1]]
+
+    sin_limite = multi_render._ImagenesDecodificadas([(320, 180)])
+    for imagen in imagenes * 2:
+        sin_limite.obtener(imagen)
+    assert len(sin_limite._cache) == 3
+    assert sin_limite.bytes_leidos == sum(Path(imagen).stat().st_size for imagen in imagenes)
@@ -0,0 +1,35 @@
+from concurrent.futures import Future
+
+import pytest
+
+from utils import render_jobs
+
+
+@pytest.fixture
+def trabajo_terminado(monkeypatch):
+    monkeypatch.setattr(render_jobs, "_trabajos", {})
+    monkeypatch.setattr(render_jobs, "_terminados", {})
+    monkeypatch.setattr(render_jobs, "_progreso", None)
+    futuro = Future()
+    futuro.set_result(((["img.jpg"], "video.mp4", {"16:9": "video.mp4"}), []))
+    render_jobs._trabajos["job"] = futuro
+    return "job"
+
+
+def test_resultado_se_conserva_hasta_descartarlo(trabajo_terminado):
+    primero = render_jobs.estado_render(trabajo_terminado)
+    # Una consulta interrumpida (p. ej. por un rerun de Streamlit) puede repetirse
+    segundo = render_jobs.estado_render(trabajo_terminado)
+    assert primero["estado"] == segundo["estado"] == render_jobs.TERMINADO
+    assert segundo["resultado"] == (["img.jpg"], "video.mp4", {"16:9": "video.mp4"})
+
+    render_jobs.descartar_render(trabajo_terminado)
+    assert render_jobs.estado_render(trabajo_terminado)["estado"] == render_jobs.ERROR
+
+
+def test_resultado_sin_confirmar_caduca(trabajo_terminado, monkeypatch):
+    render_jobs._registrar_metricas_render(render_jobs._trabajos[trabajo_terminado])
+    monkeypatch.setattr(render_jobs, "TTL_RESULTADOS", -1)
+    with render_jobs._lock:
+        render_jobs._olvidar_caducados()
+    assert trabajo_terminado not in render_jobs._trabajos
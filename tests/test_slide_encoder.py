@@ -0,0 +1,57 @@
+import re
+import subprocess
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.slide_encoder import codificar_diapositivas, codificar_frames, obtener_ffmpeg
+
+
+def duracion_video(path):
+    salida = subprocess.run([obtener_ffmpeg(), "-i", str(path)], capture_output=True, text=True).stderr
+    horas, minutos, segundos = re.search(r"Duration: (\d+):(\d+):([\d.]+)", salida).groups()
+    return int(horas) * 3600 + int(minutos) * 60 + float(segundos)
+
+
+def cuadros_video(path):
+    salida = subprocess.run([obtener_ffmpeg(), "-stats", "-i", str(path), "-map", "0:v", "-f", "null", "-"],
+                            capture_output=True, text=True).stderr
+    return int(re.findall(r"frame=\s*(\d+)", salida)[-1])
+
+
+@pytest.fixture
+def imagenes(tmp_path):
+    rutas = []
+    for i, color in enumerate(["red", "green", "blue"]):
+        path = tmp_path / f"diapositiva_{i}.jpg"
+        Image.new("RGB", (320, 180), color).save(path)
+        rutas.append(str(path))
+    return rutas
+
+
+@pytest.mark.parametrize("fps", [None, 24])
+def test_codificar_diapositivas_respeta_las_duraciones(imagenes, tmp_path, fps):
+    output_path = tmp_path / "video.mp4"
+    codificar_diapositivas(imagenes, [2, 3, 4], output_path, preset="fast", fps=fps)
+    assert duracion_video(output_path) == pytest.approx(9, abs=0.1)
+    if fps:
+        assert cuadros_video(output_path) == pytest.approx(9 * fps, abs=1)
+
+
+def test_codificar_diapositivas_duracion_unica(imagenes, tmp_path):
+    output_path = tmp_path / "video.mp4"
+    codificar_diapositivas(imagenes, 1.5, output_path, preset="fast")
+    assert duracion_video(output_path) == pytest.approx(4.5, abs=0.1)
+
+
+def test_codificar_frames_respeta_las_duraciones(tmp_path):
+    cuadros = [np.full((180, 320, 3), valor, dtype=np.uint8) for valor in (0, 128, 255)]
+    output_path = tmp_path / "video.mp4"
+    codificar_frames(cuadros, [2, 3, 4], output_path, preset="fast")
+    assert duracion_video(output_path) == pytest.approx(9, abs=0.3)
+
+
+def test_codificar_diapositivas_sin_imagenes(tmp_path):
+    with pytest.raises(ValueError):
+        codificar_diapositivas([], 3, tmp_path / "video.mp4")
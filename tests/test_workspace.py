@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+from utils import workspace
+
+
+@pytest.fixture(autouse=True)
+def espacio_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "WORKSPACE_DIR", tmp_path / "workspace")
+    monkeypatch.setattr(workspace, "ALMACEN_DIR", tmp_path / "almacen")
+    monkeypatch.setattr(workspace, "DESCARGAS_DIR", tmp_path / "descargas")
+    monkeypatch.setattr(workspace, "_referencias", {})
+
+
+def _envejecer(directorio, segundos):
+    marca = directorio / workspace.MARCA_USO
+    antes = time.time() - segundos
+    os.utime(marca, (antes, antes))
+
+
+def _espacio_abandonado(nombre, bytes_archivo, edad):
+    espacio = workspace.espacio_sesion(nombre)
+    (espacio.directorio / "video.mp4").write_bytes(b"x" * bytes_archivo)
+    espacio.cerrar()
+    _envejecer(espacio.directorio, edad)
+    return espacio.directorio
+
+
+def test_limpiar_espacio_expulsa_primero_lo_menos_usado():
+    antiguo = _espacio_abandonado("antiguo", 1000, workspace.EDAD_MINIMA_LIMPIEZA + 200)
+    reciente = _espacio_abandonado("reciente", 1000, workspace.EDAD_MINIMA_LIMPIEZA + 100)
+    assert workspace.limpiar_espacio(max_bytes=1500) == (1, 1000)
+    assert not antiguo.exists()
+    assert reciente.exists()
+
+
+def test_limpiar_espacio_respeta_referencias_y_edad_minima():
+    en_uso = workspace.espacio_sesion("en_uso")
+    (en_uso.directorio / "video.mp4").write_bytes(b"x" * 1000)
+    _envejecer(en_uso.directorio, workspace.TTL_ESPACIO + 100)
+    nuevo = _espacio_abandonado("nuevo", 1000, 0)
+    assert workspace.limpiar_espacio(max_bytes=0) == (0, 0)
+    assert en_uso.directorio.exists() and nuevo.exists()
+
+
+def test_limpiar_espacio_borra_lo_caducado_aunque_haya_cuota():
+    caducado = _espacio_abandonado("caducado", 10, workspace.TTL_ESPACIO + 100)
+    assert workspace.limpiar_espacio(max_bytes=10 ** 9) == (1, 10)
+    assert not caducado.exists()
+
+
+def test_enlaces_duros_cuentan_una_vez():
+    original = _espacio_abandonado("original", 1000, workspace.EDAD_MINIMA_LIMPIEZA + 200)
+    publicado = workspace.DESCARGAS_DIR / "video.mp4"
+    publicado.parent.mkdir(parents=True)
+    os.link(original / "video.mp4", publicado)
+    assert sum(tamano for _, tamano, _ in workspace._entradas()) == 1000
+    # Con el enlace contado una vez no se supera la cuota y no se borra nada
+    assert workspace.limpiar_espacio(max_bytes=1500) == (0, 0)
+
+
+def test_reservar_protege_el_espacio_hasta_soltarlo():
+    directorio = _espacio_abandonado("render", 1000, workspace.TTL_ESPACIO + 100)
+    soltar = workspace.reservar(directorio / "render_abc" / "video.mp4")
+    _envejecer(directorio, workspace.TTL_ESPACIO + 100)
+    assert workspace.limpiar_espacio(max_bytes=0) == (0, 0)
+
+    soltar()
+    soltar()
+    assert workspace._referencias == {}
+    _envejecer(directorio, workspace.TTL_ESPACIO + 100)
+    assert workspace.limpiar_espacio(max_bytes=0) == (1, 1000)
+
+
+def test_reservar_fuera_del_espacio_no_hace_nada(tmp_path):
+    workspace.reservar(tmp_path / "otro")()
+    assert workspace._referencias == {}
@@ -0,0 +1,431 @@
+import os
+import re
+import codecs
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+from utils.metrics import medir_etapa
+
+# Bytes máximos de HTML que se leen de un artículo
+MAX_BYTES_HTML = int(os.environ.get("MAX_BYTES_HTML", 1536 * 1024))
+# Imágenes candidatas que se devuelven (y por tanto se descargan) por artículo
+MAX_IMAGENES_ARTICULO = int(os.environ.get("MAX_IMAGENES_ARTICULO", 8))
+# Ancho de salida para el que se elige la variante de srcset
+ANCHO_OBJETIVO = 1280
+MIN_LADO_IMAGEN = 200
+MIN_CARACTERES_BLOQUE = 40
+CHUNK_SIZE = 16 * 1024
+# Caracteres de HTML que se siguen leyendo tras cerrar un <article> por si el cuerpo real viene después
+MARGEN_TRAS_ARTICULO = int(os.environ.get("MARGEN_TRAS_ARTICULO", 64 * 1024))
+TIMEOUT = (5, 20)
+
+ETIQUETAS_IGNORADAS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer",
+                       "aside", "form", "button", "select", "iframe"}
+ETIQUETAS_BLOQUE = {"p", "h1", "h2", "h3", "li", "blockquote"}
+ETIQUETAS_VACIAS = {"img", "source", "meta", "link", "br", "hr", "input", "wbr", "area", "base", "col",
+                    "embed", "param", "track"}
+PATRON_CUERPO = re.compile(r"article|content|story|post|entry|cuerpo|noticia|body", re.I)
+PATRON_RUIDO = re.compile(r"comment|related|share|social|newsletter|promo|banner|publi|advert|sidebar|"
+                          r"footer|menu|breadcrumb|relacionad|comentario", re.I)
+PATRON_IMAGEN_DESCARTADA = re.compile(r"logo|icon|sprite|avatar|pixel|spacer|blank|tracking|badge|"
+                                      r"emoji|/ads?/|doubleclick|1x1", re.I)
+PATRON_DESCRIPTOR = re.compile(r"^(\d+(?:\.\d+)?)([wx])$")
+PATRON_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([A-Za-z0-9_.:-]+)", re.I)
+
+
+def _entero(valor):
+    try:
+        return int(float(str(valor).strip().rstrip("px")))
+    except (TypeError, ValueError):
+        return None
+
+
+def parsear_srcset(srcset):
+    """Devuelve [(url, valor, 'w'|'x')] a partir de un atributo srcset"""
+    candidatos = []
+    # Las URL pueden contener comas; los candidatos se separan por ", " tras el descriptor
+    for parte in re.split(r",\s+(?=\S)", srcset.strip()):
+        trozos = parte.strip().split()
+        if not trozos:
+            continue
+        descriptor = PATRON_DESCRIPTOR.match(trozos[1]) if len(trozos) > 1 else None
+        if descriptor:
+            candidatos.append((trozos[0], float(descriptor.group(1)), descriptor.group(2)))
+        else:
+            candidatos.append((trozos[0], 1.0, "x"))
+    return candidatos
+
+
+def elegir_de_srcset(srcset, ancho_objetivo=ANCHO_OBJETIVO, ancho_declarado=None):
+    """
+    Elige la variante más pequeña que cubre el ancho objetivo (o la mayor si
+    ninguna llega), en lugar de descargar siempre el original.
+
+    Returns:
+        tuple: (url, ancho estimado o None), o (None, None) si el srcset está vacío.
+    """
+    candidatos = []
+    for url, valor, tipo in parsear_srcset(srcset):
+        if tipo == "w":
+            candidatos.append((url, valor))
+        else:
+            candidatos.append((url, valor * ancho_declarado if ancho_declarado else None))
+    con_ancho = sorted((c for c in candidatos if c[1]), key=lambda c: c[1])
+    if not con_ancho:
+        return (candidatos[-1][0], None) if candidatos else (None, None)
+    for url, ancho in con_ancho:
+        if ancho >= ancho_objetivo:
+            return url, ancho
+    return con_ancho[-1]
+
+
+class _Imagen:
+    __slots__ = ("url", "ancho", "alto", "alt", "posicion", "en_cuerpo", "en_ruido", "og")
+
+    def __init__(self, url, ancho, alto, alt, posicion, en_cuerpo, en_ruido, og=False):
+        self.url = url
+        self.ancho = ancho
+        self.alto = alto
+        self.alt = alt
+        self.posicion = posicion
+        self.en_cuerpo = en_cuerpo
+        self.en_ruido = en_ruido
+        self.og = og
+
+    def puntuacion(self):
+        puntos = 0.0
+        if self.og:
+            puntos += 3
+        if self.en_cuerpo:
+            puntos += 2
+        if self.en_ruido:
+            puntos -= 3
+        if self.ancho and self.alto:
+            # Imágenes grandes y de proporción razonable primero, sin premiar los originales gigantes
+            puntos += min(self.ancho * self.alto, ANCHO_OBJETIVO * 720) / (ANCHO_OBJETIVO * 720) * 2
+            if max(self.ancho, self.alto) / max(1, min(self.ancho, self.alto)) > 3:
+                puntos -= 2
+        if self.alt:
+            puntos += 0.5
+        # Las primeras imágenes del artículo suelen ser las relevantes
+        puntos -= min(self.posicion, 20) * 0.05
+        return puntos
+
+
+class _ParserArticulo(HTMLParser):
+    """Recorre el HTML una sola vez recogiendo bloques de texto e imágenes candidatas"""
+
+    def __init__(self, base_url, ancho_objetivo):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.ancho_objetivo = ancho_objetivo
+        self.pila = []              # (etiqueta, es_cuerpo, es_ruido, ignorada)
+        self.ignorada = 0
+        self.cuerpo = 0
+        self.ruido = 0
+        self.enlace = 0
+        self.bloque = None          # [etiqueta, partes, caracteres_en_enlaces]
+        self.bloques = []           # (texto, en_cuerpo, densidad_enlaces, etiqueta)
+        self.imagenes = []
+        self.og_image = None
+        self.titulo = ""
+        self._en_title = False
+        self.picture = []           # srcset de <source> del <picture> en curso
+        self.fin_body = False
+        self.inicios_articulo = []  # len(self.bloques) al abrir cada <article>
+        self.articulo = None        # (caracteres, inicio, fin) del <article> con más texto
+        self.leidos = 0
+        self.leidos_articulo = 0    # self.leidos al elegir self.articulo
+
+    def feed(self, data):
+        self.leidos += len(data)
+        super().feed(data)
+
+    @property
+    def terminado(self):
+        """Cerrado el cuerpo, o sin un <article> mejor tras MARGEN_TRAS_ARTICULO caracteres"""
+        if self.fin_body:
+            return True
+        return self.articulo is not None and self.leidos - self.leidos_articulo >= MARGEN_TRAS_ARTICULO
+
+    # --- pila de contexto ---
+    def _abrir(self, tag, attrs):
+        clases = f"{attrs.get('class', '')} {attrs.get('id', '')} {attrs.get('itemprop', '')}"
+        es_cuerpo = tag in ("article", "main") or bool(PATRON_CUERPO.search(clases)) and tag in ("div", "section")
+        es_ruido = bool(PATRON_RUIDO.search(clases)) or attrs.get("aria-hidden") == "true"
+        # La cabecera del artículo (título, imagen principal) no es la de la página
+        ignorada = tag in ETIQUETAS_IGNORADAS and not (tag == "header" and self.cuerpo)
+        if tag == "article":
+            self.inicios_articulo.append(len(self.bloques))
+        self.pila.append((tag, es_cuerpo, es_ruido, ignorada))
+        self.cuerpo += es_cuerpo
+        self.ruido += es_ruido
+        self.ignorada += ignorada
+
+    def _cerrar(self, tag):
+        # Tolerar HTML mal cerrado: desapilar hasta la etiqueta correspondiente
+        if not any(t == tag for t, *_ in self.pila):
+            return
+        while self.pila:
+            t, es_cuerpo, es_ruido, ignorada = self.pila.pop()
+            self.cuerpo -= es_cuerpo
+            self.ruido -= es_ruido
+            self.ignorada -= ignorada
+            if t == "article" and self.inicios_articulo:
+                self._articulo_cerrado(self.inicios_articulo.pop())
+            if t == tag:
+                break
+
+    def _articulo_cerrado(self, inicio):
+        # Un <article> con varios párrafos puede ser el cuerpo; los teasers no cuentan. Si
+        # más adelante se cierra otro con más texto (el primero era p. ej. un destacado),
+        # ese pasa a ser el cuerpo
+        parrafos = [len(texto) for texto, _, densidad, _ in self.bloques[inicio:]
+                    if len(texto) >= MIN_CARACTERES_BLOQUE and densidad <= 0.5]
+        if len(parrafos) >= 3 and (self.articulo is None or sum(parrafos) > self.articulo[0]):
+            self.articulo = (sum(parrafos), inicio, len(self.bloques))
+            self.leidos_articulo = self.leidos
+
+    # --- eventos del parser ---
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: (v or "") for k, v in attrs}
+        if tag == "meta":
+            propiedad = attrs.get("property") or attrs.get("name") or ""
+            if propiedad in ("og:image", "og:image:url", "twitter:image") and not self.og_image:
+                self.og_image = urljoin(self.base_url, attrs.get("content", "").strip())
+            elif propiedad == "og:title" and attrs.get("content"):
+                self.titulo = attrs["content"].strip()
+            return
+        if tag == "title":
+            self._en_title = True
+        if tag in ETIQUETAS_VACIAS:
+            if tag == "img":
+                self._imagen(attrs)
+            elif tag == "source" and self.pila and any(t == "picture" for t, *_ in self.pila):
+                srcset = attrs.get("srcset") or attrs.get("data-srcset")
+                if srcset and not attrs.get("type", "").endswith(("svg+xml",)):
+                    self.picture.append(srcset)
+            return
+
+        self._abrir(tag, attrs)
+        if tag == "picture":
+            self.picture = []
+        if tag == "a":
+            self.enlace += 1
+        if tag in ETIQUETAS_BLOQUE and not self.ignorada:
+            self._terminar_bloque()
+            self.bloque = [tag, [], 0]
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ETIQUETAS_VACIAS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._en_title = False
+        if tag in ETIQUETAS_VACIAS:
+            return
+        if tag == "a":
+            self.enlace = max(0, self.enlace - 1)
+        # Un párrafo sin cerrar termina con su <article>
+        if self.bloque is not None and tag in (self.bloque[0], "article"):
+            self._terminar_bloque()
+        self._cerrar(tag)
+        if tag == "picture":
+            self.picture = []
+        # Cerrado el cuerpo del artículo (ver terminado) el resto no interesa
+        if tag == "body":
+            self.fin_body = True
+
+    def handle_data(self, data):
+        if self._en_title and not self.titulo:
+            self.titulo = data.strip()
+        if self.bloque is not None and not self.ignorada:
+            self.bloque[1].append(data)
+            if self.enlace:
+                self.bloque[2] += len(data.strip())
+
+    def _terminar_bloque(self):
+        if self.bloque is None:
+            return
+        tag, partes, en_enlaces = self.bloque
+        self.bloque = None
+        texto = re.sub(r"\s+", " ", "".join(partes)).strip()
+        if texto and not self.ruido:
+            self.bloques.append((texto, self.cuerpo > 0, en_enlaces / max(1, len(texto)), tag))
+
+    def _imagen(self, attrs):
+        # Las imágenes dentro de <noscript> son el respaldo de las de carga diferida
+        if {t for t, _, _, ignorada in self.pila if ignorada} - {"noscript"}:
+            return
+        ancho = _entero(attrs.get("width") or attrs.get("data-width"))
+        alto = _entero(attrs.get("height") or attrs.get("data-height"))
+        srcsets = self.picture + [attrs.get("data-srcset") or attrs.get("srcset") or ""]
+        url = None
+        for srcset in srcsets:
+            if srcset:
+                url, ancho_elegido = elegir_de_srcset(srcset, self.ancho_objetivo, ancho)
+                if url:
+                    if ancho_elegido and ancho and alto:
+                        alto, ancho = round(alto * ancho_elegido / ancho), int(ancho_elegido)
+                    elif ancho_elegido:
+                        ancho = int(ancho_elegido)
+                    break
+        if not url:
+            url = attrs.get("data-src") or attrs.get("data-lazy-src") or attrs.get("data-original") \
+                or attrs.get("src")
+        if not url or url.startswith("data:"):
+            return
+        url = urljoin(self.base_url, url.strip())
+        ruta = urlparse(url).path.lower()
+        if ruta.endswith((".svg", ".gif", ".ico")) or PATRON_IMAGEN_DESCARTADA.search(url):
+            return
+        if (ancho and ancho < MIN_LADO_IMAGEN) or (alto and alto < MIN_LADO_IMAGEN):
+            return
+        self.imagenes.append(_Imagen(url, ancho, alto, attrs.get("alt", "").strip(), len(self.imagenes),
+                                     self.cuerpo > 0, self.ruido > 0))
+
+    # --- resultado ---
+    def textos(self):
+        self._terminar_bloque()
+        bloques = self.bloques
+        if self.articulo is not None:
+            # Solo el <article> con más texto: los demás son destacados o artículos relacionados
+            _, inicio, fin = self.articulo
+            bloques = bloques[inicio:fin]
+        hay_cuerpo = any(en_cuerpo for _, en_cuerpo, _, _ in bloques)
+        textos = []
+        for texto, en_cuerpo, densidad, tag in bloques:
+            if hay_cuerpo and not en_cuerpo:
+                continue
+            if densidad > 0.5:
+                continue
+            if tag.startswith("h") and len(texto) >= 10 or len(texto) >= MIN_CARACTERES_BLOQUE:
+                if texto not in textos:
+                    textos.append(texto)
+        if self.titulo and self.titulo not in textos:
+            textos.insert(0, self.titulo)
+        return textos
+
+    def mejores_imagenes(self, maximo):
+        candidatas = list(self.imagenes)
+        if self.og_image and not PATRON_IMAGEN_DESCARTADA.search(self.og_image):
+            # Si og:image es una de las imágenes de la página se usa su variante de srcset
+            clave_og = _clave_imagen(self.og_image)
+            iguales = [i for i in candidatas if _clave_imagen(i.url) == clave_og]
+            for imagen in iguales:
+                imagen.og = True
+            if not iguales:
+                candidatas.append(_Imagen(self.og_image, None, None, "", 0, True, False, og=True))
+        vistas = set()
+        unicas = []
+        for imagen in sorted(candidatas, key=lambda i: i.puntuacion(), reverse=True):
+            clave = _clave_imagen(imagen.url)
+            if clave in vistas:
+                continue
+            vistas.add(clave)
+            unicas.append(imagen.url)
+        return unicas[:maximo]
+
+
+def _clave_imagen(url):
+    """Identifica las variantes de una misma imagen (foto-640w.jpg, foto-1280x720.webp, foto.jpg?w=800)"""
+    ruta = urlparse(url).path
+    ruta = re.sub(r"\.\w+$", "", ruta)
+    return re.sub(r"[-_](\d{2,4}w|\d{2,4}x\d{2,4})$", "", ruta)
+
+
+def analizar_html(fragmentos, base_url, max_imagenes=MAX_IMAGENES_ARTICULO, ancho_objetivo=ANCHO_OBJETIVO):
+    """
+    Analiza un artículo a partir de fragmentos de HTML (str) en una sola pasada.
+
+    Deja de consumir fragmentos cuando termina el cuerpo de la página o cuando
+    tras el <article> con más texto se han leído MARGEN_TRAS_ARTICULO caracteres
+    sin encontrar otro mejor.
+
+    Returns:
+        tuple: (textos, imagenes_urls, caracteres leídos)
+    """
+    parser = _ParserArticulo(base_url, ancho_objetivo)
+    leidos = 0
+    for fragmento in fragmentos:
+        leidos += len(fragmento)
+        parser.feed(fragmento)
+        if parser.terminado:
+            break
+    parser.close()
+    return parser.textos(), parser.mejores_imagenes(max_imagenes), leidos
+
+
+def detectar_codificacion(bloque):
+    """Codificación declarada al principio del HTML (BOM o <meta charset>), o None"""
+    if bloque.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if bloque.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    declarada = PATRON_META_CHARSET.search(bloque[:4096])
+    if declarada:
+        try:
+            return codecs.lookup(declarada.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return None
+
+
+def _fragmentos_respuesta(respuesta, max_bytes, etapa):
+    """Decodifica el cuerpo por bloques sin superar max_bytes"""
+    decodificador = None
+    for bloque in respuesta.iter_content(CHUNK_SIZE):
+        restante = max_bytes - etapa.bytes_entrada
+        if restante <= 0:
+            logging.info(f"HTML truncado a {max_bytes} bytes: {respuesta.url}")
+            break
+        bloque = bloque[:restante]
+        etapa.bytes_entrada += len(bloque)
+        if decodificador is None:
+            # Sin charset en la cabecera se usa el declarado en el propio HTML y, si no hay, UTF-8
+            if "charset" in respuesta.headers.get("Content-Type", "").lower():
+                codificacion = respuesta.encoding
+            else:
+                codificacion = detectar_codificacion(bloque)
+            decodificador = _decodificador(codificacion or "utf-8")
+        yield decodificador.decode(bloque)
+    if decodificador is not None:
+        yield decodificador.decode(b"", final=True)
+
+
+def _decodificador(codificacion):
+    try:
+        return codecs.getincrementaldecoder(codificacion)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+def extraer_articulo_streaming(url, max_bytes=MAX_BYTES_HTML, max_imagenes=MAX_IMAGENES_ARTICULO,
+                               ancho_objetivo=ANCHO_OBJETIVO):
+    """
+    Alternativa ligera a extraer_contenido_articulo con el mismo valor de retorno.
+
+    Lee el HTML por bloques con un límite de bytes, lo analiza en una sola pasada
+    y devuelve solo las max_imagenes mejores imágenes, eligiendo de cada srcset la
+    variante adecuada para ancho_objetivo.
+
+    Returns:
+        tuple: (textos, imagenes_urls)
+    """
+    from utils.image_downloader import obtener_sesion
+
+    with medir_etapa("extraer_articulo_streaming") as etapa:
+        with obtener_sesion().get(url, stream=True, timeout=TIMEOUT,
+                                  headers={"Accept": "text/html,application/xhtml+xml"}) as respuesta:
+            respuesta.raise_for_status()
+            textos, imagenes_urls, _ = analizar_html(
+                _fragmentos_respuesta(respuesta, max_bytes, etapa), respuesta.url,
+                max_imagenes=max_imagenes, ancho_objetivo=ancho_objetivo,
+            )
+        etapa.bytes_salida = sum(len(t.encode("utf-8")) for t in textos)
+    logging.info(f"Extracción ligera de {url}: {len(textos)} textos, {len(imagenes_urls)} imágenes, "
+                 f"{etapa.bytes_entrada} bytes de HTML")
+    return textos, imagenes_urls
@@ -0,0 +1,145 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import importlib
+from pathlib import Path
+
+# Recursos compartidos por todas las sesiones (y procesos) del nodo
+ASSETS_DIR = Path(os.environ.get("ASSETS_DIR", Path(tempfile.gettempdir()) / "app_seo_assets"))
+# Si se define, la fuente descargada debe tener exactamente este sha256
+FUENTE_SHA256 = os.environ.get("FUENTE_SHA256")
+# Procesos de render que se arrancan por adelantado al precalentar
+PROCESOS_PRECALENTADOS = int(os.environ.get("PROCESOS_PRECALENTADOS", 1))
+
+# Módulos pesados que se importan en segundo plano al precalentar
+MODULOS_PESADOS = (
+    "numpy",
+    "utils.text_overlay",
+    "utils.slide_encoder",
+    "utils.incremental_render",
+    "imageio_ffmpeg",
+)
+
+_lock_fuente = threading.Lock()
+_fuente_path = None
+_lock_precalentar = threading.Lock()
+_precalentado = None
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _fuente_valida(path):
+    """La fuente existe, coincide con su checksum guardado y FreeType puede abrirla"""
+    from PIL import ImageFont
+
+    checksum = Path(f"{path}.sha256")
+    if not path.exists() or not checksum.exists():
+        return False
+    esperado = checksum.read_text().strip()
+    if _sha256(path) != esperado or (FUENTE_SHA256 and esperado != FUENTE_SHA256):
+        return False
+    try:
+        ImageFont.truetype(str(path), 12)
+    except OSError:
+        return False
+    return True
+
+
+def fuente_en_cache():
+    """Ruta de la fuente compartida si ya está descargada y es válida, sin descargar nada"""
+    path = ASSETS_DIR / "fuente.ttf"
+    return str(path) if _fuente_valida(path) else None
+
+
+def obtener_fuente(descargar):
+    """
+    Devuelve la fuente compartida, descargándola solo si no está en ASSETS_DIR
+    o su checksum no coincide.
+
+    Args:
+        descargar (callable): Función que descarga la fuente y devuelve su ruta
+            (p. ej. descargar_fuente); solo se llama una vez por nodo.
+
+    Returns:
+        str: Ruta de la fuente, o None si no se pudo obtener.
+    """
+    global _fuente_path
+    with _lock_fuente:
+        if _fuente_path is not None:
+            return _fuente_path
+
+        _fuente_path = fuente_en_cache()
+        if _fuente_path is not None:
+            return _fuente_path
+
+        origen = descargar()
+        if not origen or not os.path.exists(origen):
+            logging.warning("No se pudo descargar la fuente, se usará la predeterminada")
+            return None
+        checksum = _sha256(origen)
+        if FUENTE_SHA256 and checksum != FUENTE_SHA256:
+            logging.error(f"La fuente descargada no coincide con FUENTE_SHA256 ({checksum})")
+            return None
+
+        ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+        path = ASSETS_DIR / "fuente.ttf"
+        temporal = ASSETS_DIR / f"fuente.{os.getpid()}.tmp"
+        shutil.copyfile(origen, temporal)
+        os.replace(temporal, path)
+        Path(f"{path}.sha256").write_text(checksum)
+        logging.info(f"Fuente guardada en {path} (sha256 {checksum[:12]})")
+        _fuente_path = str(path)
+        return _fuente_path
+
+
+def importar_modulos_pesados():
+    """Importa los módulos pesados y localiza FFmpeg (idempotente)"""
+    for nombre in MODULOS_PESADOS:
+        try:
+            importlib.import_module(nombre)
+        except ImportError as e:
+            logging.warning(f"No se pudo precargar {nombre}: {str(e)}")
+    from utils.slide_encoder import obtener_ffmpeg
+    obtener_ffmpeg()
+
+
+def _precalentar(descargar_fuente):
+    from utils.render_jobs import precalentar_pool
+    from utils.text_overlay import cargar_fuente, tamano_fuente, RESOLUCION_POR_DEFECTO
+
+    importar_modulos_pesados()
+    fuente_path = obtener_fuente(descargar_fuente) if descargar_fuente else fuente_en_cache()
+    cargar_fuente(fuente_path, tamano_fuente(RESOLUCION_POR_DEFECTO))
+    precalentar_pool(PROCESOS_PRECALENTADOS)
+    logging.info("Recursos de render precalentados")
+
+
+def precalentar(descargar_fuente=None):
+    """
+    Prepara en un hilo en segundo plano (una vez por proceso) todo lo que necesita
+    el primer render: imports pesados, FFmpeg, la fuente y los procesos de render.
+
+    Returns:
+        threading.Thread: El hilo de precalentamiento (para esperar si hace falta).
+    """
+    global _precalentado
+    with _lock_precalentar:
+        if _precalentado is None:
+            def ejecutar():
+                try:
+                    _precalentar(descargar_fuente)
+                except Exception as e:
+                    logging.warning(f"Error al precalentar los recursos: {str(e)}")
+
+            _precalentado = threading.Thread(target=ejecutar, name="precalentar", daemon=True)
+            _precalentado.start()
+        return _precalentado
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+from utils.descargas import hash_archivo
+
+# Directorio compartido por todos los procesos de Streamlit del nodo
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", Path(tempfile.gettempdir()) / "app_seo_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 2 * 1024 ** 3))
+CACHE_TTL = int(os.environ.get("CACHE_TTL", 24 * 3600))
+# Una entrada caducada con ETag/Last-Modified se revalida con HEAD; pasado este tiempo se borra
+CACHE_TTL_MAXIMO = int(os.environ.get("CACHE_TTL_MAXIMO", 7 * 24 * 3600))
+
+# Parámetros de seguimiento que no cambian el contenido del artículo
+PARAMETROS_IGNORADOS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    creado REAL NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    ruta TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contadores (
+    nombre TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entradas_usado ON entradas(usado);
+CREATE INDEX IF NOT EXISTS idx_blobs_usado ON blobs(usado);
+"""
+
+_lock_esquema = threading.Lock()
+_preparadas = set()
+
+
+def _preparar(conn, path):
+    """Activa WAL y crea o migra el esquema (una vez por proceso y base de datos)"""
+    with _lock_esquema:
+        if path in _preparadas:
+            return
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(ESQUEMA)
+        columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(entradas)")}
+        if "validadores" not in columnas:
+            conn.execute("ALTER TABLE entradas ADD COLUMN validadores TEXT")
+        _preparadas.add(path)
+
+
+@contextmanager
+def _conexion(escritura=False):
+    """Abre la base de datos del índice; las escrituras toman el bloqueo de forma inmediata"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = CACHE_DIR / "indice.db"
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        _preparar(conn, str(path))
+        conn.execute("BEGIN IMMEDIATE" if escritura else "BEGIN")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _incrementar(conn, nombre, cantidad=1):
+    conn.execute(
+        "INSERT INTO contadores (nombre, valor) VALUES (?, ?) "
+        "ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor",
+        (nombre, cantidad),
+    )
+
+
+def normalizar_url(url):
+    """Normaliza una URL: esquema y host en minúsculas, sin fragmento ni parámetros de seguimiento"""
+    partes = urlsplit(url.strip())
+    host = partes.netloc.lower()
+    if host.endswith(":80") and partes.scheme == "http":
+        host = host[:-3]
+    elif host.endswith(":443") and partes.scheme == "https":
+        host = host[:-4]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True)
+        if not k.lower().startswith(PARAMETROS_IGNORADOS)
+    )
+    ruta = partes.path.rstrip("/") or "/"
+    return urlunsplit((partes.scheme.lower(), host, ruta, urlencode(query), ""))
+
+
+def validadores_url(url):
+    """Obtiene ETag y Last-Modified del recurso con una petición HEAD (vacío si no hay)"""
+    try:
+        r = requests.head(url, allow_redirects=True, timeout=5)
+        return r.headers.get("ETag", ""), r.headers.get("Last-Modified", "")
+    except requests.RequestException:
+        return "", ""
+
+
+def clave_url(url, tipo, *extra):
+    """Construye la clave de caché a partir de la URL normalizada (sin peticiones de red)"""
+    material = json.dumps([tipo, normalizar_url(url), *extra])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def obtener(clave, tipo, url=None):
+    """
+    Devuelve el valor guardado para la clave o None si no existe o ha caducado.
+
+    Dentro de CACHE_TTL la entrada se da por fresca sin consultar el origen. Una
+    entrada caducada que guardó ETag/Last-Modified de url se revalida con HEAD y,
+    si no ha cambiado, vuelve a ser fresca.
+    """
+    ahora = time.time()
+    with _conexion() as conn:
+        fila = conn.execute(
+            "SELECT valor, creado, validadores FROM entradas WHERE clave = ?", (clave,)
+        ).fetchone()
+
+    fresca = fila is not None and fila[1] > ahora - CACHE_TTL
+    if fila is not None and not fresca and url and fila[2]:
+        # La petición se hace fuera de la transacción para no bloquear a otros procesos
+        fresca = list(validadores_url(url)) == json.loads(fila[2])
+
+    with _conexion(escritura=True) as conn:
+        if not fresca:
+            _incrementar(conn, f"{tipo}_fallos")
+            return None
+        if fila[1] <= ahora - CACHE_TTL:
+            conn.execute("UPDATE entradas SET creado = ? WHERE clave = ?", (ahora, clave))
+            _incrementar(conn, f"{tipo}_revalidaciones")
+        conn.execute("UPDATE entradas SET usado = ? WHERE clave = ?", (ahora, clave))
+        _incrementar(conn, f"{tipo}_aciertos")
+    return json.loads(fila[0])
+
+
+def guardar(clave, valor, url=None):
+    """
+    Guarda un valor serializable en JSON y aplica la política de expulsión.
+
+    Con url se guardan también sus validadores (ETag/Last-Modified) para poder
+    revalidar la entrada cuando caduque.
+    """
+    datos = json.dumps(valor, ensure_ascii=False)
+    validadores = None
+    if url:
+        etag, last_modified = validadores_url(url)
+        if etag or last_modified:
+            validadores = json.dumps([etag, last_modified])
+    ahora = time.time()
+    with _conexion(escritura=True) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO entradas (clave, valor, bytes, creado, usado, validadores) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (clave, datos, len(datos.encode("utf-8")), ahora, ahora, validadores),
+        )
+        a_borrar = _expulsar(conn)
+    _borrar_archivos(a_borrar)
+
+
+def guardar_archivo(path):
+    """Copia un archivo al almacén por contenido y devuelve su hash"""
+    h = hash_archivo(path)
+    destino = CACHE_DIR / "blobs" / h[:2] / f"{h}{Path(path).suffix.lower()}"
+    if not destino.exists():
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporal = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+        shutil.copyfile(path, temporal)
+        os.replace(temporal, destino)
+    with _conexion(escritura=True) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO blobs (hash, ruta, bytes, usado) VALUES (?, ?, ?, ?)",
+            (h, str(destino), destino.stat().st_size, time.time()),
+        )
+    return h
+
+
+def recuperar_archivos(hashes, destino_dir):
+    """
+    Materializa los archivos guardados en destino_dir.
+
+    Se usan enlaces duros para que la expulsión posterior de un blob no afecte a
+    las sesiones que ya lo están usando. Devuelve None si falta alguno (también si
+    otro proceso lo expulsa mientras se enlaza), sin dejar archivos a medias.
+    """
+    with _conexion(escritura=True) as conn:
+        filas = dict(conn.execute(
+            f"SELECT hash, ruta FROM blobs WHERE hash IN ({','.join('?' * len(hashes))})", hashes
+        ).fetchall()) if hashes else {}
+        conn.executemany("UPDATE blobs SET usado = ? WHERE hash = ?",
+                         [(time.time(), h) for h in filas])
+
+    destino_dir = Path(destino_dir)
+    destino_dir.mkdir(parents=True, exist_ok=True)
+    rutas = []
+    creados = []
+    try:
+        for h in hashes:
+            origen = filas.get(h)
+            if origen is None:
+                raise FileNotFoundError(h)
+            destino = destino_dir / os.path.basename(origen)
+            try:
+                os.link(origen, destino)
+                creados.append(destino)
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                raise
+            except OSError:
+                shutil.copyfile(origen, destino)
+                creados.append(destino)
+            rutas.append(str(destino))
+    except FileNotFoundError:
+        # El blob no está o se expulsó tras consultarlo: es un fallo de caché
+        for destino in creados:
+            destino.unlink(missing_ok=True)
+        return None
+    return rutas
+
+
+def _expulsar(conn):
+    """Elimina entradas caducadas y, por orden LRU, lo necesario para respetar CACHE_MAX_BYTES"""
+    ahora = time.time()
+    # Las caducadas con validadores se conservan (hasta CACHE_TTL_MAXIMO) para revalidarlas
+    conn.execute("DELETE FROM entradas WHERE creado <= ? AND (validadores IS NULL OR creado <= ?)",
+                 (ahora - CACHE_TTL, ahora - CACHE_TTL_MAXIMO))
+    total = conn.execute(
+        "SELECT (SELECT COALESCE(SUM(bytes), 0) FROM entradas) + (SELECT COALESCE(SUM(bytes), 0) FROM blobs)"
+    ).fetchone()[0]
+    a_borrar = []
+    if total <= CACHE_MAX_BYTES:
+        return a_borrar
+
+    candidatos = conn.execute(
+        "SELECT 'entrada', clave, NULL, bytes, usado FROM entradas "
+        "UNION ALL SELECT 'blob', hash, ruta, bytes, usado FROM blobs ORDER BY usado"
+    ).fetchall()
+    for tipo, clave, ruta, tamano, _ in candidatos:
+        if total <= CACHE_MAX_BYTES:
+            break
+        if tipo == "entrada":
+            conn.execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+        else:
+            conn.execute("DELETE FROM blobs WHERE hash = ?", (clave,))
+            a_borrar.append(ruta)
+        total -= tamano
+        _incrementar(conn, "expulsiones")
+    return a_borrar
+
+
+def _borrar_archivos(rutas):
+    for ruta in rutas:
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def estadisticas_cache():
+    """Devuelve los contadores de aciertos/fallos y el tamaño actual de la caché"""
+    with _conexion() as conn:
+        stats = dict(conn.execute("SELECT nombre, valor FROM contadores").fetchall())
+        stats["bytes_totales"] = conn.execute(
+            "SELECT (SELECT COALESCE(SUM(bytes), 0) FROM entradas) + (SELECT COALESCE(SUM(bytes), 0) FROM blobs)"
+        ).fetchone()[0]
+    return stats
+
+
+def extraer_contenido_cacheado(url, extraer, variante=None):
+    """
+    Envuelve extraer_contenido_articulo con la caché persistente.
+
+    variante distingue los resultados de extractores distintos para la misma URL.
+    """
+    clave = clave_url(url, "articulo", variante) if variante else clave_url(url, "articulo")
+    valor = obtener(clave, "articulo", url)
+    if valor is not None:
+        logging.info(f"Artículo recuperado de la caché: {url}")
+        return valor["textos"], valor["imagenes_urls"]
+
+    textos, imagenes_urls = extraer(url)
+    if textos:
+        guardar(clave, {"textos": textos, "imagenes_urls": imagenes_urls}, url)
+    return textos, imagenes_urls
+
+
+def descargar_imagenes_cacheadas(url, imagenes_urls, progress_bar, descargar, destino_dir=None):
+    """Envuelve descargar_imagenes con la caché persistente de archivos (en destino_dir si se indica)"""
+    clave = clave_url(url, "imagenes", hashlib.sha256(json.dumps(imagenes_urls).encode()).hexdigest())
+    valor = obtener(clave, "imagenes")
+    if valor is not None:
+        rutas = recuperar_archivos(valor, destino_dir or tempfile.mkdtemp())
+        if rutas is not None:
+            if progress_bar is not None:
+                progress_bar.progress(1.0)
+            logging.info(f"{len(rutas)} imágenes recuperadas de la caché: {url}")
+            return rutas
+
+    rutas = descargar(imagenes_urls, progress_bar)
+    if rutas:
+        guardar(clave, [guardar_archivo(ruta) for ruta in rutas])
+    return rutas
@@ -0,0 +1,212 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import execute_values
+
+from utils.metrics import medir_etapa
+
+# Tamaño del pool de conexiones compartido por todas las sesiones del proceso
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+# Filas por sentencia en las inserciones masivas
+TAMANO_PAGINA = 1000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS proyectos (
+    id SERIAL PRIMARY KEY,
+    titulo TEXT NOT NULL,
+    url_articulo TEXT,
+    video_path TEXT,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS textos_proyecto (
+    id SERIAL PRIMARY KEY,
+    proyecto_id INTEGER NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    texto TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imagenes_proyecto (
+    id SERIAL PRIMARY KEY,
+    proyecto_id INTEGER NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    tipo TEXT NOT NULL,
+    ruta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_textos_proyecto ON textos_proyecto(proyecto_id);
+CREATE INDEX IF NOT EXISTS idx_imagenes_proyecto ON imagenes_proyecto(proyecto_id);
+"""
+# Formatos de video de un proyecto. Sin clave foránea: los proyectos de la aplicación los
+# crea utils.database con su propio esquema, y proyecto_id es el id que devuelve su
+# guardar_proyecto (o guardar_proyectos_lote en el modo por lotes)
+ESQUEMA_VIDEOS = """
+CREATE TABLE IF NOT EXISTS videos_proyecto (
+    id SERIAL PRIMARY KEY,
+    proyecto_id INTEGER NOT NULL,
+    formato TEXT NOT NULL,
+    ruta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_proyecto ON videos_proyecto(proyecto_id);
+"""
+
+_pool = None
+_semaforo = threading.BoundedSemaphore(DB_POOL_MAX)
+_lock = threading.Lock()
+# Reentrante: una inicialización puede depender de otra (p. ej. índices sobre el esquema)
+_lock_init = threading.RLock()
+_inicializadas = set()
+
+
+def obtener_pool():
+    """Crea (una vez por proceso) el pool de conexiones a DATABASE_URL"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            dsn = os.environ.get("DATABASE_URL")
+            if not dsn:
+                raise RuntimeError("La variable de entorno DATABASE_URL no está definida")
+            _pool = pg_pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, dsn=dsn)
+            logging.info(f"Pool de conexiones creado ({DB_POOL_MIN}-{DB_POOL_MAX})")
+        return _pool
+
+
+def cerrar_pool():
+    """Cierra todas las conexiones del pool"""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+    with _lock_init:
+        _inicializadas.clear()
+
+
+@contextmanager
+def conexion():
+    """
+    Presta una conexión del pool durante un bloque with.
+
+    Confirma la transacción al salir sin errores y la deshace si hay una
+    excepción. Si todas las conexiones están ocupadas espera a que se libere una.
+    """
+    with _semaforo:
+        pool = obtener_pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=conn.closed != 0)
+
+
+def inicializar_una_vez(funcion=None):
+    """
+    Crea el esquema (y ejecuta funcion, p. ej. init_database) solo la primera vez
+    que se llama en el proceso, no en cada ejecución del script de Streamlit.
+
+    Returns:
+        bool: True si la inicialización se ha ejecutado en esta llamada.
+    """
+    clave = getattr(funcion, "__qualname__", None)
+    with _lock_init:
+        if clave in _inicializadas:
+            return False
+        if funcion is not None:
+            funcion()
+        else:
+            with conexion() as conn, conn.cursor() as cur:
+                cur.execute(ESQUEMA + ESQUEMA_VIDEOS)
+        _inicializadas.add(clave)
+    return True
+
+
+def guardar_proyectos_lote(proyectos):
+    """
+    Guarda varios proyectos con sus textos e imágenes en una sola transacción.
+
+    Args:
+        proyectos (list): Diccionarios con las claves de guardar_proyecto: titulo,
+            url_articulo, video_path, textos, imagenes_originales, imagenes_con_texto
+            y, opcionalmente, videos (dict formato -> ruta).
+
+    Returns:
+        list: IDs de los proyectos, en el mismo orden.
+    """
+    if not proyectos:
+        return []
+    inicializar_una_vez()
+    with medir_etapa("guardar_proyectos_lote"), conexion() as conn, conn.cursor() as cur:
+        # Reservar los IDs por adelantado para enlazar textos e imágenes sin depender
+        # del orden de RETURNING
+        cur.execute(
+            "SELECT nextval(pg_get_serial_sequence('proyectos', 'id')) FROM generate_series(1, %s)",
+            (len(proyectos),),
+        )
+        ids = [fila[0] for fila in cur.fetchall()]
+
+        execute_values(
+            cur,
+            "INSERT INTO proyectos (id, titulo, url_articulo, video_path) VALUES %s",
+            [(pid, p["titulo"], p.get("url_articulo"), p.get("video_path")) for pid, p in zip(ids, proyectos)],
+            page_size=TAMANO_PAGINA,
+        )
+        execute_values(
+            cur,
+            "INSERT INTO textos_proyecto (proyecto_id, orden, texto) VALUES %s",
+            [(pid, i, texto) for pid, p in zip(ids, proyectos) for i, texto in enumerate(p.get("textos") or [])],
+            page_size=TAMANO_PAGINA,
+        )
+        execute_values(
+            cur,
+            "INSERT INTO imagenes_proyecto (proyecto_id, orden, tipo, ruta) VALUES %s",
+            [(pid, i, tipo, ruta)
+             for pid, p in zip(ids, proyectos)
+             for tipo, clave in (("original", "imagenes_originales"), ("con_texto", "imagenes_con_texto"))
+             for i, ruta in enumerate(p.get(clave) or [])],
+            page_size=TAMANO_PAGINA,
+        )
+        videos = [(pid, formato, ruta) for pid, p in zip(ids, proyectos)
+                  for formato, ruta in (p.get("videos") or {}).items()]
+        if videos:
+            execute_values(cur, "INSERT INTO videos_proyecto (proyecto_id, formato, ruta) VALUES %s",
+                           videos, page_size=TAMANO_PAGINA)
+    logging.info(f"{len(proyectos)} proyectos guardados en lote")
+    return ids
+
+
+def guardar_proyecto_pool(titulo, url_articulo=None, video_path=None, textos=None,
+                          imagenes_originales=None, imagenes_con_texto=None, videos=None):
+    """Igual que guardar_proyecto pero usando el pool de conexiones (y con todos los formatos)"""
+    return guardar_proyectos_lote([{
+        "titulo": titulo,
+        "url_articulo": url_articulo,
+        "video_path": video_path,
+        "textos": textos,
+        "imagenes_originales": imagenes_originales,
+        "imagenes_con_texto": imagenes_con_texto,
+        "videos": videos,
+    }])[0]
+
+
+def crear_tabla_videos():
+    with conexion() as conn, conn.cursor() as cur:
+        cur.execute(ESQUEMA_VIDEOS)
+
+
+def guardar_videos_proyecto(proyecto_id, videos):
+    """
+    Guarda los formatos de video (dict formato -> ruta) de un proyecto creado con
+    utils.database.guardar_proyecto, en una transacción del pool.
+    """
+    if not videos:
+        return
+    # Solo su tabla: el resto de ESQUEMA podría chocar con las tablas de utils.database
+    inicializar_una_vez(crear_tabla_videos)
+    with medir_etapa("guardar_videos_proyecto"), conexion() as conn, conn.cursor() as cur:
+        execute_values(cur, "INSERT INTO videos_proyecto (proyecto_id, formato, ruta) VALUES %s",
+                       [(proyecto_id, formato, ruta) for formato, ruta in videos.items()])
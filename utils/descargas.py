@@ -0,0 +1,82 @@
+import os
+import shutil
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+
+# Carpeta servida por Streamlit en /app/static/ (server.enableStaticServing)
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+DESCARGAS_DIR = STATIC_DIR / "descargas"
+URL_DESCARGAS = "/app/static/descargas"
+
+# Tamaño de bloque para leer y copiar archivos sin cargarlos completos en memoria
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_archivo(path, chunk_size=CHUNK_SIZE):
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(chunk_size), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def publicar_archivo(path, destino_dir=DESCARGAS_DIR):
+    """
+    Publica un archivo en la carpeta estática con un nombre basado en su contenido.
+
+    El archivo se enlaza (hardlink) o se copia por bloques, de modo que la memoria
+    usada no depende de su tamaño. Si ya existe una copia con el mismo hash no se
+    vuelve a escribir.
+
+    Returns:
+        str: Nombre del archivo publicado dentro de destino_dir.
+    """
+    path = Path(path)
+    extension = path.suffix.lower() or ".bin"
+    nombre = f"{hash_archivo(path)}{extension}"
+
+    destino_dir = Path(destino_dir)
+    destino_dir.mkdir(parents=True, exist_ok=True)
+    destino = destino_dir / nombre
+
+    if destino.exists():
+        # La fecha de modificación indica el último uso a la limpieza del espacio de trabajo
+        os.utime(destino)
+        return nombre
+
+    temporal = destino_dir / f".{nombre}.{os.getpid()}.tmp"
+    try:
+        try:
+            os.link(path, temporal)
+        except OSError:
+            # Distinto sistema de archivos: copia por bloques (sendfile cuando está disponible)
+            shutil.copyfile(path, temporal)
+        os.replace(temporal, destino)
+    finally:
+        if temporal.exists():
+            temporal.unlink()
+
+    logging.info(f"Archivo publicado para descarga: {destino}")
+    return nombre
+
+
+def publicado(url):
+    """Indica si el archivo de una URL de descarga sigue en la carpeta estática"""
+    return (DESCARGAS_DIR / url.rsplit("/", 1)[-1]).exists()
+
+
+def url_descarga(path):
+    """Devuelve la URL estática (con soporte de rangos) desde la que se sirve el archivo"""
+    return f"{URL_DESCARGAS}/{publicar_archivo(path)}"
+
+
+def enlace_descarga_html(path, file_label='Archivo', url=None):
+    """Genera un enlace HTML de descarga que apunta a la ruta estática del archivo"""
+    if url is None:
+        url = url_descarga(path)
+    nombre = os.path.basename(path)
+    tipo = mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+    return f'<a href="{url}" download="{nombre}" type="{tipo}">{file_label}</a>'
@@ -0,0 +1,133 @@
+import logging
+from datetime import datetime
+
+import psycopg2
+
+from utils.db_pool import conexion, inicializar_una_vez
+
+TAMANO_PAGINA_HISTORIAL = 20
+
+INDICES = """
+CREATE INDEX IF NOT EXISTS idx_proyectos_fecha ON proyectos (fecha_creacion DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_proyectos_url ON proyectos (url_articulo);
+CREATE INDEX IF NOT EXISTS idx_proyectos_titulo_fts ON proyectos USING gin (to_tsvector('spanish', titulo));
+CREATE INDEX IF NOT EXISTS idx_imagenes_proyecto_tipo ON imagenes_proyecto (proyecto_id, tipo, orden);
+"""
+
+INDICE_TRIGRAMAS = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_proyectos_titulo_trgm ON proyectos USING gin (titulo gin_trgm_ops);
+"""
+
+# Se decide al crear los índices: búsqueda por trigramas si pg_trgm está disponible
+_usar_trigramas = False
+
+
+def crear_indices_historial():
+    """Crea los índices del historial; la búsqueda por trigramas es opcional"""
+    global _usar_trigramas
+    inicializar_una_vez()
+    with conexion() as conn, conn.cursor() as cur:
+        cur.execute(INDICES)
+    try:
+        with conexion() as conn, conn.cursor() as cur:
+            cur.execute(INDICE_TRIGRAMAS)
+        _usar_trigramas = True
+    except psycopg2.Error as e:
+        logging.warning(f"pg_trgm no disponible, la búsqueda usará texto completo: {str(e).strip()}")
+        _usar_trigramas = False
+
+
+def _codificar_cursor(fecha, proyecto_id):
+    return f"{fecha.isoformat()}|{proyecto_id}"
+
+
+def _decodificar_cursor(cursor):
+    fecha, proyecto_id = cursor.rsplit("|", 1)
+    return datetime.fromisoformat(fecha), int(proyecto_id)
+
+
+def listar_proyectos(limite=TAMANO_PAGINA_HISTORIAL, despues=None, busqueda=None, url_articulo=None):
+    """
+    Devuelve una página del historial, del proyecto más reciente al más antiguo.
+
+    La paginación es por clave (fecha_creacion, id), de modo que el coste de una
+    página no depende de su posición. Las filas son ligeras: no incluyen textos
+    ni imágenes (ver detalle_proyecto y miniatura_proyecto).
+
+    Args:
+        limite (int): Proyectos por página.
+        despues (str): Cursor devuelto por la página anterior.
+        busqueda (str): Texto a buscar en el título.
+        url_articulo (str): Filtra por la URL exacta del artículo.
+
+    Returns:
+        tuple: (lista de dicts con id, titulo, url_articulo, video_path, fecha_creacion,
+        cursor de la página siguiente o None)
+    """
+    inicializar_una_vez(crear_indices_historial)
+    condiciones, parametros = [], []
+    if despues:
+        fecha, proyecto_id = _decodificar_cursor(despues)
+        condiciones.append("(fecha_creacion, id) < (%s, %s)")
+        parametros += [fecha, proyecto_id]
+    if url_articulo:
+        condiciones.append("url_articulo = %s")
+        parametros.append(url_articulo)
+    if busqueda:
+        if _usar_trigramas:
+            patron = busqueda.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            condiciones.append("titulo ILIKE %s")
+            parametros.append(f"%{patron}%")
+        else:
+            condiciones.append("to_tsvector('spanish', titulo) @@ plainto_tsquery('spanish', %s)")
+            parametros.append(busqueda)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    consulta = (
+        "SELECT id, titulo, url_articulo, video_path, fecha_creacion FROM proyectos "
+        f"{where} ORDER BY fecha_creacion DESC, id DESC LIMIT %s"
+    )
+    with conexion() as conn, conn.cursor() as cur:
+        cur.execute(consulta, parametros + [limite + 1])
+        filas = cur.fetchall()
+
+    proyectos = [
+        {"id": f[0], "titulo": f[1], "url_articulo": f[2], "video_path": f[3], "fecha_creacion": f[4]}
+        for f in filas[:limite]
+    ]
+    siguiente = None
+    if len(filas) > limite:
+        ultimo = proyectos[-1]
+        siguiente = _codificar_cursor(ultimo["fecha_creacion"], ultimo["id"])
+    return proyectos, siguiente
+
+
+def detalle_proyecto(proyecto_id):
+    """Carga los textos, imágenes y videos por formato de un proyecto (al expandirlo en el historial)"""
+    with conexion() as conn, conn.cursor() as cur:
+        cur.execute("SELECT texto FROM textos_proyecto WHERE proyecto_id = %s ORDER BY orden",
+                    (proyecto_id,))
+        textos = [f[0] for f in cur.fetchall()]
+        cur.execute("SELECT tipo, ruta FROM imagenes_proyecto WHERE proyecto_id = %s ORDER BY tipo, orden",
+                    (proyecto_id,))
+        imagenes = {"original": [], "con_texto": []}
+        for tipo, ruta in cur.fetchall():
+            imagenes.setdefault(tipo, []).append(ruta)
+        cur.execute("SELECT formato, ruta FROM videos_proyecto WHERE proyecto_id = %s ORDER BY id",
+                    (proyecto_id,))
+        videos = dict(cur.fetchall())
+    return {"textos": textos, "imagenes_originales": imagenes["original"],
+            "imagenes_con_texto": imagenes["con_texto"], "videos": videos}
+
+
+def miniatura_proyecto(proyecto_id):
+    """Ruta de la primera imagen con texto del proyecto, para mostrarla como miniatura"""
+    with conexion() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT ruta FROM imagenes_proyecto WHERE proyecto_id = %s AND tipo = 'con_texto' "
+            "ORDER BY orden LIMIT 1",
+            (proyecto_id,),
+        )
+        fila = cur.fetchone()
+    return fila[0] if fila else None
@@ -0,0 +1,168 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+from collections import defaultdict
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageFile
+
+from utils.metrics import medir_etapa
+
+# Límites de descarga
+MAX_DESCARGAS_CONCURRENTES = int(os.environ.get("MAX_DESCARGAS_CONCURRENTES", 16))
+MAX_DESCARGAS_POR_HOST = int(os.environ.get("MAX_DESCARGAS_POR_HOST", 4))
+MAX_BYTES_IMAGEN = int(os.environ.get("MAX_BYTES_IMAGEN", 15 * 1024 * 1024))
+MIN_LADO_IMAGEN = 200          # Descarta iconos y píxeles de seguimiento
+MAX_PIXELES_IMAGEN = 40_000_000  # Descarta originales desproporcionados
+TIMEOUT = (5, 20)
+CHUNK_SIZE = 64 * 1024
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+}
+
+_session = None
+_session_lock = threading.Lock()
+_semaforos_host = defaultdict(lambda: threading.BoundedSemaphore(MAX_DESCARGAS_POR_HOST))
+_semaforos_lock = threading.Lock()
+
+
+class ImagenDescartada(Exception):
+    """La imagen no cumple los límites de tamaño o no es una imagen válida"""
+
+
+def obtener_sesion():
+    """Devuelve la sesión HTTP compartida (keep-alive) del proceso"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_DESCARGAS_CONCURRENTES,
+                                  pool_maxsize=MAX_DESCARGAS_CONCURRENTES)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers.update(HEADERS)
+        return _session
+
+
+def _semaforo_host(url):
+    with _semaforos_lock:
+        return _semaforos_host[urlparse(url).netloc]
+
+
+def _validar_dimensiones(ancho, alto):
+    if min(ancho, alto) < MIN_LADO_IMAGEN:
+        raise ImagenDescartada(f"imagen demasiado pequeña ({ancho}x{alto})")
+    if ancho * alto > MAX_PIXELES_IMAGEN:
+        raise ImagenDescartada(f"imagen demasiado grande ({ancho}x{alto})")
+
+
+def leer_imagen_limitada(respuesta, max_bytes=MAX_BYTES_IMAGEN):
+    """
+    Lee el cuerpo de una respuesta por bloques validando la imagen en cuanto se
+    conoce su cabecera.
+
+    Las dimensiones se comprueban con el primer bloque que contenga la cabecera,
+    de forma que los píxeles de seguimiento y los originales enormes se descartan
+    sin descargar el resto del cuerpo.
+    """
+    longitud = respuesta.headers.get("Content-Length")
+    if longitud and longitud.isdigit() and int(longitud) > max_bytes:
+        raise ImagenDescartada(f"Content-Length {longitud} supera el límite")
+
+    parser = ImageFile.Parser()
+    buffer = BytesIO()
+    dimensiones_validadas = False
+    for bloque in respuesta.iter_content(CHUNK_SIZE):
+        buffer.write(bloque)
+        if buffer.tell() > max_bytes:
+            raise ImagenDescartada(f"la imagen supera {max_bytes} bytes")
+        if not dimensiones_validadas:
+            try:
+                parser.feed(bloque)
+            except Exception as e:
+                raise ImagenDescartada(f"no es una imagen válida: {e}")
+            if parser.image is not None:
+                _validar_dimensiones(*parser.image.size)
+                dimensiones_validadas = True
+
+    if not dimensiones_validadas:
+        raise ImagenDescartada("no se pudo leer la cabecera de la imagen")
+    return buffer.getvalue()
+
+
+def _guardar_imagen(data, destino_dir):
+    """Guarda la imagen descargada; los formatos distintos de JPEG/PNG se convierten a JPEG"""
+    nombre = hashlib.sha256(data).hexdigest()[:16]
+    img = Image.open(BytesIO(data))
+    if img.format in ("JPEG", "PNG"):
+        path = destino_dir / f"{nombre}.{'jpg' if img.format == 'JPEG' else 'png'}"
+        path.write_bytes(data)
+    else:
+        path = destino_dir / f"{nombre}.jpg"
+        img.convert("RGB").save(path, format="JPEG", quality=92)
+    return str(path)
+
+
+def descargar_imagen(url, destino_dir):
+    """Descarga una imagen respetando el límite de conexiones por host"""
+    session = obtener_sesion()
+    with medir_etapa("descarga_imagen") as etapa:
+        with _semaforo_host(url):
+            with session.get(url, stream=True, timeout=TIMEOUT) as respuesta:
+                respuesta.raise_for_status()
+                data = leer_imagen_limitada(respuesta)
+        etapa.bytes_entrada = len(data)
+        path = _guardar_imagen(data, destino_dir)
+        etapa.bytes_salida = os.path.getsize(path)
+    return path
+
+
+def descargar_imagenes(imagenes_urls, progress_bar=None, max_workers=MAX_DESCARGAS_CONCURRENTES,
+                       destino_dir=None):
+    """
+    Descarga las imágenes de un artículo de forma concurrente.
+
+    Args:
+        imagenes_urls (list): URLs de las imágenes.
+        progress_bar: Barra de progreso de Streamlit (opcional); avanza al terminar cada imagen.
+        max_workers (int): Número máximo de descargas simultáneas.
+        destino_dir (str): Directorio donde guardarlas; por defecto uno temporal nuevo.
+
+    Returns:
+        list: Rutas locales de las imágenes válidas, en el mismo orden que las URLs.
+    """
+    urls = list(dict.fromkeys(u for u in imagenes_urls if u))
+    if not urls:
+        return []
+
+    destino_dir = Path(destino_dir or tempfile.mkdtemp())
+    resultados = {}
+    # El tiempo de CPU de cada descarga se mide en su hilo (etapa "descarga_imagen")
+    with medir_etapa("descargar_imagenes") as etapa, \
+            ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        futuros = {executor.submit(descargar_imagen, url, destino_dir): url for url in urls}
+        for completadas, futuro in enumerate(as_completed(futuros), start=1):
+            url = futuros[futuro]
+            try:
+                resultados[url] = futuro.result()
+            except ImagenDescartada as e:
+                logging.info(f"Imagen descartada {url}: {e}")
+            except Exception as e:
+                logging.warning(f"Error al descargar la imagen {url}: {str(e)}")
+            if progress_bar is not None:
+                progress_bar.progress(completadas / len(urls))
+        etapa.bytes_salida = sum(os.path.getsize(r) for r in resultados.values())
+
+    rutas = [resultados[url] for url in urls if url in resultados]
+    logging.info(f"Descargadas {len(rutas)} de {len(urls)} imágenes")
+    return rutas
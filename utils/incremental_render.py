@@ -0,0 +1,399 @@
+import os
+import re
+import shutil
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import unicodedata
+from pathlib import Path
+from fractions import Fraction
+
+import numpy as np
+from PIL import Image
+
+from utils.descargas import hash_archivo
+from utils.metrics import medir_etapa
+from utils.slide_encoder import (obtener_ffmpeg, codificar_frames, ejecutar_ffmpeg, PRESET_POR_DEFECTO,
+                                 FPS_POR_DEFECTO)
+from utils.text_overlay import componer_diapositivas, RESOLUCION_POR_DEFECTO
+
+# Segmentos codificados por diapositiva, compartidos por todos los procesos del nodo
+SEGMENTOS_DIR = Path(os.environ.get("SEGMENTOS_DIR", Path(tempfile.gettempdir()) / "app_seo_segmentos"))
+MAX_BYTES_SEGMENTOS = int(os.environ.get("MAX_BYTES_SEGMENTOS", 1024 ** 3))
+DURACION_DIAPOSITIVA = 3
+# Cambiar cuando cambie el dibujo o la codificación para invalidar los segmentos guardados
+VERSION_PLANTILLA = 1
+# Los segmentos se codifican a la frecuencia de los videos entregables, la misma en todos
+# para poder concatenarse sin recodificar
+FPS_SEGMENTO = FPS_POR_DEFECTO
+# El borrador (vista previa rápida) se codifica a esta resolución con el preset 'preview'
+RESOLUCION_BORRADOR = (640, 360)
+PRESET_BORRADOR = "preview"
+# Veces que se regeneran las diapositivas que otro proceso elimina durante un render
+REINTENTOS_SEGMENTOS = 2
+
+
+def _nombre_archivo(titulo):
+    """Convierte el título en un nombre de archivo seguro"""
+    texto = unicodedata.normalize("NFKD", titulo or "video").encode("ascii", "ignore").decode()
+    texto = re.sub(r"[^A-Za-z0-9]+", "_", texto).strip("_").lower()
+    return (texto[:60] or "video") + ".mp4"
+
+
+def huella_diapositiva(texto, imagen_path, fuente_path, resolucion, estilo, duracion, preset):
+    """Identifica una diapositiva por su contenido y sus parámetros de render"""
+    material = {
+        "texto": texto,
+        "imagen": hash_archivo(imagen_path),
+        "fuente": hash_archivo(fuente_path) if fuente_path and os.path.exists(fuente_path) else None,
+        "resolucion": list(resolucion),
+        "estilo": estilo,
+        "duracion": duracion,
+        "preset": preset,
+        "fps": FPS_SEGMENTO,
+        "version": VERSION_PLANTILLA,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _rutas_segmento(huella):
+    base = SEGMENTOS_DIR / huella[:2] / huella
+    return base.with_suffix(".mp4"), base.with_suffix(".jpg")
+
+
+def _guardar_cuadro(cuadro, huella):
+    """Guarda la imagen ya compuesta de una diapositiva (sin codificarla)"""
+    _, imagen = _rutas_segmento(huella)
+    imagen.parent.mkdir(parents=True, exist_ok=True)
+    temporal = imagen.with_name(f"{imagen.name}.{os.getpid()}.tmp.jpg")
+    try:
+        Image.fromarray(cuadro).save(temporal, format="JPEG", quality=92)
+        os.replace(temporal, imagen)
+    finally:
+        if temporal.exists():
+            temporal.unlink()
+
+
+def _cargar_cuadro(huella, resolucion=None):
+    """Imagen compuesta guardada de una diapositiva (reducida a resolucion si se indica), o None"""
+    _, imagen = _rutas_segmento(huella)
+    try:
+        with Image.open(imagen) as img:
+            if resolucion is not None:
+                img.draft("RGB", resolucion)
+                img = img.convert("RGB").resize(resolucion, Image.BILINEAR)
+            return np.asarray(img.convert("RGB"))
+    except FileNotFoundError:
+        return None
+
+
+def _guardar_segmento(cuadro, duracion, preset, huella):
+    """Codifica una diapositiva como segmento independiente y guarda su imagen"""
+    segmento, imagen = _rutas_segmento(huella)
+    segmento.parent.mkdir(parents=True, exist_ok=True)
+    temporal_mp4 = segmento.with_name(f"{segmento.name}.{os.getpid()}.tmp.mp4")
+    try:
+        codificar_frames([cuadro], duracion, temporal_mp4, preset=preset, fps=FPS_SEGMENTO,
+                         fps_entrada=1 / Fraction(duracion).limit_denominator(1000))
+        if not imagen.exists():
+            _guardar_cuadro(cuadro, huella)
+        os.replace(temporal_mp4, segmento)
+    finally:
+        if temporal_mp4.exists():
+            temporal_mp4.unlink()
+
+
+def concatenar_segmentos(segmentos, output_path):
+    """Une segmentos con los mismos parámetros de codificación sin recodificar"""
+    lista = Path(output_path).with_suffix(".ffconcat")
+    lineas = ["ffconcat version 1.0"]
+    for segmento in segmentos:
+        lineas.append(f"file '{os.path.abspath(segmento)}'")
+    lista.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+    try:
+        with medir_etapa("concatenacion", incluir_subprocesos=True) as etapa:
+            etapa.bytes_entrada = sum(os.path.getsize(segmento) for segmento in segmentos)
+            ejecutar_ffmpeg([
+                obtener_ffmpeg(), "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", str(lista),
+                "-c", "copy", "-movflags", "+faststart",
+                str(output_path),
+            ])
+            etapa.bytes_salida = os.path.getsize(output_path)
+    finally:
+        lista.unlink()
+    return str(output_path)
+
+
+def limpiar_segmentos(max_bytes=MAX_BYTES_SEGMENTOS):
+    """Elimina las diapositivas usadas hace más tiempo hasta respetar max_bytes"""
+    if not SEGMENTOS_DIR.exists():
+        return
+    # Cada diapositiva tiene su imagen y, si ya se codificó, su segmento
+    archivos = []
+    for path in SEGMENTOS_DIR.glob("*/*.jpg"):
+        tamano, usado = 0, 0
+        for archivo in (path, path.with_suffix(".mp4")):
+            try:
+                stat = archivo.stat()
+            except FileNotFoundError:
+                continue
+            tamano += stat.st_size
+            usado = max(usado, stat.st_mtime)
+        if tamano:
+            archivos.append((usado, tamano, path))
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, path in sorted(archivos):
+        if total <= max_bytes:
+            break
+        for archivo in (path, path.with_suffix(".mp4")):
+            try:
+                archivo.unlink()
+            except FileNotFoundError:
+                pass
+        total -= tamano
+
+
+def _enlazar(origen, destino):
+    """Enlace duro de origen en destino (copia si no es posible); FileNotFoundError si origen no existe"""
+    destino = Path(destino)
+    if destino.exists():
+        destino.unlink()
+    try:
+        os.link(origen, destino)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Sistemas de archivos distintos o sin enlaces duros
+        shutil.copyfile(origen, destino)
+
+
+def _enlazar_imagenes(imagenes, salida_dir):
+    """Enlaza las imágenes con texto junto al video para que sobrevivan a la limpieza"""
+    imagenes_con_texto = []
+    for i, imagen in enumerate(imagenes, start=1):
+        destino = Path(salida_dir) / f"imagen_con_texto_{i}.jpg"
+        _enlazar(imagen, destino)
+        imagenes_con_texto.append(str(destino))
+    return imagenes_con_texto
+
+
+def _reservar_diapositiva(huella, trabajo_dir):
+    """
+    Enlaza el segmento y la imagen de una diapositiva en el directorio del trabajo.
+
+    Otro proceso puede borrarlos con limpiar_segmentos en cualquier momento; una
+    vez enlazados ya no desaparecen. Devuelve None si faltaba alguno de los dos.
+    """
+    reservados = []
+    for origen in _rutas_segmento(huella):
+        destino = Path(trabajo_dir) / origen.name
+        try:
+            _enlazar(origen, destino)
+        except FileNotFoundError:
+            return None
+        reservados.append(destino)
+    ahora = time.time()
+    for origen in _rutas_segmento(huella):
+        try:
+            os.utime(origen, (ahora, ahora))
+        except FileNotFoundError:
+            pass
+    return tuple(reservados)
+
+
+def _componer_pendientes(pendientes, fuente_path, resolucion, estilo, progress_callback=None):
+    """Dibuja las diapositivas {huella: (texto, imagen)} y guarda sus imágenes compuestas"""
+    imagenes_pendientes = [imagen for _, imagen in pendientes.values()]
+    with medir_etapa("superposicion_texto") as etapa:
+        etapa.bytes_entrada = sum(os.path.getsize(imagen) for imagen in set(imagenes_pendientes))
+        cuadros = componer_diapositivas(
+            [texto for texto, _ in pendientes.values()],
+            imagenes_pendientes,
+            fuente_path=fuente_path, resolucion=resolucion, estilo=estilo,
+            progress_callback=progress_callback,
+        )
+        etapa.bytes_salida = sum(cuadro.nbytes for cuadro in cuadros)
+    return dict(zip(pendientes, cuadros))
+
+
+def _codificar_pendientes(pendientes, fuente_path, resolucion, estilo, duracion, preset,
+                          progress_callback=None):
+    """Codifica los segmentos {huella: (texto, imagen)}, dibujando solo las que no tienen imagen"""
+    def progreso(valor):
+        if progress_callback:
+            progress_callback(valor)
+
+    # Las diapositivas ya dibujadas (p. ej. por el borrador) solo falta codificarlas
+    cuadros = {}
+    for huella in pendientes:
+        cuadro = _cargar_cuadro(huella)
+        if cuadro is not None and cuadro.shape[:2] == (resolucion[1], resolucion[0]):
+            cuadros[huella] = cuadro
+    logging.info(f"Render incremental: {len(cuadros)} de {len(pendientes)} diapositivas ya dibujadas")
+
+    por_dibujar = {huella: par for huella, par in pendientes.items() if huella not in cuadros}
+    if por_dibujar:
+        cuadros.update(_componer_pendientes(por_dibujar, fuente_path, resolucion, estilo,
+                                            progress_callback=lambda v: progreso(0.5 * v)))
+    for i, huella in enumerate(pendientes, start=1):
+        _guardar_segmento(cuadros[huella], duracion, preset, huella)
+        progreso(0.5 + 0.5 * i / len(pendientes))
+
+
+def renderizar_incremental(textos, imagenes, output_path, fuente_path=None,
+                           resolucion=RESOLUCION_POR_DEFECTO, estilo="degradado",
+                           duracion=DURACION_DIAPOSITIVA, preset=PRESET_POR_DEFECTO,
+                           progress_callback=None):
+    """
+    Genera el video reutilizando los segmentos de las diapositivas que no han cambiado.
+
+    Cada diapositiva (texto i sobre la imagen i, en ciclo) se identifica por su
+    huella; solo se dibujan y codifican las que no tienen segmento guardado y el
+    MP4 final se obtiene concatenando los segmentos por copia de flujo.
+
+    Returns:
+        tuple: (rutas de las imágenes con texto, ruta del video)
+    """
+    def progreso(valor):
+        if progress_callback:
+            progress_callback(valor)
+
+    resolucion = tuple(resolucion)
+    pares = [(texto, imagenes[i % len(imagenes)]) for i, texto in enumerate(textos)]
+    huellas = [huella_diapositiva(texto, imagen, fuente_path, resolucion, estilo, duracion, preset)
+               for texto, imagen in pares]
+    progreso(0.1)
+
+    pendientes = {}
+    for huella, par in zip(huellas, pares):
+        if huella not in pendientes and not all(p.exists() for p in _rutas_segmento(huella)):
+            pendientes[huella] = par
+    logging.info(f"Render incremental: {len(pendientes)} de {len(huellas)} diapositivas por regenerar")
+    progreso(0.25)
+
+    trabajo_dir = Path(tempfile.mkdtemp(prefix="segmentos_", dir=Path(output_path).parent))
+    try:
+        reservadas = {}
+        for intento in range(REINTENTOS_SEGMENTOS + 1):
+            if pendientes:
+                _codificar_pendientes(pendientes, fuente_path, resolucion, estilo, duracion, preset,
+                                      progress_callback=lambda v: progreso(0.25 + 0.5 * v))
+            pendientes = {}
+            for huella, par in zip(huellas, pares):
+                if huella in reservadas or huella in pendientes:
+                    continue
+                reservada = _reservar_diapositiva(huella, trabajo_dir)
+                if reservada is None:
+                    pendientes[huella] = par
+                else:
+                    reservadas[huella] = reservada
+            if not pendientes:
+                break
+            # Otro proceso expulsó estas diapositivas tras comprobarlas: se tratan como fallos
+            logging.warning(f"Render incremental: {len(pendientes)} diapositivas eliminadas durante el render, "
+                            f"se regeneran")
+        else:
+            raise RuntimeError("No se pudieron conservar los segmentos de las diapositivas")
+        progreso(0.75)
+
+        imagenes_con_texto = _enlazar_imagenes([reservadas[huella][1] for huella in huellas],
+                                               Path(output_path).parent)
+        video_path = concatenar_segmentos([reservadas[huella][0] for huella in huellas], output_path)
+    finally:
+        shutil.rmtree(trabajo_dir, ignore_errors=True)
+    progreso(1.0)
+
+    limpiar_segmentos()
+    return imagenes_con_texto, video_path
+
+
+def crear_video_incremental(textos, imagenes, titulo, fuente_path=None, progress_callback=None, destino_dir=None):
+    """Variante de crear_video con la misma firma y valor de retorno, basada en segmentos"""
+    if not textos or not imagenes:
+        return [], None
+    output_path = Path(destino_dir or tempfile.mkdtemp()) / _nombre_archivo(titulo)
+    return renderizar_incremental(textos, imagenes, output_path, fuente_path=fuente_path,
+                                  progress_callback=progress_callback)
+
+
+def renderizar_borrador(textos, imagenes, output_path, fuente_path=None,
+                        resolucion=RESOLUCION_POR_DEFECTO, estilo="degradado",
+                        duracion=DURACION_DIAPOSITIVA, preset=PRESET_POR_DEFECTO,
+                        progress_callback=None):
+    """
+    Genera una vista previa rápida: un cuadro por diapositiva, a RESOLUCION_BORRADOR
+    y con el preset 'preview'.
+
+    Las diapositivas se dibujan a la resolución final y se guardan con la misma
+    huella que usará renderizar_incremental (mismos resolucion, estilo, duracion y
+    preset), así el render definitivo solo tiene que codificarlas.
+
+    Returns:
+        tuple: (rutas de las imágenes con texto, ruta del borrador)
+    """
+    def progreso(valor):
+        if progress_callback:
+            progress_callback(valor)
+
+    resolucion = tuple(resolucion)
+    pares = [(texto, imagenes[i % len(imagenes)]) for i, texto in enumerate(textos)]
+    huellas = [huella_diapositiva(texto, imagen, fuente_path, resolucion, estilo, duracion, preset)
+               for texto, imagen in pares]
+    progreso(0.1)
+
+    with medir_etapa("render_borrador", incluir_subprocesos=True) as etapa:
+        reducidos = {}
+        pendientes = {}
+        for huella, par in zip(huellas, pares):
+            if huella in reducidos or huella in pendientes:
+                continue
+            cuadro = _cargar_cuadro(huella, RESOLUCION_BORRADOR)
+            if cuadro is None:
+                pendientes[huella] = par
+            else:
+                reducidos[huella] = cuadro
+        logging.info(f"Borrador: {len(pendientes)} de {len(huellas)} diapositivas por dibujar")
+
+        if pendientes:
+            cuadros = _componer_pendientes(pendientes, fuente_path, resolucion, estilo,
+                                           progress_callback=lambda v: progreso(0.1 + 0.6 * v))
+            for huella, cuadro in cuadros.items():
+                _guardar_cuadro(cuadro, huella)
+                reducidos[huella] = np.asarray(
+                    Image.fromarray(cuadro).resize(RESOLUCION_BORRADOR, Image.BILINEAR, reducing_gap=2.0))
+        progreso(0.75)
+
+        # Todas las diapositivas duran lo mismo: basta un cuadro por diapositiva
+        codificar_frames([reducidos[huella] for huella in huellas], duracion, output_path,
+                         preset=PRESET_BORRADOR, fps=None,
+                         fps_entrada=1 / Fraction(duracion).limit_denominator(1000))
+        etapa.bytes_salida = os.path.getsize(output_path)
+
+    imagenes_con_texto = []
+    ahora = time.time()
+    for i, huella in enumerate(huellas, start=1):
+        _, imagen = _rutas_segmento(huella)
+        destino = Path(output_path).parent / f"imagen_con_texto_{i}.jpg"
+        try:
+            _enlazar(imagen, destino)
+            os.utime(imagen, (ahora, ahora))
+        except FileNotFoundError:
+            # Otro proceso la expulsó: basta el cuadro reducido para la vista previa
+            if not destino.exists():
+                Image.fromarray(reducidos[huella]).save(destino, format="JPEG", quality=92)
+        imagenes_con_texto.append(str(destino))
+    progreso(1.0)
+    limpiar_segmentos()
+    return imagenes_con_texto, str(output_path)
+
+
+def crear_borrador(textos, imagenes, titulo, fuente_path=None, progress_callback=None, destino_dir=None):
+    """Como crear_video_incremental, pero genera el borrador en baja resolución"""
+    if not textos or not imagenes:
+        return [], None
+    output_path = Path(destino_dir or tempfile.mkdtemp()) / _nombre_archivo(titulo).replace(".mp4", "_borrador.mp4")
+    return renderizar_borrador(textos, imagenes, output_path, fuente_path=fuente_path,
+                               progress_callback=progress_callback)
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import logging
+import resource
+import threading
+import contextvars
+from pathlib import Path
+from functools import wraps
+from contextlib import contextmanager
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Límites superiores (segundos) de los buckets del histograma de duración
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf"))
+# Si se define, cada trabajo con traza escribe sus etapas en <dir>/<job_id>.jsonl
+TRAZAS_DIR = os.environ.get("METRICAS_TRAZAS_DIR")
+# Interfaz del servidor de /metrics; solo local salvo que se indique otra
+METRICAS_HOST = os.environ.get("METRICAS_HOST", "127.0.0.1")
+
+_lock = threading.Lock()
+_llamadas = defaultdict(int)                      # (etapa, estado) -> n
+_segundos_suma = defaultdict(float)               # etapa -> s
+_segundos_buckets = defaultdict(lambda: [0] * len(BUCKETS_SEGUNDOS))
+_cpu_segundos = defaultdict(float)
+_bytes_entrada = defaultdict(int)
+_bytes_salida = defaultdict(int)
+_memoria_pico = defaultdict(int)                  # etapa -> mayor RSS pico de una ejecución
+# Etapas en curso en el proceso: cada reinicio de VmHWM les traslada antes el pico alcanzado
+_lock_memoria = threading.Lock()
+_etapas_activas = set()
+
+_traza_actual = contextvars.ContextVar("traza_actual", default=None)
+_captura_actual = contextvars.ContextVar("captura_actual", default=None)
+
+
+class Etapa:
+    """Medidas de una ejecución de una etapa; bytes_entrada y bytes_salida los rellena quien mide"""
+
+    def __init__(self, nombre, bytes_entrada=0, bytes_salida=0):
+        self.nombre = nombre
+        self.bytes_entrada = bytes_entrada
+        self.bytes_salida = bytes_salida
+        self.segundos = 0.0
+        self.cpu_segundos = 0.0
+        self.memoria_pico = 0
+        self.estado = "ok"
+
+    def como_dict(self):
+        return {
+            "etapa": self.nombre,
+            "estado": self.estado,
+            "segundos": self.segundos,
+            "cpu_segundos": self.cpu_segundos,
+            "bytes_entrada": self.bytes_entrada,
+            "bytes_salida": self.bytes_salida,
+            "memoria_pico": self.memoria_pico,
+        }
+
+
+def _cpu_subprocesos():
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+
+def _memoria_proceso():
+    """(VmRSS, VmHWM) del proceso en bytes; (0, 0) fuera de Linux"""
+    valores = {}
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith(("VmRSS:", "VmHWM:")):
+                    clave, valor = linea.split(":", 1)
+                    valores[clave] = int(valor.split()[0]) * 1024
+    except OSError:
+        pass
+    return valores.get("VmRSS", 0), valores.get("VmHWM", 0)
+
+
+def _reiniciar_pico():
+    """Vuelve a poner VmHWM en el RSS actual (escribiendo 5 en /proc/self/clear_refs)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _iniciar_memoria(etapa):
+    # ru_maxrss y VmHWM son el máximo de toda la vida del proceso: se reinicia VmHWM al
+    # empezar cada etapa, anotando antes el pico a las etapas que ya estaban en curso
+    with _lock_memoria:
+        rss, pico = _memoria_proceso()
+        for activa in _etapas_activas:
+            activa.memoria_pico = max(activa.memoria_pico, pico)
+        etapa.memoria_pico = rss if _reiniciar_pico() else 0
+        _etapas_activas.add(etapa)
+
+
+def _terminar_memoria(etapa):
+    with _lock_memoria:
+        _etapas_activas.discard(etapa)
+        rss, pico = _memoria_proceso()
+        # Sin clear_refs el pico no se puede acotar a la etapa: queda el RSS al terminar
+        etapa.memoria_pico = max(etapa.memoria_pico, pico if etapa.memoria_pico else rss)
+
+
+def registrar(muestra):
+    """Acumula una muestra (dict de Etapa.como_dict) en las métricas del proceso"""
+    nombre = muestra["etapa"]
+    with _lock:
+        _llamadas[(nombre, muestra["estado"])] += 1
+        _segundos_suma[nombre] += muestra["segundos"]
+        buckets = _segundos_buckets[nombre]
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if muestra["segundos"] <= limite:
+                buckets[i] += 1
+        _cpu_segundos[nombre] += muestra["cpu_segundos"]
+        _bytes_entrada[nombre] += muestra["bytes_entrada"]
+        _bytes_salida[nombre] += muestra["bytes_salida"]
+        _memoria_pico[nombre] = max(_memoria_pico[nombre], muestra["memoria_pico"])
+
+
+@contextmanager
+def medir_etapa(nombre, bytes_entrada=0, bytes_salida=0, incluir_subprocesos=False):
+    """
+    Mide tiempo real, tiempo de CPU del hilo, bytes y memoria pico de un bloque.
+
+    La memoria pico es el RSS máximo del proceso mientras dura el bloque (VmHWM
+    reiniciado al empezar); si otros hilos trabajan a la vez incluye su memoria.
+
+    Con incluir_subprocesos=True suma también la CPU de los subprocesos terminados
+    durante el bloque (FFmpeg); solo es exacto si no hay otros en paralelo en el proceso.
+
+    Ejemplo:
+        with medir_etapa("descarga_imagenes") as etapa:
+            ...
+            etapa.bytes_entrada += len(data)
+    """
+    etapa = Etapa(nombre, bytes_entrada, bytes_salida)
+    inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+    inicio_hijos = _cpu_subprocesos() if incluir_subprocesos else 0.0
+    _iniciar_memoria(etapa)
+    try:
+        yield etapa
+    except BaseException:
+        etapa.estado = "error"
+        raise
+    finally:
+        etapa.segundos = time.perf_counter() - inicio
+        etapa.cpu_segundos = time.thread_time() - inicio_cpu
+        if incluir_subprocesos:
+            etapa.cpu_segundos += _cpu_subprocesos() - inicio_hijos
+        _terminar_memoria(etapa)
+        muestra = etapa.como_dict()
+        registrar(muestra)
+        captura = _captura_actual.get()
+        if captura is not None:
+            captura.append(muestra)
+        traza = _traza_actual.get()
+        if traza is not None:
+            traza.escribir(muestra)
+
+
+def instrumentar(nombre):
+    """Decorador equivalente a envolver la función en medir_etapa(nombre)"""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir_etapa(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+@contextmanager
+def capturar_etapas():
+    """Recoge las muestras medidas dentro del bloque (p. ej. en un proceso del pool de render)"""
+    muestras = []
+    token = _captura_actual.set(muestras)
+    try:
+        yield muestras
+    finally:
+        _captura_actual.reset(token)
+
+
+class _Traza:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def escribir(self, muestra):
+        linea = json.dumps({"ts": time.time(), **muestra}, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(linea + "\n")
+
+
+@contextmanager
+def traza(job_id, directorio=None):
+    """Escribe en un archivo JSONL cada etapa medida durante el trabajo (si hay directorio)"""
+    directorio = directorio or TRAZAS_DIR
+    if not directorio:
+        yield None
+        return
+    Path(directorio).mkdir(parents=True, exist_ok=True)
+    path = Path(directorio) / f"{job_id}.jsonl"
+    token = _traza_actual.set(_Traza(path))
+    try:
+        yield path
+    finally:
+        _traza_actual.reset(token)
+
+
+def _formatear_limite(limite):
+    return "+Inf" if limite == float("inf") else repr(float(limite))
+
+
+def exportar_prometheus():
+    """Devuelve las métricas en el formato de texto de Prometheus"""
+    lineas = []
+    with _lock:
+        lineas += ["# HELP app_etapa_llamadas_total Ejecuciones de cada etapa del pipeline",
+                   "# TYPE app_etapa_llamadas_total counter"]
+        for (nombre, estado), n in sorted(_llamadas.items()):
+            lineas.append(f'app_etapa_llamadas_total{{etapa="{nombre}",estado="{estado}"}} {n}')
+
+        lineas += ["# HELP app_etapa_segundos Duración real de cada etapa",
+                   "# TYPE app_etapa_segundos histogram"]
+        for nombre, buckets in sorted(_segundos_buckets.items()):
+            for limite, n in zip(BUCKETS_SEGUNDOS, buckets):
+                lineas.append(f'app_etapa_segundos_bucket{{etapa="{nombre}",le="{_formatear_limite(limite)}"}} {n}')
+            lineas.append(f'app_etapa_segundos_sum{{etapa="{nombre}"}} {_segundos_suma[nombre]}')
+            lineas.append(f'app_etapa_segundos_count{{etapa="{nombre}"}} {buckets[-1]}')
+
+        for metrica, ayuda, valores in (
+            ("app_etapa_cpu_segundos_total", "Tiempo de CPU consumido por cada etapa", _cpu_segundos),
+            ("app_etapa_bytes_entrada_total", "Bytes leídos por cada etapa", _bytes_entrada),
+            ("app_etapa_bytes_salida_total", "Bytes escritos por cada etapa", _bytes_salida),
+        ):
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} counter"]
+            for nombre, valor in sorted(valores.items()):
+                lineas.append(f'{metrica}{{etapa="{nombre}"}} {valor}')
+
+        lineas += ["# HELP app_etapa_memoria_pico_bytes RSS máximo del proceso durante una ejecución de la etapa",
+                   "# TYPE app_etapa_memoria_pico_bytes gauge"]
+        for nombre, valor in sorted(_memoria_pico.items()):
+            lineas.append(f'app_etapa_memoria_pico_bytes{{etapa="{nombre}"}} {valor}')
+    return "\n".join(lineas) + "\n"
+
+
+_servidor = None
+_servidor_fallido = False
+
+
+def iniciar_servidor_metricas(puerto=None, host=None):
+    """Sirve /metrics en un hilo en segundo plano (una vez por proceso, aunque falle)"""
+    global _servidor, _servidor_fallido
+    puerto = int(puerto or os.environ.get("METRICAS_PUERTO", 9464))
+    host = host or METRICAS_HOST
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            cuerpo = exportar_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    with _lock:
+        if _servidor is not None or _servidor_fallido:
+            return _servidor
+        try:
+            _servidor = ThreadingHTTPServer((host, puerto), Handler)
+        except OSError as e:
+            # Otro proceso del nodo ya sirve las métricas en este puerto: no se reintenta en cada rerun
+            _servidor_fallido = True
+            logging.warning(f"No se pudo iniciar el servidor de métricas en {host}:{puerto}: {str(e)}")
+            return None
+        threading.Thread(target=_servidor.serve_forever, daemon=True).start()
+        logging.info(f"Métricas disponibles en http://{host}:{puerto}/metrics")
+        return _servidor
@@ -0,0 +1,186 @@
+import os
+import queue
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from fractions import Fraction
+
+import numpy as np
+from PIL import Image
+
+from utils.metrics import medir_etapa
+from utils.slide_encoder import CodificadorTuberia, PRESET_POR_DEFECTO, FPS_POR_DEFECTO
+from utils.text_overlay import decodificar_para_resoluciones, componer_diapositiva
+from utils.incremental_render import _nombre_archivo, DURACION_DIAPOSITIVA
+
+# Formatos de salida por plataforma: (ancho, alto)
+FORMATOS = {
+    "16:9": (1280, 720),
+    "9:16": (720, 1280),
+    "1:1": (1080, 1080),
+}
+FORMATO_PRINCIPAL = "16:9"
+# La vista previa se obtiene reduciendo los cuadros del formato principal a unos
+# píxeles como RESOLUCION_PREVIEW, con la proporción del formato principal
+RESOLUCION_PREVIEW = (640, 360)
+PRESET_PREVIEW = "preview"
+# Cuadros en espera por codificador: limita la memoria si un FFmpeg va más lento
+CUADROS_EN_COLA = 2
+# Imágenes decodificadas que se conservan entre diapositivas (las que se repiten en ciclo)
+MAX_BYTES_DECODIFICADAS = int(os.environ.get("MAX_BYTES_DECODIFICADAS", 256 * 1024 * 1024))
+
+
+class _HiloCodificador(threading.Thread):
+    """Alimenta un CodificadorTuberia desde una cola para que los formatos se codifiquen en paralelo"""
+
+    def __init__(self, codificador, duracion):
+        super().__init__(daemon=True)
+        self.codificador = codificador
+        self.duracion = duracion
+        self.cola = queue.Queue(maxsize=CUADROS_EN_COLA)
+        self.cancelado = threading.Event()
+        self.error = None
+
+    def run(self):
+        while not self.cancelado.is_set():
+            try:
+                cuadro = self.cola.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if cuadro is None:
+                return
+            if self.error is None:
+                try:
+                    self.codificador.escribir(cuadro, self.duracion)
+                except Exception as e:
+                    self.error = e
+
+
+def _reducir(cuadro, resolucion):
+    return np.asarray(Image.fromarray(cuadro).resize(resolucion, Image.BILINEAR, reducing_gap=2.0))
+
+
+def resolucion_preview(resolucion):
+    """Resolución de la vista previa con la proporción de resolucion (dimensiones pares)"""
+    ancho, alto = resolucion
+    escala = min(1.0, (RESOLUCION_PREVIEW[0] * RESOLUCION_PREVIEW[1] / (ancho * alto)) ** 0.5)
+    return (max(2, round(ancho * escala / 2) * 2), max(2, round(alto * escala / 2) * 2))
+
+
+class _ImagenesDecodificadas:
+    """Imágenes decodificadas por ruta, expulsando las usadas hace más tiempo por encima de max_bytes"""
+
+    def __init__(self, resoluciones, max_bytes=MAX_BYTES_DECODIFICADAS):
+        self.resoluciones = resoluciones
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._bytes = 0
+        self.bytes_leidos = 0
+
+    def obtener(self, imagen):
+        if imagen in self._cache:
+            self._cache.move_to_end(imagen)
+            return self._cache[imagen]
+        decodificada = decodificar_para_resoluciones(imagen, self.resoluciones)
+        self.bytes_leidos += os.path.getsize(imagen)
+        self._cache[imagen] = decodificada
+        self._bytes += _bytes_imagen(decodificada)
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            _, expulsada = self._cache.popitem(last=False)
+            self._bytes -= _bytes_imagen(expulsada)
+        return decodificada
+
+
+def _bytes_imagen(imagen):
+    return imagen.width * imagen.height * len(imagen.getbands())
+
+
+def renderizar_multiformato(textos, imagenes, output_dir, titulo, fuente_path=None,
+                            formatos=tuple(FORMATOS), preview=False, estilo="degradado",
+                            duracion=DURACION_DIAPOSITIVA, preset=PRESET_POR_DEFECTO,
+                            progress_callback=None):
+    """
+    Genera varias versiones del video (p. ej. 16:9, 9:16 y 1:1) en una sola pasada.
+
+    Cada imagen se decodifica una vez para todos los formatos y cada diapositiva
+    se dibuja una vez por formato; los cuadros se envían a un FFmpeg por formato,
+    que codifican en paralelo. La vista previa reutiliza los cuadros del formato
+    principal reducidos sin deformarlos (ver resolucion_preview).
+
+    Returns:
+        tuple: (rutas de las imágenes con texto del formato principal,
+        dict formato -> ruta del video, incluida 'preview' si se pide)
+    """
+    formatos = [f for f in formatos if f in FORMATOS] or [FORMATO_PRINCIPAL]
+    principal = FORMATO_PRINCIPAL if FORMATO_PRINCIPAL in formatos else formatos[0]
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    base = _nombre_archivo(titulo)[:-len(".mp4")]
+
+    # Los formatos publicables van a frecuencia constante; la vista previa, con un
+    # cuadro por diapositiva (frecuencia variable), solo se usa dentro de la aplicación
+    salidas = {f: (FORMATOS[f], preset, FPS_POR_DEFECTO) for f in formatos}
+    if preview:
+        salidas["preview"] = (resolucion_preview(FORMATOS[principal]), PRESET_PREVIEW, None)
+    rutas = {f: output_dir / f"{base}_{f.replace(':', 'x')}.mp4" for f in salidas}
+
+    def progreso(valor):
+        if progress_callback:
+            progress_callback(valor)
+
+    hilos = {}
+    imagenes_con_texto = []
+    with medir_etapa("render_multiformato", incluir_subprocesos=True) as etapa:
+        try:
+            # Todas las diapositivas duran lo mismo: basta enviar un cuadro por diapositiva (con
+            # frecuencia constante FFmpeg lo repite hasta completar su duración)
+            fps_entrada = 1 / Fraction(duracion).limit_denominator(1000)
+            for formato, (resolucion, preset_salida, fps) in salidas.items():
+                codificador = CodificadorTuberia(rutas[formato], resolucion, duracion, preset=preset_salida,
+                                                 fps=fps, fps_entrada=fps_entrada)
+                hilos[formato] = _HiloCodificador(codificador, duracion)
+                hilos[formato].start()
+
+            decodificadas = _ImagenesDecodificadas([FORMATOS[f] for f in formatos])
+            for i, texto in enumerate(textos):
+                fondo = decodificadas.obtener(imagenes[i % len(imagenes)])
+                for formato in formatos:
+                    cuadro = componer_diapositiva(fondo, texto, fuente_path, FORMATOS[formato], estilo)
+                    hilos[formato].cola.put(cuadro)
+                    if formato == principal:
+                        path = output_dir / f"imagen_con_texto_{i + 1}.jpg"
+                        Image.fromarray(cuadro).save(path, quality=92)
+                        imagenes_con_texto.append(str(path))
+                        if preview:
+                            hilos["preview"].cola.put(_reducir(cuadro, salidas["preview"][0]))
+                progreso(0.9 * (i + 1) / len(textos))
+            etapa.bytes_entrada = decodificadas.bytes_leidos
+
+            for hilo in hilos.values():
+                hilo.cola.put(None)
+            for hilo in hilos.values():
+                hilo.join()
+                if hilo.error is not None:
+                    raise hilo.error
+            videos = {formato: hilo.codificador.cerrar() for formato, hilo in hilos.items()}
+        except Exception:
+            for hilo in hilos.values():
+                hilo.cancelado.set()
+                hilo.codificador.abortar()
+            raise
+        etapa.bytes_salida = sum(os.path.getsize(v) for v in videos.values())
+
+    progreso(1.0)
+    logging.info(f"Render multiformato terminado: {', '.join(videos)} ({len(textos)} diapositivas)")
+    return imagenes_con_texto, videos
+
+
+def crear_videos_multiformato(textos, imagenes, titulo, fuente_path=None, formatos=tuple(FORMATOS),
+                              preview=False, progress_callback=None, destino_dir=None):
+    """Como crear_video_incremental, pero devuelve (imagenes_con_texto, dict formato -> video)"""
+    if not textos or not imagenes:
+        return [], {}
+    return renderizar_multiformato(textos, imagenes, destino_dir or tempfile.mkdtemp(), titulo, fuente_path=fuente_path,
+                                   formatos=formatos, preview=preview, progress_callback=progress_callback)
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.descargas import hash_archivo
+from utils.metrics import capturar_etapas, traza, registrar
+from utils.workspace import reservar
+
+# Número máximo de codificaciones FFmpeg simultáneas en este nodo
+MAX_RENDERS_CONCURRENTES = int(os.environ.get("MAX_RENDERS_CONCURRENTES", os.cpu_count() or 1))
+# Trabajos en espera permitidos además de los que se están ejecutando
+MAX_RENDERS_EN_COLA = int(os.environ.get("MAX_RENDERS_EN_COLA", MAX_RENDERS_CONCURRENTES * 4))
+# Segundos que se conserva el resultado de un trabajo terminado que nadie ha consultado
+TTL_RESULTADOS = int(os.environ.get("TTL_RESULTADOS", 3600))
+
+PENDIENTE = "pendiente"
+EN_PROCESO = "en_proceso"
+TERMINADO = "terminado"
+ERROR = "error"
+
+_lock = threading.Lock()
+_executor = None
+_manager = None
+_progreso = None
+_trabajos = {}
+_terminados = {}
+_pool_roto = False
+
+
+class ColaLlenaError(RuntimeError):
+    """Se lanza cuando la cola de renders ha alcanzado su capacidad máxima"""
+
+
+def _iniciar_pool():
+    """Crea el pool de procesos y el diccionario compartido de progreso (una vez por proceso)"""
+    global _executor, _manager, _progreso
+    if _executor is None:
+        contexto = multiprocessing.get_context("spawn")
+        _manager = contexto.Manager()
+        _progreso = _manager.dict()
+        _executor = ProcessPoolExecutor(max_workers=MAX_RENDERS_CONCURRENTES, mp_context=contexto,
+                                        initializer=_inicializar_proceso)
+        logging.info(f"Pool de renders iniciado con {MAX_RENDERS_CONCURRENTES} procesos")
+
+
+def _reiniciar_pool():
+    """Descarta un pool roto (p. ej. un proceso murió por falta de memoria) y crea otro"""
+    global _executor, _manager, _progreso, _pool_roto
+    logging.error("El pool de renders está roto; se vuelve a crear")
+    _pool_roto = False
+    try:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _manager.shutdown()
+    except Exception as e:
+        logging.warning(f"Error al cerrar el pool de renders roto: {str(e)}")
+    _executor = _manager = _progreso = None
+    _iniciar_pool()
+
+
+def _inicializar_proceso():
+    """Carga en cada proceso del pool los módulos, FFmpeg y la fuente antes del primer render"""
+    from utils.assets import importar_modulos_pesados, fuente_en_cache
+    from utils.text_overlay import cargar_fuente, tamano_fuente, RESOLUCION_POR_DEFECTO
+
+    importar_modulos_pesados()
+    cargar_fuente(fuente_en_cache(), tamano_fuente(RESOLUCION_POR_DEFECTO))
+
+
+def _sin_trabajo():
+    return os.getpid()
+
+
+def precalentar_pool(procesos=1):
+    """Arranca el pool y sus primeros procesos sin esperar a que llegue un render"""
+    with _lock:
+        _iniciar_pool()
+        futuros = [_executor.submit(_sin_trabajo) for _ in range(min(procesos, MAX_RENDERS_CONCURRENTES))]
+    for futuro in futuros:
+        futuro.result()
+
+
+def huella_render(textos, imagenes, titulo, fuente_path=None, formatos=None, preview=False, borrador=False,
+                  destino_dir=None):
+    """Calcula un hash de contenido de las entradas de un render (y de su directorio de salida)"""
+    h = hashlib.sha256()
+    h.update(json.dumps({"textos": list(textos), "titulo": titulo, "formatos": list(formatos or []),
+                         "preview": preview, "borrador": borrador,
+                         "destino_dir": str(destino_dir) if destino_dir else None},
+                        ensure_ascii=False).encode("utf-8"))
+    for ruta in [*imagenes, fuente_path]:
+        if ruta and os.path.exists(ruta):
+            h.update(hash_archivo(ruta).encode())
+        else:
+            h.update(str(ruta).encode())
+    return h.hexdigest()[:32]
+
+
+def _ejecutar_render(job_id, textos, imagenes, titulo, fuente_path, progreso, formatos=None, preview=False,
+                     borrador=False, destino_dir=None):
+    """
+    Ejecuta el render en un proceso del pool publicando el progreso.
+
+    Con un solo formato usa el render incremental; con varios (o con vista
+    previa), el render multiformato; con borrador, solo la vista previa rápida.
+    Devuelve (resultado, muestras): las etapas medidas en el proceso hijo se
+    registran después en las métricas del proceso principal.
+    """
+    from utils.incremental_render import crear_video_incremental, crear_borrador
+    from utils.multi_render import crear_videos_multiformato, FORMATO_PRINCIPAL
+
+    def progress_callback(valor):
+        progreso[job_id] = float(valor)
+
+    progreso[job_id] = 0.0
+    with traza(job_id), capturar_etapas() as muestras:
+        if borrador:
+            imagenes_con_texto, video_path = crear_borrador(
+                textos, imagenes, titulo, fuente_path=fuente_path, progress_callback=progress_callback,
+                destino_dir=destino_dir)
+            videos = {"borrador": video_path} if video_path else {}
+        elif not preview and list(formatos or [FORMATO_PRINCIPAL]) == [FORMATO_PRINCIPAL]:
+            imagenes_con_texto, video_path = crear_video_incremental(
+                textos, imagenes, titulo, fuente_path=fuente_path, progress_callback=progress_callback,
+                destino_dir=destino_dir)
+            videos = {FORMATO_PRINCIPAL: video_path} if video_path else {}
+        else:
+            imagenes_con_texto, videos = crear_videos_multiformato(
+                textos, imagenes, titulo, fuente_path=fuente_path, formatos=formatos or [FORMATO_PRINCIPAL],
+                preview=preview, progress_callback=progress_callback, destino_dir=destino_dir)
+            video_path = videos.get(FORMATO_PRINCIPAL) or next(
+                (v for f, v in videos.items() if f != "preview"), None)
+    return (imagenes_con_texto, video_path, videos), muestras
+
+
+def _registrar_metricas_render(futuro):
+    global _pool_roto
+    if not futuro.cancelled() and isinstance(futuro.exception(), BrokenProcessPool):
+        _pool_roto = True
+    with _lock:
+        for job_id, otro in _trabajos.items():
+            if otro is futuro:
+                _terminados[job_id] = time.monotonic()
+    if not futuro.cancelled() and futuro.exception() is None:
+        for muestra in futuro.result()[1]:
+            registrar(muestra)
+
+
+def enviar_render(textos, imagenes, titulo, fuente_path=None, formatos=None, preview=False, borrador=False,
+                  destino_dir=None):
+    """
+    Encola la creación de un video y devuelve el identificador del trabajo.
+
+    formatos es una lista de claves de utils.multi_render.FORMATOS ('16:9',
+    '9:16', '1:1'); preview añade una versión ligera. Con borrador solo se genera
+    la vista previa rápida (baja resolución), cuyas diapositivas reutiliza después
+    el render definitivo. destino_dir es el directorio de salida (p. ej. del espacio
+    de trabajo del proyecto) y forma parte de la huella. Si hay un trabajo pendiente o
+    en curso con las mismas entradas se devuelve su identificador sin encolar otro;
+    los terminados no se reutilizan.
+    """
+    job_id = huella_render(textos, imagenes, titulo, fuente_path, formatos, preview, borrador, destino_dir)
+    with _lock:
+        _olvidar_caducados()
+        futuro = _trabajos.get(job_id)
+        if futuro is not None and not futuro.done():
+            return job_id
+        _olvidar(job_id)
+
+        activos = sum(1 for f in _trabajos.values() if not f.done())
+        if activos >= MAX_RENDERS_CONCURRENTES + MAX_RENDERS_EN_COLA:
+            raise ColaLlenaError("Hay demasiados videos en proceso. Inténtalo de nuevo en unos minutos.")
+
+        _iniciar_pool()
+        if _pool_roto:
+            _reiniciar_pool()
+        argumentos = (_ejecutar_render, job_id, list(textos), list(imagenes), titulo, fuente_path,
+                      list(formatos or []), preview, borrador, destino_dir)
+        try:
+            futuro = _enviar(*argumentos)
+        except BrokenProcessPool:
+            _reiniciar_pool()
+            futuro = _enviar(*argumentos)
+        _trabajos[job_id] = futuro
+        # Los procesos del pool escriben en destino_dir: su espacio de trabajo no se limpia mientras tanto
+        soltar = reservar(destino_dir) if destino_dir else None
+    futuro.add_done_callback(_registrar_metricas_render)
+    if soltar is not None:
+        futuro.add_done_callback(lambda _: soltar())
+    logging.info(f"Render {job_id} encolado")
+    return job_id
+
+
+def _enviar(funcion, job_id, textos, imagenes, titulo, fuente_path, *resto):
+    return _executor.submit(funcion, job_id, textos, imagenes, titulo, fuente_path, _progreso, *resto)
+
+
+def _olvidar(job_id):
+    _trabajos.pop(job_id, None)
+    _terminados.pop(job_id, None)
+    if _progreso is not None:
+        try:
+            _progreso.pop(job_id, None)
+        except Exception:
+            pass
+
+
+def _olvidar_caducados():
+    """Elimina los trabajos terminados cuyo resultado nadie ha consultado en TTL_RESULTADOS"""
+    limite = time.monotonic() - TTL_RESULTADOS
+    for job_id in [j for j, terminado in _terminados.items() if terminado < limite]:
+        _olvidar(job_id)
+
+
+def _leer_progreso(job_id):
+    try:
+        return _progreso.get(job_id, 0.0) if _progreso is not None else 0.0
+    except Exception:
+        # El gestor del progreso murió con el pool; se recrea en el siguiente envío
+        return 0.0
+
+
+def estado_render(job_id):
+    """
+    Devuelve el estado de un trabajo de render.
+
+    El resultado de un trabajo terminado (bien o con error) se conserva hasta que
+    quien lo consulta lo confirma con descartar_render, o hasta TTL_RESULTADOS si
+    nadie lo hace; así una consulta interrumpida puede repetirse.
+
+    Returns:
+        dict: {'estado', 'progreso', 'resultado', 'error'}. 'resultado' es la tupla
+        (imagenes_con_texto, video_path, videos), con videos un dict formato -> ruta
+        y video_path el del formato principal.
+    """
+    futuro = _trabajos.get(job_id)
+    if futuro is None:
+        return {"estado": ERROR, "progreso": 0.0, "resultado": None,
+                "error": "El trabajo de render no existe o se perdió al reiniciar el servidor."}
+
+    progreso = _leer_progreso(job_id)
+    if not futuro.done():
+        estado = EN_PROCESO if futuro.running() else PENDIENTE
+        return {"estado": estado, "progreso": progreso, "resultado": None, "error": None}
+
+    error = futuro.exception()
+    if isinstance(error, BrokenProcessPool):
+        return {"estado": ERROR, "progreso": progreso, "resultado": None,
+                "error": "El proceso de render terminó de forma inesperada (posible falta de memoria)."}
+    if error is not None:
+        return {"estado": ERROR, "progreso": progreso, "resultado": None, "error": str(error)}
+    return {"estado": TERMINADO, "progreso": 1.0, "resultado": futuro.result()[0], "error": None}
+
+
+def descartar_render(job_id):
+    """Confirma que se ha recogido el resultado de un trabajo terminado y lo olvida"""
+    with _lock:
+        futuro = _trabajos.get(job_id)
+        if futuro is not None and futuro.done():
+            _olvidar(job_id)
@@ -0,0 +1,257 @@
+import os
+import shutil
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+from functools import lru_cache
+
+import numpy as np
+
+from utils.metrics import medir_etapa
+
+# Parámetros de x264 para vídeos hechos de imágenes fijas. Son independientes del
+# hardware: solo se usa el codificador por software libx264.
+PRESETS = {
+    "fast": {"preset": "veryfast", "crf": 23},
+    "balanced": {"preset": "medium", "crf": 21},
+    "small": {"preset": "slow", "crf": 27},
+    # Vista previa ligera: prima la velocidad y el tamaño sobre la calidad
+    "preview": {"preset": "ultrafast", "crf": 32},
+}
+PRESET_POR_DEFECTO = "balanced"
+# Frecuencia constante de los videos que se entregan (la misma que usaba moviepy). None =
+# frecuencia variable, un cuadro por diapositiva: solo para borradores y vistas previas.
+FPS_POR_DEFECTO = int(os.environ.get("FPS_VIDEO", 24))
+# Distancia mínima entre keyframes con CFR: los cuadros repetidos cuestan casi nada
+SEGUNDOS_GOP = 10
+
+
+class CodificacionError(RuntimeError):
+    """Error devuelto por FFmpeg al codificar las diapositivas"""
+
+
+@lru_cache(maxsize=1)
+def obtener_ffmpeg():
+    """Localiza el binario de FFmpeg (el de imageio-ffmpeg o el del sistema) una vez por proceso"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        ruta = shutil.which("ffmpeg")
+        if ruta is None:
+            raise CodificacionError("No se encontró FFmpeg. Instala imageio-ffmpeg o FFmpeg en el sistema.")
+        return ruta
+
+
+def _par(valor):
+    return valor - valor % 2
+
+
+def _argumentos_x264(preset, fps, duracion_max):
+    if preset not in PRESETS:
+        raise ValueError(f"Preset desconocido '{preset}'. Opciones: {', '.join(PRESETS)}")
+    config = PRESETS[preset]
+    argumentos = [
+        "-c:v", "libx264",
+        "-preset", config["preset"],
+        "-crf", str(config["crf"]),
+        "-tune", "stillimage",
+        "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+    ]
+    if fps is None:
+        # Sin duplicar cuadros: cada diapositiva se codifica una vez con su duración. Sin
+        # B-frames, que no aportan nada con imágenes fijas y con VFR descuadran la duración del MP4
+        return argumentos + ["-fps_mode", "vfr", "-bf", "0"]
+    # GOP largo (al menos una diapositiva); x264 añade keyframes en los cambios de escena
+    gop = max(1, int(round(fps * max(duracion_max, SEGUNDOS_GOP))))
+    return argumentos + ["-r", str(fps), "-g", str(gop)]
+
+
+def _filtro_escala(resolucion):
+    ancho, alto = resolucion
+    return (f"scale={ancho}:{alto}:force_original_aspect_ratio=decrease,"
+            f"pad={ancho}:{alto}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p")
+
+
+def ejecutar_ffmpeg(comando):
+    """Ejecuta FFmpeg y lanza CodificacionError con el final de stderr si falla"""
+    logging.info(f"Ejecutando FFmpeg: {' '.join(comando[:6])} ...")
+    proceso = subprocess.run(comando, capture_output=True)
+    if proceso.returncode != 0:
+        raise CodificacionError(
+            f"FFmpeg terminó con código {proceso.returncode}: "
+            f"{proceso.stderr.decode(errors='replace')[-1000:]}"
+        )
+
+
+def resolucion_de(imagen_path):
+    """Resolución (par) de una imagen, usada cuando no se indica una explícita"""
+    from PIL import Image
+    with Image.open(imagen_path) as img:
+        return _par(img.width), _par(img.height)
+
+
+def codificar_diapositivas(imagenes, duraciones, output_path, preset=PRESET_POR_DEFECTO,
+                           resolucion=None, fps=FPS_POR_DEFECTO):
+    """
+    Codifica una secuencia de imágenes fijas con el demuxer concat de FFmpeg.
+
+    Cada imagen se decodifica una sola vez y se muestra durante su duración; no se
+    recompone ningún cuadro como en concatenate_videoclips(method="compose").
+
+    Args:
+        imagenes (list): Rutas de las imágenes, en orden.
+        duraciones (list | float): Segundos por imagen (o un único valor para todas).
+        output_path (str): Ruta del MP4 de salida.
+        preset (str): 'fast', 'balanced' o 'small'.
+        resolucion (tuple): (ancho, alto) de salida; por defecto la de la primera imagen.
+        fps (int): Cuadros por segundo constantes de salida (FPS_POR_DEFECTO); None
+            codifica cada diapositiva como un único cuadro de frecuencia variable.
+
+    Returns:
+        str: Ruta del video generado.
+    """
+    if not imagenes:
+        raise ValueError("No hay imágenes para codificar")
+    if isinstance(duraciones, (int, float)):
+        duraciones = [duraciones] * len(imagenes)
+    if len(duraciones) != len(imagenes):
+        raise ValueError("Debe haber una duración por imagen")
+    resolucion = resolucion or resolucion_de(imagenes[0])
+
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        lista = temp_dir / "diapositivas.ffconcat"
+        lineas = ["ffconcat version 1.0"]
+        for imagen, duracion in zip(imagenes, duraciones):
+            ruta = os.path.abspath(imagen).replace("'", r"'\''")
+            lineas += [f"file '{ruta}'", f"duration {duracion:.3f}"]
+        filtro = _filtro_escala(resolucion)
+        if fps is None:
+            # Con frecuencia variable la última diapositiva dura hasta el cuadro siguiente:
+            # se repite el archivo para que ese cuadro exista
+            lineas.append(f"file '{ruta}'")
+            limite = []
+        else:
+            # Con -r la entrada repetida recibiría una duración media y alargaría el video:
+            # se clona el último cuadro durante su duración y se corta en el total exacto
+            filtro += f",tpad=stop_mode=clone:stop_duration={duraciones[-1]:.3f}"
+            limite = ["-t", f"{sum(duraciones):.3f}"]
+        lista.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+
+        comando = [
+            obtener_ffmpeg(), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", str(lista),
+            "-vf", filtro,
+            *_argumentos_x264(preset, fps, max(duraciones)),
+            *limite,
+            str(output_path),
+        ]
+        with medir_etapa("codificacion", incluir_subprocesos=True) as etapa:
+            etapa.bytes_entrada = sum(os.path.getsize(imagen) for imagen in set(imagenes))
+            ejecutar_ffmpeg(comando)
+            etapa.bytes_salida = os.path.getsize(output_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    logging.info(f"Video codificado en {output_path} ({len(imagenes)} diapositivas, preset {preset})")
+    return str(output_path)
+
+
+class CodificadorTuberia:
+    """
+    Proceso FFmpeg que recibe cuadros RGB del mismo tamaño por una tubería.
+
+    Permite alimentar varios codificadores a la vez (uno por formato de salida)
+    con cuadros generados sobre la marcha, sin tenerlos todos en memoria.
+    """
+
+    def __init__(self, output_path, tamano, duracion_max, preset=PRESET_POR_DEFECTO,
+                 fps=FPS_POR_DEFECTO, fps_entrada=4):
+        ancho, alto = tamano
+        if ancho % 2 or alto % 2:
+            raise ValueError("El ancho y el alto de los cuadros deben ser pares")
+        self.output_path = str(output_path)
+        self.tamano = (ancho, alto)
+        self.fps_entrada = fps_entrada
+        self.bytes_escritos = 0
+        comando = [
+            obtener_ffmpeg(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{ancho}x{alto}",
+            "-framerate", str(fps_entrada), "-i", "pipe:0",
+            *_argumentos_x264(preset, fps, duracion_max),
+            self.output_path,
+        ]
+        logging.info(f"Ejecutando FFmpeg: {' '.join(comando[:6])} ...")
+        self.proceso = subprocess.Popen(comando, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._roto = False
+
+    def escribir(self, frame, duracion):
+        """Envía una diapositiva round(duración * fps_entrada) veces"""
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.shape[:2] != (self.tamano[1], self.tamano[0]):
+            raise ValueError("Todos los cuadros deben tener el mismo tamaño")
+        if self._roto:
+            return
+        datos = frame.tobytes()
+        try:
+            for _ in range(max(1, int(round(duracion * self.fps_entrada)))):
+                self.proceso.stdin.write(datos)
+                self.bytes_escritos += len(datos)
+        except BrokenPipeError:
+            # FFmpeg ha terminado antes de tiempo; el error se informa en cerrar()
+            self._roto = True
+
+    def cerrar(self):
+        """Termina la codificación y devuelve la ruta del video"""
+        try:
+            self.proceso.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self.proceso.stderr.read()
+        self.proceso.wait()
+        if self.proceso.returncode != 0:
+            raise CodificacionError(
+                f"FFmpeg terminó con código {self.proceso.returncode}: {stderr.decode(errors='replace')[-1000:]}"
+            )
+        return self.output_path
+
+    def abortar(self):
+        self.proceso.kill()
+        self.proceso.wait()
+
+
+def codificar_frames(frames, duraciones, output_path, preset=PRESET_POR_DEFECTO,
+                     fps=FPS_POR_DEFECTO, fps_entrada=4):
+    """
+    Codifica cuadros en memoria (arrays uint8 HxWx3 o imágenes PIL RGB del mismo tamaño) enviándolos
+    por una tubería a FFmpeg, sin escribir PNG intermedios.
+
+    Cada diapositiva se envía round(duración * fps_entrada) veces. Con un entero en
+    fps FFmpeg duplica cuadros hasta alcanzarlo (si todas duran lo mismo basta
+    fps_entrada = 1 / duración); con fps=None la salida conserva fps_entrada.
+    """
+    frames = [np.asarray(frame, dtype=np.uint8) for frame in frames]
+    if not frames:
+        raise ValueError("No hay cuadros para codificar")
+    if isinstance(duraciones, (int, float)):
+        duraciones = [duraciones] * len(frames)
+    alto, ancho = frames[0].shape[:2]
+
+    with medir_etapa("codificacion", incluir_subprocesos=True) as etapa:
+        codificador = CodificadorTuberia(output_path, (ancho, alto), max(duraciones), preset=preset,
+                                         fps=fps, fps_entrada=fps_entrada)
+        try:
+            for frame, duracion in zip(frames, duraciones):
+                codificador.escribir(frame, duracion)
+        except Exception:
+            codificador.abortar()
+            raise
+        codificador.cerrar()
+        etapa.bytes_entrada = codificador.bytes_escritos
+        etapa.bytes_salida = os.path.getsize(output_path)
+
+    logging.info(f"Video codificado en {output_path} ({len(frames)} diapositivas, preset {preset})")
+    return str(output_path)
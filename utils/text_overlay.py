@@ -0,0 +1,183 @@
+import os
+import logging
+from pathlib import Path
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+
+RESOLUCION_POR_DEFECTO = (1280, 720)
+ESTILOS = ("degradado", "sombra")
+# Diapositivas mezcladas a la vez; limita la memoria del paso vectorizado
+TAMANO_LOTE = int(os.environ.get("TAMANO_LOTE_OVERLAY", 8))
+
+COLOR_TEXTO = np.array([255, 255, 255], dtype=np.float32)
+COLOR_PLACA = np.array([0, 0, 0], dtype=np.float32)
+
+
+@lru_cache(maxsize=32)
+def cargar_fuente(fuente_path, size):
+    """Carga la fuente una sola vez por (ruta, tamaño)"""
+    if fuente_path:
+        try:
+            return ImageFont.truetype(fuente_path, size)
+        except OSError:
+            logging.warning(f"No se pudo cargar la fuente {fuente_path}, se usa la predeterminada")
+    return ImageFont.load_default(size)
+
+
+def tamano_fuente(resolucion):
+    """Tamaño de letra proporcional a la resolución de salida"""
+    ancho, alto = resolucion
+    return max(16, min(ancho, alto) // 14)
+
+
+@lru_cache(maxsize=1024)
+def ajustar_texto(texto, fuente_path, size, ancho_max):
+    """Divide el texto en líneas que caben en ancho_max píxeles"""
+    fuente = cargar_fuente(fuente_path, size)
+    lineas = []
+    for parrafo in texto.splitlines() or [""]:
+        actual = ""
+        for palabra in parrafo.split():
+            candidata = f"{actual} {palabra}".strip()
+            if actual and fuente.getlength(candidata) > ancho_max:
+                lineas.append(actual)
+                actual = palabra
+            else:
+                actual = candidata
+        if actual:
+            lineas.append(actual)
+    return tuple(lineas)
+
+
+@lru_cache(maxsize=64)
+def mascaras_texto(texto, fuente_path, resolucion, estilo="degradado"):
+    """
+    Devuelve las máscaras alfa (uint8, alto x ancho) de la placa y del texto de
+    una diapositiva.
+
+    El texto se dibuja una sola vez en escala de grises; el resultado se reutiliza
+    para todas las imágenes que lleven el mismo texto.
+    """
+    ancho, alto = resolucion
+    size = tamano_fuente(resolucion)
+    fuente = cargar_fuente(fuente_path, size)
+    lineas = ajustar_texto(texto, fuente_path, size, int(ancho * 0.86))
+
+    interlineado = int(size * 1.25)
+    alto_bloque = interlineado * len(lineas)
+    y = max(int(alto * 0.05), alto - alto_bloque - int(alto * 0.08))
+
+    capa = Image.new("L", (ancho, alto), 0)
+    draw = ImageDraw.Draw(capa)
+    for i, linea in enumerate(lineas):
+        x = (ancho - fuente.getlength(linea)) / 2
+        draw.text((x, y + i * interlineado), linea, fill=255, font=fuente)
+    texto_alfa = np.asarray(capa, dtype=np.uint8)
+
+    if estilo == "sombra":
+        desplazamiento = max(2, size // 16)
+        sombra = capa.transform(capa.size, Image.AFFINE, (1, 0, -desplazamiento, 0, 1, -desplazamiento))
+        sombra = sombra.filter(ImageFilter.GaussianBlur(desplazamiento))
+        placa_alfa = (np.asarray(sombra, dtype=np.float32) * 0.85).astype(np.uint8)
+    elif estilo == "degradado":
+        # Degradado vertical desde transparente hasta 0.75 bajo el bloque de texto
+        inicio = max(0, y - int(alto * 0.12))
+        columna = np.zeros(alto, dtype=np.uint8)
+        columna[inicio:] = np.linspace(0, 191, alto - inicio).astype(np.uint8)
+        placa_alfa = np.broadcast_to(columna[:, None], (alto, ancho))
+    else:
+        raise ValueError(f"Estilo desconocido '{estilo}'. Opciones: {', '.join(ESTILOS)}")
+
+    return placa_alfa, texto_alfa
+
+
+def cargar_imagen_ajustada(imagen_path, resolucion):
+    """Decodifica la imagen a tamaño reducido y la recorta para cubrir la resolución"""
+    with Image.open(imagen_path) as img:
+        img.draft("RGB", resolucion)
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        return np.asarray(ImageOps.fit(img, resolucion, Image.LANCZOS), dtype=np.uint8)
+
+
+def decodificar_para_resoluciones(imagen_path, resoluciones):
+    """
+    Decodifica la imagen una sola vez al tamaño mínimo que permite recortarla
+    para cualquiera de las resoluciones (p. ej. 16:9, 9:16 y 1:1).
+    """
+    with Image.open(imagen_path) as img:
+        ancho, alto = img.size
+        # Escala necesaria para cubrir la resolución más exigente
+        escala = max(max(r[0] / ancho, r[1] / alto) for r in resoluciones)
+        img.draft("RGB", (max(1, int(ancho * escala)), max(1, int(alto * escala))))
+        return ImageOps.exif_transpose(img).convert("RGB")
+
+
+def componer_diapositiva(fondo, texto, fuente_path=None, resolucion=RESOLUCION_POR_DEFECTO,
+                         estilo="degradado"):
+    """Recorta una imagen ya decodificada (PIL) a la resolución y dibuja el texto encima"""
+    fondo = np.asarray(ImageOps.fit(fondo, tuple(resolucion), Image.LANCZOS), dtype=np.uint8)
+    placa, alfa = mascaras_texto(texto, fuente_path, tuple(resolucion), estilo)
+    return _mezclar_lote(fondo[None], placa[None], alfa[None])[0]
+
+
+def _mezclar_lote(fondos, placas, textos):
+    """Mezcla un lote de diapositivas (N x alto x ancho x 3) en una sola operación"""
+    resultado = fondos.astype(np.float32)
+    placas = placas[..., None].astype(np.float32) / 255.0
+    textos = textos[..., None].astype(np.float32) / 255.0
+    resultado += (COLOR_PLACA - resultado) * placas
+    resultado += (COLOR_TEXTO - resultado) * textos
+    return np.clip(resultado + 0.5, 0, 255).astype(np.uint8)
+
+
+def componer_diapositivas(textos, imagenes, fuente_path=None, resolucion=RESOLUCION_POR_DEFECTO,
+                          estilo="degradado", progress_callback=None):
+    """
+    Dibuja cada texto sobre su imagen y devuelve los cuadros en memoria.
+
+    El texto i se coloca sobre la imagen i (las imágenes se reutilizan en ciclo si
+    hay más textos que imágenes). Las máscaras se calculan una vez por texto y la
+    mezcla se hace por lotes de TAMANO_LOTE diapositivas con NumPy.
+
+    Returns:
+        list: Arrays uint8 (alto x ancho x 3) listos para codificar_frames.
+    """
+    if not textos or not imagenes:
+        return []
+    resolucion = tuple(resolucion)
+    ancho, alto = resolucion
+    fondos_cache = {}
+    cuadros = []
+    total = len(textos)
+
+    for inicio in range(0, total, TAMANO_LOTE):
+        indices = range(inicio, min(inicio + TAMANO_LOTE, total))
+        fondos = np.empty((len(indices), alto, ancho, 3), dtype=np.uint8)
+        placas = np.empty((len(indices), alto, ancho), dtype=np.uint8)
+        alfas = np.empty((len(indices), alto, ancho), dtype=np.uint8)
+        for j, i in enumerate(indices):
+            imagen = imagenes[i % len(imagenes)]
+            if imagen not in fondos_cache:
+                fondos_cache[imagen] = cargar_imagen_ajustada(imagen, resolucion)
+            fondos[j] = fondos_cache[imagen]
+            placas[j], alfas[j] = mascaras_texto(textos[i], fuente_path, resolucion, estilo)
+        cuadros.extend(_mezclar_lote(fondos, placas, alfas))
+        if progress_callback:
+            progress_callback(len(cuadros) / total)
+
+    return cuadros
+
+
+def guardar_diapositivas(cuadros, destino_dir, formato="JPEG"):
+    """Escribe los cuadros en disco (para mostrarlos o descargarlos) y devuelve sus rutas"""
+    destino_dir = Path(destino_dir)
+    destino_dir.mkdir(parents=True, exist_ok=True)
+    extension = "jpg" if formato == "JPEG" else formato.lower()
+    rutas = []
+    for i, cuadro in enumerate(cuadros):
+        path = destino_dir / f"imagen_con_texto_{i + 1}.{extension}"
+        Image.fromarray(cuadro).save(path, format=formato, quality=92)
+        rutas.append(str(path))
+    return rutas
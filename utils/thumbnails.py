@@ -0,0 +1,81 @@
+import os
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Memoria máxima ocupada por las miniaturas en caché (por proceso)
+MAX_BYTES_MINIATURAS = int(os.environ.get("MAX_BYTES_MINIATURAS", 64 * 1024 * 1024))
+MAX_HILOS_MINIATURAS = min(8, os.cpu_count() or 1)
+
+_cache = OrderedDict()
+_bytes_cache = 0
+_lock = threading.Lock()
+
+
+def _clave(imagen_path, width):
+    stat = os.stat(imagen_path)
+    return (os.path.abspath(imagen_path), stat.st_mtime_ns, width)
+
+
+def _generar_miniatura(imagen_path, width):
+    """Decodifica la imagen a tamaño reducido y la codifica como JPEG"""
+    with Image.open(imagen_path) as img:
+        alto = max(1, width * img.height // img.width)
+        # En JPEG, draft decodifica directamente a una escala 1/2, 1/4 o 1/8
+        img.draft("RGB", (width, alto))
+        img.thumbnail((width, alto))
+        buf = BytesIO()
+        img.convert("RGB").save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _guardar(clave, data):
+    global _bytes_cache
+    with _lock:
+        if clave in _cache:
+            return
+        _cache[clave] = data
+        _bytes_cache += len(data)
+        while _bytes_cache > MAX_BYTES_MINIATURAS and len(_cache) > 1:
+            _, expulsada = _cache.popitem(last=False)
+            _bytes_cache -= len(expulsada)
+
+
+def obtener_miniatura(imagen_path, width=200):
+    """Devuelve los bytes JPEG de la miniatura, generándola solo la primera vez"""
+    clave = _clave(imagen_path, width)
+    with _lock:
+        data = _cache.get(clave)
+        if data is not None:
+            _cache.move_to_end(clave)
+            return data
+    data = _generar_miniatura(imagen_path, width)
+    _guardar(clave, data)
+    return data
+
+
+def precargar_miniaturas(imagenes_paths, width=200):
+    """Genera en paralelo las miniaturas que aún no están en caché"""
+    pendientes = []
+    with _lock:
+        for path in imagenes_paths:
+            try:
+                if _clave(path, width) not in _cache:
+                    pendientes.append(path)
+            except OSError:
+                continue
+    if not pendientes:
+        return
+
+    def generar(path):
+        try:
+            obtener_miniatura(path, width)
+        except Exception as e:
+            logging.warning(f"No se pudo generar la miniatura de {path}: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=min(MAX_HILOS_MINIATURAS, len(pendientes))) as executor:
+        list(executor.map(generar, pendientes))
@@ -0,0 +1,143 @@
+import os
+import math
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from utils.metrics import medir_etapa
+
+# Igual que utils.text_overlay.RESOLUCION_POR_DEFECTO; no se importa para no cargar NumPy al arrancar
+RESOLUCION_POR_DEFECTO = (1280, 720)
+
+# Las imágenes subidas se guardan por contenido: la misma foto se procesa una sola vez
+SUBIDAS_DIR = Path(os.environ.get("SUBIDAS_DIR", Path(tempfile.gettempdir()) / "app_seo_subidas"))
+MAX_HILOS_SUBIDAS = int(os.environ.get("MAX_HILOS_SUBIDAS", min(4, os.cpu_count() or 1)))
+# Memoria máxima de píxeles decodificados a la vez entre todas las subidas en curso
+MAX_BYTES_DECODIFICACION = int(os.environ.get("MAX_BYTES_DECODIFICACION", 256 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+
+# Orientaciones EXIF que intercambian ancho y alto
+_ORIENTACIONES_GIRADAS = {5, 6, 7, 8}
+
+
+class _PresupuestoMemoria:
+    """Semáforo por bytes: cada decodificación reserva su tamaño estimado"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.en_uso = 0
+        self._condicion = threading.Condition()
+
+    def adquirir(self, n):
+        with self._condicion:
+            # Una imagen mayor que el presupuesto se procesa sola, sin bloquearse para siempre
+            while self.en_uso and self.en_uso + n > self.maximo:
+                self._condicion.wait()
+            self.en_uso += n
+
+    def liberar(self, n):
+        with self._condicion:
+            self.en_uso -= n
+            self._condicion.notify_all()
+
+
+_presupuesto = _PresupuestoMemoria(MAX_BYTES_DECODIFICACION)
+
+
+def hash_subida(archivo):
+    """sha256 del contenido de un archivo subido (UploadedFile o similar), leído por bloques"""
+    h = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in iter(lambda: archivo.read(CHUNK_SIZE), b""):
+        h.update(bloque)
+    archivo.seek(0)
+    return h.hexdigest()
+
+
+def _tamano_objetivo(tamano, orientacion, resolucion):
+    """Tamaño (en la orientación almacenada) que, una vez girada, cubre la resolución"""
+    ancho, alto = tamano
+    if orientacion in _ORIENTACIONES_GIRADAS:
+        ancho, alto = alto, ancho
+    escala = min(1.0, max(resolucion[0] / ancho, resolucion[1] / alto))
+    objetivo = (max(1, math.ceil(ancho * escala)), max(1, math.ceil(alto * escala)))
+    if orientacion in _ORIENTACIONES_GIRADAS:
+        objetivo = objetivo[::-1]
+    return objetivo
+
+
+def procesar_subida(archivo, resolucion=RESOLUCION_POR_DEFECTO, destino_dir=SUBIDAS_DIR):
+    """
+    Guarda una imagen subida como JPEG orientado y reducido al tamaño justo para
+    cubrir la resolución del video.
+
+    En JPEG la reducción se hace durante la decodificación (draft); en el resto de
+    formatos con reduce/resize por pasos. Si ya existe una imagen con el mismo
+    contenido se devuelve sin decodificar nada.
+
+    Returns:
+        str: Ruta de la imagen procesada.
+    """
+    destino_dir = Path(destino_dir)
+    destino_dir.mkdir(parents=True, exist_ok=True)
+    huella = hash_subida(archivo)
+    path = destino_dir / f"{huella[:16]}_{resolucion[0]}x{resolucion[1]}.jpg"
+    if path.exists():
+        return str(path)
+
+    with medir_etapa("procesar_imagen_subida", bytes_entrada=getattr(archivo, "size", 0)) as etapa:
+        with Image.open(archivo) as img:
+            orientacion = img.getexif().get(0x0112, 1)
+            objetivo = _tamano_objetivo(img.size, orientacion, resolucion)
+            img.draft("RGB", objetivo)
+            # Tras draft, img.size es el tamaño que realmente se decodificará
+            estimado = img.size[0] * img.size[1] * 4 * 2
+            _presupuesto.adquirir(estimado)
+            try:
+                img.load()
+                img = ImageOps.exif_transpose(img)
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGBA")
+                    fondo = Image.new("RGB", img.size, (255, 255, 255))
+                    fondo.paste(img, mask=img.getchannel("A"))
+                    img = fondo
+                if img.width > resolucion[0] or img.height > resolucion[1]:
+                    escala = max(resolucion[0] / img.width, resolucion[1] / img.height)
+                    if escala < 1:
+                        nuevo = (max(1, round(img.width * escala)), max(1, round(img.height * escala)))
+                        img = img.resize(nuevo, Image.LANCZOS, reducing_gap=2.0)
+                temporal = path.with_suffix(f".{threading.get_ident()}.tmp")
+                img.convert("RGB").save(temporal, format="JPEG", quality=92)
+                os.replace(temporal, path)
+            finally:
+                _presupuesto.liberar(estimado)
+        etapa.bytes_salida = os.path.getsize(path)
+    return str(path)
+
+
+def ingerir_subidas(archivos, resolucion=RESOLUCION_POR_DEFECTO, max_workers=MAX_HILOS_SUBIDAS,
+                    destino_dir=SUBIDAS_DIR):
+    """
+    Procesa en paralelo varias imágenes subidas.
+
+    Returns:
+        list: Una ruta por archivo, en el mismo orden (None si no se pudo procesar).
+        Dos archivos con el mismo contenido dan la misma ruta.
+    """
+    if not archivos:
+        return []
+
+    def procesar(archivo):
+        try:
+            return procesar_subida(archivo, resolucion, destino_dir)
+        except Exception as e:
+            logging.warning(f"Error al procesar la imagen subida {getattr(archivo, 'name', '')}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(archivos))) as executor:
+        return list(executor.map(procesar, archivos))
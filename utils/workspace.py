@@ -0,0 +1,252 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+
+from utils.descargas import hash_archivo, DESCARGAS_DIR
+
+# Archivos temporales de sesiones y proyectos: WORKSPACE_DIR/sesiones/<id>, WORKSPACE_DIR/proyectos/<id>
+WORKSPACE_DIR = Path(os.environ.get("WORKSPACE_DIR", Path(tempfile.gettempdir()) / "app_seo_workspace"))
+# Almacén duradero, direccionado por contenido, de los archivos de los proyectos guardados
+ALMACEN_DIR = Path(os.environ.get("ALMACEN_DIR", Path(__file__).resolve().parent.parent / "almacen"))
+# Cuota conjunta del espacio de trabajo y de las copias publicadas para descarga
+MAX_BYTES_WORKSPACE = int(os.environ.get("MAX_BYTES_WORKSPACE", 5 * 1024 ** 3))
+# Un directorio sin referencias no se expulsa hasta llevar este tiempo sin usarse (s)
+EDAD_MINIMA_LIMPIEZA = int(os.environ.get("EDAD_MINIMA_LIMPIEZA", 15 * 60))
+# Pasado este tiempo sin actividad se borra aunque no se haya superado la cuota (s)
+TTL_ESPACIO = int(os.environ.get("TTL_ESPACIO", 6 * 3600))
+INTERVALO_LIMPIEZA = int(os.environ.get("INTERVALO_LIMPIEZA", 300))
+MARCA_USO = ".uso"
+
+_lock = threading.Lock()
+_referencias = {}
+_lock_limpieza = threading.Lock()
+_limpieza = None
+
+
+def _adquirir(directorio):
+    with _lock:
+        _referencias[directorio] = _referencias.get(directorio, 0) + 1
+
+
+def _liberar(directorio):
+    with _lock:
+        restantes = _referencias.get(directorio, 0) - 1
+        if restantes > 0:
+            _referencias[directorio] = restantes
+        else:
+            _referencias.pop(directorio, None)
+
+
+def tocar(directorio):
+    """Marca el directorio como usado ahora (la limpieza expulsa primero los menos recientes)"""
+    marca = Path(directorio) / MARCA_USO
+    try:
+        os.utime(marca)
+    except FileNotFoundError:
+        Path(directorio).mkdir(parents=True, exist_ok=True)
+        marca.touch()
+
+
+class EspacioTrabajo:
+    """
+    Directorio de trabajo de una sesión o de un proyecto.
+
+    Mientras el objeto exista (p. ej. guardado en st.session_state) el directorio
+    tiene una referencia y la limpieza no lo toca; al cerrarlo, o cuando el objeto
+    se destruye con la sesión, queda disponible para expulsarse.
+    """
+
+    def __init__(self, ambito, nombre=None):
+        self.directorio = WORKSPACE_DIR / ambito / (nombre or uuid.uuid4().hex)
+        tocar(self.directorio)
+        _adquirir(str(self.directorio))
+        self._finalizador = weakref.finalize(self, _liberar, str(self.directorio))
+
+    def subdirectorio(self, prefijo):
+        """Crea un directorio nuevo dentro del espacio (sustituye a tempfile.mkdtemp)"""
+        self.tocar()
+        return tempfile.mkdtemp(prefix=f"{prefijo}_", dir=self.directorio)
+
+    def tocar(self):
+        tocar(self.directorio)
+
+    def cerrar(self, borrar=False):
+        """Suelta la referencia; con borrar=True elimina ya el directorio"""
+        self._finalizador()
+        if borrar:
+            shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def espacio_sesion(session_id=None):
+    """Espacio de trabajo ligado a la vida de una sesión"""
+    return EspacioTrabajo("sesiones", session_id)
+
+
+def espacio_proyecto(proyecto_id=None):
+    """Espacio de trabajo ligado a la vida de un proyecto (hasta guardarlo o descartarlo)"""
+    return EspacioTrabajo("proyectos", proyecto_id)
+
+
+def reservar(path):
+    """
+    Toma una referencia al espacio de trabajo que contiene path, p. ej. mientras un
+    proceso del pool de render escribe en él aunque la sesión haya terminado.
+
+    Returns:
+        callable: Suelta la referencia (solo la primera llamada tiene efecto).
+    """
+    try:
+        partes = Path(os.path.abspath(path)).relative_to(os.path.abspath(WORKSPACE_DIR)).parts
+    except ValueError:
+        partes = ()
+    if len(partes) < 2:
+        return lambda: None
+    directorio = WORKSPACE_DIR / partes[0] / partes[1]
+    tocar(directorio)
+    _adquirir(str(directorio))
+    soltada = threading.Event()
+
+    def soltar():
+        if not soltada.is_set():
+            soltada.set()
+            tocar(directorio)
+            _liberar(str(directorio))
+    return soltar
+
+
+def guardar_duradero(path):
+    """
+    Copia un archivo al almacén duradero con un nombre basado en su contenido.
+
+    Se usa un enlace duro cuando es posible. Las rutas devueltas no dependen del
+    espacio de trabajo, así que pueden guardarse en la base de datos.
+
+    Returns:
+        str: Ruta del archivo en ALMACEN_DIR.
+    """
+    path = Path(path)
+    if ALMACEN_DIR in path.parents:
+        return str(path)
+    huella = hash_archivo(path)
+    destino = ALMACEN_DIR / huella[:2] / f"{huella}{path.suffix.lower()}"
+    if destino.exists():
+        return str(destino)
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+    try:
+        try:
+            os.link(path, temporal)
+        except OSError:
+            shutil.copyfile(path, temporal)
+        os.replace(temporal, destino)
+    finally:
+        if temporal.exists():
+            temporal.unlink()
+    logging.info(f"Archivo guardado en el almacén: {destino}")
+    return str(destino)
+
+
+def _tamano(path, vistos):
+    """Bytes de path; los enlaces duros (mismo st_dev, st_ino) ya contados en vistos no suman"""
+    rutas = [path] if path.is_file() else (
+        os.path.join(raiz, archivo) for raiz, _, archivos in os.walk(path) for archivo in archivos)
+    total = 0
+    for ruta in rutas:
+        try:
+            stat = os.lstat(ruta)
+        except FileNotFoundError:
+            continue
+        clave = (stat.st_dev, stat.st_ino)
+        if clave not in vistos:
+            vistos.add(clave)
+            total += stat.st_size
+    return total
+
+
+def _ultimo_uso(path):
+    try:
+        return (path / MARCA_USO).stat().st_mtime if path.is_dir() else path.stat().st_mtime
+    except FileNotFoundError:
+        return path.stat().st_mtime
+
+
+def _entradas():
+    """Directorios de sesiones y proyectos y copias publicadas: (último uso, bytes, ruta)"""
+    candidatos = list(WORKSPACE_DIR.glob("*/*")) if WORKSPACE_DIR.exists() else []
+    if DESCARGAS_DIR.exists():
+        candidatos += [p for p in DESCARGAS_DIR.iterdir() if not p.name.startswith(".")]
+    entradas = []
+    vistos = set()
+    for path in candidatos:
+        try:
+            entradas.append((_ultimo_uso(path), _tamano(path, vistos), path))
+        except FileNotFoundError:
+            continue
+    return entradas
+
+
+def _eliminar(path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def limpiar_espacio(max_bytes=MAX_BYTES_WORKSPACE):
+    """
+    Expulsa los directorios sin referencias y las copias publicadas.
+
+    Se borra todo lo que lleva más de TTL_ESPACIO sin usarse y, si aún se supera
+    max_bytes, lo usado hace más tiempo (nunca lo usado en los últimos
+    EDAD_MINIMA_LIMPIEZA segundos, que puede pertenecer a otro proceso).
+
+    Returns:
+        tuple: (elementos eliminados, bytes liberados)
+    """
+    ahora = time.time()
+    with _lock:
+        referenciados = set(_referencias)
+    entradas = _entradas()
+    total = sum(tamano for _, tamano, _ in entradas)
+    eliminados, liberados = 0, 0
+    for usado, tamano, path in sorted(entradas):
+        if str(path) in referenciados or ahora - usado < EDAD_MINIMA_LIMPIEZA:
+            continue
+        if total <= max_bytes and ahora - usado < TTL_ESPACIO:
+            break
+        _eliminar(path)
+        total -= tamano
+        eliminados += 1
+        liberados += tamano
+    if eliminados:
+        logging.info(f"Limpieza del espacio de trabajo: {eliminados} elementos, "
+                     f"{liberados / 1024 ** 2:.1f} MB liberados ({total / 1024 ** 2:.1f} MB en uso)")
+    return eliminados, liberados
+
+
+def iniciar_limpieza(intervalo=INTERVALO_LIMPIEZA):
+    """Arranca (una vez por proceso) el hilo que ejecuta limpiar_espacio periódicamente"""
+    global _limpieza
+    with _lock_limpieza:
+        if _limpieza is None:
+            def ejecutar():
+                while True:
+                    try:
+                        limpiar_espacio()
+                    except Exception as e:
+                        logging.warning(f"Error al limpiar el espacio de trabajo: {str(e)}")
+                    time.sleep(intervalo)
+
+            _limpieza = threading.Thread(target=ejecutar, name="limpieza_espacio", daemon=True)
+            _limpieza.start()
+        return _limpieza